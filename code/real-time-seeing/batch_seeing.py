@@ -0,0 +1,304 @@
+"""
+Headless processing of recorded DIMM videos.
+
+The frames are read from `cv2.VideoCapture` as fast as the decoder delivers them
+(no `QTimer` pacing) and the seeing is written to a CSV file with the same rows
+as `SeeingMonitor._writeCSV`. Timestamps are derived from the frame index and the
+FPS of the file, so the output does not depend on the processing speed.
+
+Raw video files (exports, black box freezes) are replayed from the memory mapped
+file, bit-exact and without decoding, with their recorded timestamps, and can be
+split between several processes (`--workers`). A run on the same file with the
+same options always gives the same output.
+
+Example:
+    python batch_seeing.py night.avi -o night.csv --b 200 --d 60 --wavelength 0.5 \\
+        --focal 2000 --pixel-width 5.6 --pixel-height 5.6
+"""
+import argparse
+import csv
+import multiprocessing
+from os.path import splitext
+import time
+
+import cv2
+import numpy as np
+
+from utils.background import BackgroundThreshold
+from utils.calibration import Calibration
+from utils.dimm import SeeingProcessor, CSV_FIELDNAMES
+from utils.raw_video import RAW_EXTENSION
+from utils.replay import RawVideoCapture
+from utils.state_enum import CentroidEstimator
+
+
+class BatchProcessor(object):
+
+    def __init__(self, processor, star="", block_filename=None, sensor_roi=None):
+        self.processor = processor
+        self.star = star
+        self.block_filename = block_filename
+        self.sensor_roi = sensor_roi
+
+        self.frames = 0
+        self.rows = 0
+
+    def fieldnames(self):
+        """ CSV columns: the main seeing, then the extra windows and the pairs of apertures (if any). """
+        fieldnames = list(CSV_FIELDNAMES)
+        for window in self.processor.windows[1:]:
+            suffix = window.name.replace(" ", "")
+            fieldnames += ["lateral_" + suffix, "transversal_" + suffix]
+        if len(self.processor.pairs) > 1:
+            for i, j in self.processor.pairs:
+                suffix = "pair{}-{}".format(i + 1, j + 1)
+                fieldnames += ["lateral_" + suffix, "transversal_" + suffix]
+        return fieldnames
+
+    def run(self, video_filename, csv_filename, start_time=0.0):
+        """
+        Process the whole video and write one CSV row per measured frame, with the
+        seeing over the extra windows of the processor (if any) and of every pair of
+        apertures (multi-aperture masks) in additional columns.
+        When `block_filename` is set, the seeing of each block of frames is written to it.
+
+        :param: video_filename : Raw video file, or any file readable by `cv2.VideoCapture`
+        :param: csv_filename : Output file, overwritten
+        :param: start_time : Timestamp (seconds since epoch) of the first frame, unless
+                             the timestamps are recorded in the file (raw video)
+        """
+        frames = videoFrames(video_filename, start_time, writable=self.processor.calibration is not None)
+        self.write(self.measure(frames), csv_filename)
+
+    def write(self, measures, csv_filename):
+        """ Write the `(row, block_row)` of `measure` to the CSV file(s). """
+        blockFile = None
+        try:
+            with open(csv_filename, "w", newline="") as csvFile:
+                writer = csv.writer(csvFile)
+                writer.writerow(self.fieldnames())
+
+                if self.block_filename:
+                    blockFile = open(self.block_filename, "w", newline="")
+                    block_writer = csv.writer(blockFile)
+                    block_writer.writerow(CSV_FIELDNAMES)
+
+                for row, block_row in measures:
+                    writer.writerow(row)
+                    self.rows += 1
+                    if blockFile is not None and block_row is not None:
+                        block_writer.writerow(block_row)
+        finally:
+            if blockFile is not None:
+                blockFile.close()
+
+    def measure(self, frames, skip=0):
+        """
+        Process the `(timestamp, frame)` of `frames` and yield `(row, block_row)` for every
+        measured frame, `block_row` being None unless a block was completed. The first
+        `skip` frames only feed the statistics (warm-up of a segment, see `runSegments`).
+        """
+        pairs = len(self.processor.pairs) > 1
+        for timestamp, frame in frames:
+            warmup = skip > 0
+            if warmup:
+                skip -= 1
+            else:
+                self.frames += 1
+
+            if self.sensor_roi is not None:
+                x, y, width, height = self.sensor_roi
+                frame = frame[y:y + height, x:x + width]
+
+            _, centroids, seeing = self.processor.process(frame, timestamp)
+            if seeing is None or warmup:
+                continue
+
+            row = [timestamp, seeing[0], seeing[1], self.star]
+            for index in range(1, len(self.processor.windows)):
+                row += self.processor.seeing(index)
+            if pairs:
+                for _, fwhm_lat, fwhm_tra in self.processor.pairSeeing():
+                    row += [fwhm_lat, fwhm_tra]
+
+            block_row = None
+            if self.processor.last_block is not None:
+                block_timestamp, _, block_std = self.processor.last_block
+                block_row = [block_timestamp] + list(self.processor.fwhm(*block_std)) + [self.star]
+            yield row, block_row
+
+
+def videoFrames(video_filename, start_time=0.0, start=0, stop=None, writable=False):
+    """
+    `(timestamp, frame)` of the frames of a video. The frames of a raw video are views
+    of the mapped file (copy-on-write if `writable`), with their recorded timestamps;
+    the other videos are decoded, the timestamps derived from `start_time` and the FPS.
+    """
+    if splitext(video_filename)[1] == RAW_EXTENSION:
+        cap = RawVideoCapture(video_filename, start, stop, writable=writable)
+    else:
+        cap = cv2.VideoCapture(video_filename)
+    if cap.isOpened() == False:
+        raise IOError("Cannot load file '{}'.".format(video_filename))
+
+    try:
+        if isinstance(cap, RawVideoCapture):
+            while True:
+                ret, frame = cap.read()
+                if ret == False:
+                    break
+                yield cap.timestamp, frame
+            return
+
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        if fps <= 0:
+            raise ValueError("Cannot read the frame rate of '{}'.".format(video_filename))
+
+        index = 0
+        while True:
+            ret, frame = cap.read()
+            if ret == False:
+                break
+            yield start_time + index / fps, frame
+            index += 1
+    finally:
+        cap.release()
+
+
+def segments(timestamps, workers, window, duration=0.0):
+    """
+    Split `len(timestamps)` frames into `workers` consecutive segments. Returns their
+    `(warmup, start, stop)`: the frames from `warmup` to `start` are processed before
+    the segment, so that its first seeing values are computed over full windows (at
+    least twice `window` frames, and `duration` seconds).
+    """
+    bounds = np.linspace(0, len(timestamps), workers + 1).astype(int)
+    result = []
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        if stop <= start:
+            continue
+        warmup = max(start - 2 * window, 0)
+        if duration > 0 and start > 0:
+            warmup = min(warmup, int(np.searchsorted(timestamps, timestamps[start] - duration)))
+        result.append((warmup, start, stop))
+    return result
+
+
+def measureSegment(args, warmup, start, stop):
+    """ Worker process: `(frames, rows)` of the segment `[start, stop)` of the raw video `args.video`. """
+    batch = BatchProcessor(buildProcessor(args), star=args.star, sensor_roi=args.roi)
+    frames = videoFrames(args.video, start=warmup, stop=stop, writable=batch.processor.calibration is not None)
+    rows = list(batch.measure(frames, skip=start - warmup))
+    return batch.frames, rows
+
+
+def runSegments(batch, args, workers):
+    """
+    Process a raw video with `workers` processes, each one on a segment of the frames
+    (see `segments`), and write the rows in the order of the frames.
+    """
+    cap = RawVideoCapture(args.video)
+    if cap.isOpened() == False:
+        raise IOError("Cannot load file '{}'.".format(args.video))
+    timestamps = cap.timestamps
+    cap.release()
+
+    durations = [window.duration for window in batch.processor.windows if window.duration is not None]
+    tasks = [(args,) + segment for segment in
+        segments(timestamps, workers, batch.processor.window, max(durations) if durations else 0.0)]
+
+    with multiprocessing.Pool(workers) as pool:
+        results = pool.starmap(measureSegment, tasks)
+
+    batch.frames = sum(frames for frames, _ in results)
+    batch.write((measure for _, rows in results for measure in rows), args.output)
+
+
+def addProcessorArguments(parser):
+    """ Options of `buildProcessor`: optics, detection, centroids and statistics. """
+    parser.add_argument("--star", default="", help="Name of the observed star, written in the 'star' column")
+    parser.add_argument("--roi", type=int, nargs=4, metavar=("X", "Y", "WIDTH", "HEIGHT"), default=None,
+        help="Only analyse this part of the frames (default: the whole, native resolution, frame)")
+    parser.add_argument("--thresh", type=int, default=127, help="Threshold, pixels below are set to 0 (default: 127)")
+    parser.add_argument("--calibration", default=None,
+                        help="Master dark and flat file (see build_masters.py), applied to every frame")
+    parser.add_argument("--auto-thresh", action="store_true",
+                        help="Estimate the threshold from the background level and noise (overrides --thresh)")
+    parser.add_argument("--nsigma", type=float, default=5.0,
+                        help="Automatic threshold, in background noise sigmas above the background level (default: 5)")
+    parser.add_argument("--track", action="store_true",
+        help="Only search the spots around their previous positions (ROI tracking)")
+    parser.add_argument("--roi-size", type=int, default=32, help="Half size of the tracking windows, in pixels (default: 32)")
+    parser.add_argument("--estimator", choices=[e.name.lower() for e in CentroidEstimator], default="cog",
+        help="Sub-pixel centroid estimator (default: cog)")
+    parser.add_argument("--apertures", type=int, default=2,
+        help="Number of apertures of the mask, every pair is measured (with '--estimator components', default: 2)")
+    parser.add_argument("--wcog-sigma", type=float, default=3.0,
+        help="Width (pixels) of the gaussian window of the 'wcog' estimator (default: 3)")
+    parser.add_argument("--window", type=int, default=100, help="Number of frames used for the standard deviation (default: 100)")
+    parser.add_argument("--durations", type=float, nargs="*", default=[],
+        help="Extra sliding windows, in seconds, written in additional columns (e.g. --durations 60 600)")
+    parser.add_argument("--b", type=float, required=True, help="Apertures separation (mm)")
+    parser.add_argument("--d", type=float, required=True, help="Apertures diameter (mm)")
+    parser.add_argument("--wavelength", type=float, required=True, help="Wavelength (µm)")
+    parser.add_argument("--focal", type=float, required=True, help="Focal length (mm)")
+    parser.add_argument("--pixel-width", type=float, required=True, help="Pixel width (µm)")
+    parser.add_argument("--pixel-height", type=float, required=True, help="Pixel height (µm)")
+
+
+def parseArguments(argv=None):
+    parser = argparse.ArgumentParser(description="Compute the DIMM seeing of a recorded video, at maximum speed.")
+    parser.add_argument("video", help="Video file to process (raw video files are replayed without decoding)")
+    parser.add_argument("-o", "--output", default="seeing.csv", help="CSV output file (default: seeing.csv)")
+    parser.add_argument("--start-time", type=float, default=0.0,
+        help="Timestamp (seconds since epoch) of the first frame (default: 0, i.e. relative to the start of the video)")
+    addProcessorArguments(parser)
+    parser.add_argument("--block", type=int, default=None,
+        help="Also compute the seeing over consecutive, non-overlapping blocks of BLOCK frames")
+    parser.add_argument("--block-output", default="seeing_blocks.csv",
+        help="CSV output file of the block seeing (default: seeing_blocks.csv)")
+    parser.add_argument("--workers", type=int, default=1,
+        help="Split a raw video between WORKERS processes, each segment after a warm-up of its windows (default: 1)")
+    args = parser.parse_args(argv)
+
+    if args.workers > 1:
+        if splitext(args.video)[1] != RAW_EXTENSION:
+            parser.error("--workers needs a raw video file ('{}')".format(RAW_EXTENSION))
+        if args.block:
+            parser.error("--workers cannot be combined with --block (blocks span the segments)")
+    return args
+
+
+def buildProcessor(args):
+    processor = SeeingProcessor(thresh=args.thresh, window=args.window, tracking=args.track, roi_size=args.roi_size,
+        estimator=CentroidEstimator[args.estimator.upper()], wcog_sigma=args.wcog_sigma,
+        durations=args.durations, block_length=args.block, apertures=args.apertures,
+        background=BackgroundThreshold(nsigma=args.nsigma) if args.auto_thresh else None)
+    if args.calibration:
+        calibration = Calibration.load(args.calibration)
+        processor.calibration = calibration.cropped(args.roi) if args.roi else calibration
+    processor.setBaseline(args.b, args.d)
+    processor.setWavelength(args.d, args.wavelength)
+    processor.setPlateScale(args.pixel_width, args.pixel_height, args.focal)
+    return processor
+
+
+def main(argv=None):
+    args = parseArguments(argv)
+
+    batch = BatchProcessor(buildProcessor(args), star=args.star,
+        block_filename=args.block_output if args.block else None, sensor_roi=args.roi)
+
+    tic = time.time()
+    if args.workers > 1:
+        runSegments(batch, args, args.workers)
+    else:
+        batch.run(args.video, args.output, start_time=args.start_time)
+    elapsed = time.time() - tic
+
+    print("{} frames processed in {:.2f} s ({:.0f} FPS), {} rows written to '{}'".format(
+        batch.frames, elapsed, batch.frames / max(elapsed, 1e-9), batch.rows, args.output))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+Per-stage benchmark of the seeing pipeline, headless (no camera, no display).
+
+Every stage of `SeeingMonitor._monitor` is timed separately, frame by frame, on
+deterministic synthetic frames (`TurbulenceSimulator`, fixed seed) at several
+resolutions and spot sizes, and optionally on the first frames of a recorded
+video. Throughput and latency percentiles are written as JSON, so that the
+results of two versions can be compared.
+
+Example:
+    python benchmark_seeing.py --resolutions 640x480 1280x960 --spot-sigmas 1.5 4 -o bench.json
+"""
+import argparse
+import json
+import platform
+import time
+
+import numpy as np
+import cv2
+
+from utils.calibration import Calibration
+from utils.dimm import SeeingProcessor, spotMask, toBGR, drawOverlay
+from utils.replay import openVideo
+from utils.running_stats import SlidingWindow, RunningStatistics
+from utils.state_enum import CentroidEstimator
+from utils.turbulence import TurbulenceSimulator
+
+
+def timeStage(function, inputs, repeat=1):
+    """
+    Call `function` on every input, `repeat` times, and return the latencies (seconds).
+    """
+    latencies = []
+    for _ in range(repeat):
+        for item in inputs:
+            tic = time.perf_counter()
+            function(item)
+            latencies.append(time.perf_counter() - tic)
+    return np.array(latencies)
+
+
+def summarize(latencies):
+    total = latencies.sum()
+    return {
+        "calls": int(latencies.size),
+        "throughput_fps": float(latencies.size / total) if total > 0 else None,
+        "latency_us": {
+            "mean": float(latencies.mean() * 1e6),
+            "p50": float(np.percentile(latencies, 50) * 1e6),
+            "p90": float(np.percentile(latencies, 90) * 1e6),
+            "p99": float(np.percentile(latencies, 99) * 1e6),
+            "max": float(latencies.max() * 1e6),
+        },
+    }
+
+
+def benchmarkFrames(frames, thresh, repeat=1):
+    """
+    Time every stage on `frames` (list of BGR uint8 images). Returns `{stage: summary}`.
+    """
+    processor = SeeingProcessor(thresh=thresh)
+
+    grays = [cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) for frame in frames]
+    masks = [spotMask(gray, thresh) for gray in grays]
+    contours = [cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)[0][:2] for mask in masks]
+    measurable = [(gray, found) for gray, found in zip(grays, contours) if len(found) >= 2]
+
+    # Deterministic masters: offset with hot pixels, vignetted flat
+    rng = np.random.RandomState(0)
+    height, width = grays[0].shape
+    dark = np.full((height, width), 4.0, dtype=np.float32)
+    dark.flat[rng.randint(0, dark.size, dark.size // 1000)] = 200
+    yy, xx = np.mgrid[:height, :width]
+    flat = (1.0 - 0.3 * ((xx - width / 2.0) ** 2 + (yy - height / 2.0) ** 2) / (width / 2.0) ** 2).astype(np.float32)
+    calibration = Calibration(dark, flat)
+    scratch = [gray.copy() for gray in grays]
+    windows = [(width // 4 - 32, height // 2 - 32, width // 4 + 32, height // 2 + 32),
+               (3 * width // 4 - 32, height // 2 - 32, 3 * width // 4 + 32, height // 2 + 32)]
+
+    results = {}
+    results["calibration"] = timeStage(calibration.apply, scratch, repeat)
+    results["calibration_roi"] = timeStage(lambda gray: calibration.apply(gray, windows), scratch, repeat)
+    results["grayscale"] = timeStage(lambda frame: cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), frames, repeat)
+    results["threshold"] = timeStage(lambda gray: spotMask(gray, thresh), grays, repeat)
+    results["detection"] = timeStage(
+        lambda mask: cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE), masks, repeat)
+
+    tracker = SeeingProcessor(thresh=thresh, tracking=True)
+    def track(gray):
+        found = tracker.findSpots(gray)
+        if len(found) >= 2:
+            tracker.centroids(gray, found)
+    results["detection_roi_tracking"] = timeStage(track, grays, repeat)
+
+    if measurable:
+        for estimator in CentroidEstimator:
+            processor.estimator = estimator
+            if estimator == CentroidEstimator.COMPONENTS:
+                # Detection and centroids in one pass, timed together
+                results["detection_centroids_components"] = timeStage(
+                    lambda item: processor.centroids(item[0], processor.findSpots(item[0])), measurable, repeat)
+            else:
+                results["centroids_" + estimator.name.lower()] = timeStage(
+                    lambda item: processor.centroids(*item), measurable, repeat)
+
+    statistics = RunningStatistics([SlidingWindow(length=100), SlidingWindow(duration=60), SlidingWindow(duration=600)])
+    samples = [((float(i % 7), float(i % 5)), i * 0.01) for i in range(len(frames))]
+    def updateStatistics(sample):
+        statistics.add(*sample)
+        for window in statistics.windows:
+            window.std()
+    results["statistics"] = timeStage(updateStatistics, samples, repeat)
+
+    processor.estimator = CentroidEstimator.COG
+    overlays = [(frame, found, processor.centroids(gray, found) if len(found) >= 2 else None)
+        for frame, gray, found in zip(frames, grays, contours)]
+    results["overlay"] = timeStage(lambda item: drawOverlay(toBGR(item[0]), item[1], item[2]), overlays, repeat)
+
+    try:
+        from qimage2ndarray import array2qimage
+    except ImportError:
+        pass
+    else:
+        results["qimage"] = timeStage(array2qimage, frames, repeat)
+
+    return {stage: summarize(latencies) for stage, latencies in results.items()}
+
+
+def syntheticFrames(width, height, spot_sigma, count, seed=0, chunk=16):
+    """ `count` BGR frames, rendered `chunk` at a time: the noise of a batch is drawn as float64. """
+    simulator = TurbulenceSimulator(height=height, width=width, spot_sigma=spot_sigma, noise=3.0, seed=seed)
+    batch = np.empty((min(chunk, count), height, width), dtype=np.uint8)
+    frames = []
+    for start in range(0, count, chunk):
+        rendered, _, _ = simulator.generateBatch(min(chunk, count - start), out=batch[:count - start])
+        frames += [cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR) for frame in rendered]
+    return frames
+
+
+def recordedFrames(filename, count):
+    """
+    The first `count` frames of a video (raw video files included), as 8-bit BGR
+    frames like the synthetic ones. Raw frames are copy-on-write views of the file.
+    """
+    cap = openVideo(filename, writable=True)
+    if cap.isOpened() == False:
+        raise IOError("Cannot load file '{}'.".format(filename))
+
+    frames = []
+    while len(frames) < count:
+        ret, frame = cap.read()
+        if ret == False:
+            break
+        frames.append(frame if frame.ndim == 3 and frame.shape[2] == 3 and frame.dtype == np.uint8 else toBGR(frame))
+    cap.release()
+    return frames
+
+
+def parseArguments(argv=None):
+    parser = argparse.ArgumentParser(description="Per-stage benchmark of the seeing pipeline.")
+    parser.add_argument("--resolutions", nargs="+", default=["640x480", "1280x960", "2048x1536"],
+        help="Resolutions of the synthetic frames, WIDTHxHEIGHT (default: 640x480 1280x960 2048x1536)")
+    parser.add_argument("--spot-sigmas", type=float, nargs="+", default=[1.5, 3.0, 6.0],
+        help="Gaussian sigma (pixels) of the synthetic spots (default: 1.5 3 6)")
+    parser.add_argument("--frames", type=int, default=200, help="Frames per configuration (default: 200)")
+    parser.add_argument("--repeat", type=int, default=3, help="Passes over the frames of each stage (default: 3)")
+    parser.add_argument("--thresh", type=int, default=60, help="Threshold (default: 60)")
+    parser.add_argument("--video", default=None, help="Also benchmark the first frames of this recorded video")
+    parser.add_argument("-o", "--output", default=None, help="JSON output file (default: standard output)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parseArguments(argv)
+    cv2.setNumThreads(1)
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "machine": platform.machine(),
+        "frames": args.frames,
+        "repeat": args.repeat,
+        "thresh": args.thresh,
+        "runs": [],
+    }
+
+    for resolution in args.resolutions:
+        width, height = [int(value) for value in resolution.lower().split("x")]
+        for spot_sigma in args.spot_sigmas:
+            frames = syntheticFrames(width, height, spot_sigma, args.frames)
+            report["runs"].append({
+                "source": "synthetic",
+                "resolution": [width, height],
+                "spot_sigma": spot_sigma,
+                "stages": benchmarkFrames(frames, args.thresh, args.repeat),
+            })
+
+    if args.video:
+        frames = recordedFrames(args.video, args.frames)
+        report["runs"].append({
+            "source": args.video,
+            "resolution": [frames[0].shape[1], frames[0].shape[0]] if frames else None,
+            "spot_sigma": None,
+            "stages": benchmarkFrames(frames, args.thresh, args.repeat) if frames else {},
+        })
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as jsonFile:
+            jsonFile.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
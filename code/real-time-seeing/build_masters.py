@@ -0,0 +1,71 @@
+"""
+Master dark and flat frames from recorded sequences, for the calibration stage.
+
+The frames of each video (preferably a raw video, `.dimmraw`, recorded from the
+camera: its frames have the shape and the bit depth of the live ones, while decoded
+videos are lossy BGR frames) are combined with a per-pixel median; the master dark
+is subtracted from the flat. The masters are written to a `.npz` file, loaded by
+`batch_seeing.py --calibration` and by the monitor.
+
+Example:
+    python build_masters.py --dark dark.dimmraw --flat flat.dimmraw -o calibration.npz
+"""
+import argparse
+
+import numpy as np
+
+from utils.calibration import Calibration, CALIBRATION_FILENAME, combineFrames
+from utils.replay import openVideo
+
+
+def readFrames(video_filename, count):
+    """ The first `count` frames of a video (raw video files included), as an `(n, height, width[, channels])` array. """
+    cap = openVideo(video_filename)
+    if cap.isOpened() == False:
+        raise IOError("Cannot load file '{}'.".format(video_filename))
+
+    frames = []
+    try:
+        while len(frames) < count:
+            ret, frame = cap.read()
+            if ret == False:
+                break
+            frames.append(frame)
+    finally:
+        cap.release()
+
+    if not frames:
+        raise ValueError("No frame in '{}'.".format(video_filename))
+    return np.stack(frames)
+
+
+def parseArguments(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dark", default=None, help="Video of dark frames (same exposure and gain as the science frames)")
+    parser.add_argument("--flat", default=None, help="Video of flat field frames")
+    parser.add_argument("--frames", type=int, default=100, help="Maximum number of frames per master (default: 100)")
+    parser.add_argument("-o", "--output", default=CALIBRATION_FILENAME,
+                        help="Masters file (default: {})".format(CALIBRATION_FILENAME))
+    args = parser.parse_args(argv)
+    if args.dark is None and args.flat is None:
+        parser.error("at least one of --dark and --flat is required")
+    return args
+
+
+def main(argv=None):
+    args = parseArguments(argv)
+
+    dark = combineFrames(readFrames(args.dark, args.frames)) if args.dark else None
+    flat = combineFrames(readFrames(args.flat, args.frames)) if args.flat else None
+    if dark is not None and flat is not None:
+        flat -= dark
+
+    calibration = Calibration(dark, flat)
+    calibration.save(args.output)
+    print("Masters {} ({}) written to '{}'".format(
+        ", ".join(name for name, master in (("dark", dark), ("flat", flat)) if master is not None),
+        "x".join(str(n) for n in calibration.shape), args.output))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""
+Compile the Qt Designer layout (ui/layout.ui) into ui/ui_mainwindow.py.
+
+The monitor imports the compiled module and never compiles the layout itself:
+run this script (PyQt5 required) after every change to the layout, and commit
+both files.
+
+Example:
+    python compile_ui.py
+"""
+import argparse
+from os.path import dirname, join, abspath
+
+
+HERE = dirname(abspath(__file__))
+LAYOUT_FILENAME = join(HERE, "ui", "layout.ui")
+UI_FILENAME = join(HERE, "ui", "ui_mainwindow.py")
+
+
+def parseArguments(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("layout", nargs="?", default=LAYOUT_FILENAME, help="Qt Designer file")
+    parser.add_argument("-o", "--output", default=UI_FILENAME, help="Python module to generate")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parseArguments(argv)
+
+    from PyQt5.uic import compileUi
+
+    with open(args.output, "wt") as uiFile:
+        compileUi(args.layout, uiFile)
+    print("'{}' compiled to '{}'".format(args.layout, args.output))
+
+
+if __name__ == "__main__":
+    main()
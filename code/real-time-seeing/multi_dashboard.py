@@ -0,0 +1,128 @@
+"""
+Combined dashboard of the pipelines of multi_seeing.py (`--gui`): the seeing of every
+pipeline on one chart, and the status of each one (frames, FPS, dropped frames).
+"""
+import sys
+
+import numpy as np
+
+from PyQt5.QtCore import QTimer, Qt, QDateTime, QPointF
+from PyQt5.QtGui import QPainter, QFont
+from PyQt5.QtWidgets import QApplication, QMainWindow, QWidget, QVBoxLayout, QLabel
+from PyQt5.QtChart import QLineSeries, QDateTimeAxis, QValueAxis, QChart, QChartView
+
+from utils.seeing_history import SeeingHistory
+
+
+# Time span of the chart (s), ending at the last point of the pipelines, and points kept per pipeline
+CHART_SPAN = 10 * 60
+HISTORY_CAPACITY = 500000
+
+
+class MultiDashboard(QMainWindow):
+
+    def __init__(self, group, refresh=2.0):
+        super(MultiDashboard, self).__init__()
+        self.setWindowTitle("Seeing pipelines")
+        self.group = group
+        self.histories = {name: SeeingHistory(HISTORY_CAPACITY) for name in group.names}
+
+        self.chart = QChart()
+        self.axis_horizontal = QDateTimeAxis()
+        self.axis_horizontal.setFormat("HH:mm:ss")
+        self.axis_horizontal.setLabelsAngle(-20)
+        self.chart.addAxis(self.axis_horizontal, Qt.AlignBottom)
+
+        self.axis_vertical = QValueAxis()
+        self.axis_vertical.setRange(0, 1)
+        self.axis_vertical.setTitleText("arcsec")
+        self.chart.addAxis(self.axis_vertical, Qt.AlignLeft)
+
+        # Lateral and transversal series of every pipeline
+        self.series = {}
+        for name in group.names:
+            self.series[name] = []
+            for direction in ("lateral", "transversal"):
+                series = QLineSeries()
+                series.setName("{} {}".format(name, direction))
+                self.chart.addSeries(series)
+                series.attachAxis(self.axis_horizontal)
+                series.attachAxis(self.axis_vertical)
+                self.series[name].append(series)
+
+        self.chart.setTitle("Full Width at Half Maximum")
+        self.chart.legend().setVisible(True)
+        self.chart.legend().setAlignment(Qt.AlignBottom)
+        self.chartView = QChartView(self.chart)
+        self.chartView.setRenderHint(QPainter.Antialiasing)
+
+        self.label_status = QLabel()
+        font = QFont("Monospace")
+        font.setStyleHint(QFont.TypeWriter)
+        self.label_status.setFont(font)
+
+        centralwidget = QWidget()
+        layout = QVBoxLayout(centralwidget)
+        layout.addWidget(self.chartView, stretch=1)
+        layout.addWidget(self.label_status)
+        self.setCentralWidget(centralwidget)
+        self.resize(900, 600)
+
+        self.timer = QTimer(parent=self)
+        self.timer.timeout.connect(self._update)
+        self.timer.start(int(refresh * 1000))
+
+
+    def closeEvent(self, event):
+        self.timer.stop()
+        self.group.stop()
+        event.accept()
+
+
+    def _update(self):
+        """ Timer: updates of the pipelines, into their history, then the chart and the status. """
+        for update in self.group.poll():
+            if update.points:
+                points = np.asarray(update.points, dtype=np.float64)
+                self.histories[update.name].append(points[:, 0], points[:, 1:])
+
+        self._plotSeeing()
+        self.label_status.setText(self.group.status())
+        if not self.group.running:
+            self.timer.stop()
+
+
+    def _plotSeeing(self):
+        """ Min/max envelope of every history over the span, one bucket per pixel (see `SeeingHistory`). """
+        histories = [history for history in self.histories.values() if len(history) > 0]
+        if not histories:
+            return
+
+        end = max(history.last() for history in histories)
+        start = end - CHART_SPAN
+        buckets = max(int(self.chart.plotArea().width()), 100)
+
+        maximum = 0.0
+        for name, series in self.series.items():
+            history = self.histories[name]
+            if len(history) == 0:
+                continue
+            timestamps, values = history.decimate(start, end, buckets)
+            timestamps = (timestamps * 1000.0).tolist()
+            for channel, channel_series in enumerate(series):
+                channel_series.replace([QPointF(t, v) for t, v in zip(timestamps, values[:, channel].tolist())])
+            if len(values) > 0:
+                maximum = max(maximum, float(values.max()))
+
+        self.axis_horizontal.setRange(
+            QDateTime.fromMSecsSinceEpoch(int(start * 1000)), QDateTime.fromMSecsSinceEpoch(int(end * 1000)))
+        if maximum > 0:
+            self.axis_vertical.setRange(0, maximum * 1.1)
+
+
+def runDashboard(group, refresh=2.0):
+    """ Show the dashboard of the running `PipelineGroup` until its window is closed. """
+    app = QApplication(sys.argv[:1])
+    dashboard = MultiDashboard(group, refresh)
+    dashboard.show()
+    return app.exec_()
@@ -0,0 +1,329 @@
+"""
+Several independent seeing pipelines on one host, e.g. a DIMM and a second instrument.
+
+Every pipeline, a TIS camera chosen by its unique name (see `--list`) or a recorded
+video, runs its acquisition and its processing in its own process: the pipelines
+share neither the interpreter nor a thread, so that each one keeps its throughput
+when another camera is added on a multi-core machine. Each pipeline writes its own
+CSV file, `seeing_<name>_<night>.csv` in `--output-dir` (same columns as
+batch_seeing.py), and sends a summary of its results to this process, which shows
+all of them in one dashboard: a table printed every `--refresh` seconds (headless),
+or a window with the seeing of every pipeline (`--gui`, PyQt5 required).
+
+The processing options are those of batch_seeing.py, shared by all the pipelines.
+
+Example:
+    python multi_seeing.py --list
+    python multi_seeing.py --camera "DMK 31AU03 12345678" --camera "DMK 31AU03 87654321" \\
+        --b 200 --d 60 --wavelength 0.5 --focal 2000 --pixel-width 4.65 --pixel-height 4.65
+"""
+import argparse
+from collections import namedtuple
+from os.path import basename, splitext
+import logging
+import multiprocessing
+import queue
+import re
+import signal
+import time
+import traceback
+
+import cv2
+import numpy as np
+
+from batch_seeing import BatchProcessor, addProcessorArguments, buildProcessor, videoFrames
+from utils.frame_ring import FrameRingBuffer
+from utils.results_writer import ResultsWriter
+
+
+# Pixel formats requested to the cameras (mono), see `SeeingMonitor.sink_format`
+SINK_FORMATS = ("Y800", "Y16")
+
+# Summary sent by a pipeline to the dashboard: counters, and the `(timestamp, fwhm_lat, fwhm_tra)`
+# measured since its previous update. The last update of a pipeline is `done`, `error` is set if it failed
+PipelineUpdate = namedtuple("PipelineUpdate", ["name", "frames", "fps", "dropped", "points", "error", "done"])
+
+
+def listDevices():
+    """ Unique names ("model serial") of the connected TIS cameras. """
+    try:
+        import tis.tisgrabber as IC
+    except (OSError, AttributeError):
+        # Windows DLL
+        raise IOError("The TIS camera library is not available on this machine")
+    return [name.decode("utf-8") for name in IC.TIS_CAM().GetDevices()]
+
+
+def outputName(name):
+    """ File name stem of the pipeline `name`. """
+    return re.sub(r"[^\w.-]+", "_", name).strip("_")
+
+
+class CameraSource(object):
+    """
+    Frames of a live TIS camera, opened by its unique name. The frame ready callback
+    copies them into a `FrameRingBuffer`; every frame is a slot of the ring, given
+    back when the next one is requested.
+    """
+
+    def __init__(self, name, sink_format="Y800"):
+        self.name = name
+        self.sink_format = sink_format
+        self.frame_ring = None
+
+    @property
+    def dropped(self):
+        return self.frame_ring.dropped if self.frame_ring is not None else 0
+
+    def _callbackFunction(self, hGrabber, pBuffer, framenumber, pData):
+        """ Frame ready callback, called from the driver thread. """
+        if self.frame_ring is not None:
+            self.frame_ring.push(pBuffer, framenumber)
+
+    def frames(self, stop):
+        """ `(timestamp, frame)` of the camera, until `stop` is set. """
+        import tis.tisgrabber as IC
+
+        camera = IC.TIS_CAM()
+        if camera.open(self.name) != 1 or camera.IsDevValid() != 1:
+            raise IOError("Cannot open the camera '{}'".format(self.name))
+
+        # Kept alive as long as the camera may call it
+        self.Callbackfunc = IC.TIS_GrabberDLL.FRAMEREADYCALLBACK(self._callbackFunction)
+        camera.SetFrameReadyCallback(self.Callbackfunc, self)
+        camera.SetContinuousMode(0)
+        camera.SetFormat(IC.SinkFormats[self.sink_format])
+        camera.StartLive(0)
+
+        width, height = camera.GetImageDescription()[:2]
+        self.frame_ring = FrameRingBuffer((height, width),
+            dtype=np.uint16 if camera.GetFormat() == IC.SinkFormats.Y16 else np.uint8)
+
+        index = None
+        try:
+            while not stop.is_set():
+                if index is not None:
+                    self.frame_ring.release(index)
+                index = self.frame_ring.get(timeout=0.1)
+                if index is not None:
+                    yield time.time(), self.frame_ring.frames[index]
+        finally:
+            camera.StopLive()
+
+
+class ReplaySource(object):
+    """ Frames of a recorded video, as fast as they are read, e.g. to test a setup without cameras. """
+
+    dropped = 0
+
+    def __init__(self, filename, writable=False):
+        self.filename = filename
+        self.writable = writable
+
+    def frames(self, stop):
+        # Recorded timestamps for raw videos, otherwise from now on
+        for timestamp, frame in videoFrames(self.filename, time.time(), writable=self.writable):
+            if stop.is_set():
+                break
+            yield timestamp, frame
+
+
+def runPipeline(name, source, args, updates, stop, interval=0.5):
+    """
+    Pipeline process: acquisition and processing of `source`. The rows are written to
+    the CSV file of the pipeline, and summed up to `updates` every `interval` seconds.
+    """
+    # One core per pipeline. Ctrl+C is handled by the dashboard, which sets `stop`
+    cv2.setNumThreads(1)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    state = {"frames": 0, "time": time.time(), "points": []}
+    batch = None
+    writer = None
+
+    def publish(error=None, done=False):
+        now = time.time()
+        frames = batch.frames if batch is not None else 0
+        fps = (frames - state["frames"]) / max(now - state["time"], 1e-9)
+        updates.put(PipelineUpdate(name, frames, fps, source.dropped, state["points"], error, done))
+        if writer is not None:
+            writer.flushIfDue()
+        state.update(frames=frames, time=now, points=[])
+
+    def published(frames):
+        for item in frames:
+            if time.time() - state["time"] >= interval:
+                publish()
+            yield item
+
+    try:
+        batch = BatchProcessor(buildProcessor(args), star=args.star, sensor_roi=args.roi)
+        writer = ResultsWriter(args.output_dir, "seeing_{}.csv".format(outputName(name)), batch.fieldnames())
+        for row, _ in batch.measure(published(source.frames(stop))):
+            writer.write([row])
+            state["points"].append(tuple(row[:3]))
+    except Exception:
+        logging.error(traceback.format_exc())
+        publish(error=traceback.format_exc().strip().splitlines()[-1], done=True)
+    else:
+        publish(done=True)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+class PipelineGroup(object):
+    """
+    The pipeline processes, and their last update (see `PipelineUpdate`) for the dashboard.
+
+    :param: sources : `[(name, source), ...]`, `source` being a `CameraSource` or a `ReplaySource`
+    """
+
+    def __init__(self, sources, args):
+        self.names = [name for name, _ in sources]
+        self.states = {}
+        self.seeing = {}        # Last `(timestamp, fwhm_lat, fwhm_tra)` of every pipeline
+
+        self._updates = multiprocessing.Queue()
+        self._stop = multiprocessing.Event()
+        self._processes = [multiprocessing.Process(target=runPipeline, name=name,
+            args=(name, source, args, self._updates, self._stop), daemon=True) for name, source in sources]
+
+    def start(self):
+        for process in self._processes:
+            process.start()
+
+    def poll(self):
+        """ Updates received since the last call, in order. """
+        received = []
+        while True:
+            try:
+                update = self._updates.get_nowait()
+            except queue.Empty:
+                break
+            self.states[update.name] = update
+            if update.points:
+                self.seeing[update.name] = update.points[-1]
+            received.append(update)
+        return received
+
+    @property
+    def running(self):
+        """ False once every pipeline is done, or its process is gone. """
+        return any(process.is_alive() and not (process.name in self.states and self.states[process.name].done)
+            for process in self._processes)
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        deadline = time.time() + timeout
+        while any(process.is_alive() for process in self._processes) and time.time() < deadline:
+            # Drained, so that the pipelines are not blocked on a full queue
+            self.poll()
+            time.sleep(0.05)
+        for process in self._processes:
+            if process.is_alive():
+                process.terminate()
+        self.poll()
+
+    def status(self):
+        """ One line per pipeline: name, frames, FPS, dropped frames and last seeing (arcsec). """
+        width = max([len("pipeline")] + [len(name) for name in self.names])
+        lines = ["{:<{}}  {:>9}  {:>7}  {:>7}  {:>8}  {:>11}".format(
+            "pipeline", width, "frames", "fps", "dropped", "lateral", "transversal")]
+        for name in self.names:
+            update = self.states.get(name)
+            if update is None:
+                lines.append("{:<{}}  starting".format(name, width))
+                continue
+            line = "{:<{}}  {:>9}  {:>7.1f}  {:>7}".format(name, width, update.frames, update.fps, update.dropped)
+            if name in self.seeing:
+                line += "  {:>8.3f}  {:>11.3f}".format(*self.seeing[name][1:])
+            if update.error is not None:
+                line += "  failed: " + update.error
+            elif update.done:
+                line += "  done"
+            lines.append(line)
+        return "\n".join(lines)
+
+
+def consoleDashboard(group, refresh):
+    """ Headless dashboard: the status of every pipeline, every `refresh` seconds. """
+    try:
+        while group.running:
+            time.sleep(refresh)
+            group.poll()
+            print(time.strftime("%H:%M:%S"))
+            print(group.status())
+    except KeyboardInterrupt:
+        pass
+
+
+def parseArguments(argv=None):
+    # Listing the cameras does not need the processing options
+    lister = argparse.ArgumentParser(add_help=False)
+    lister.add_argument("--list", action="store_true")
+    if lister.parse_known_args(argv)[0].list:
+        return argparse.Namespace(list=True)
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--list", action="store_true", help="List the unique names of the connected cameras, and exit")
+    parser.add_argument("--camera", action="append", default=[], metavar="NAME",
+        help="Unique name of a camera, as given by --list (repeat for every camera)")
+    parser.add_argument("--video", action="append", default=[], metavar="FILE",
+        help="Recorded video, processed as a pipeline of its own (repeat for every video)")
+    parser.add_argument("--format", choices=SINK_FORMATS, default="Y800",
+        help="Pixel format of the cameras: 8 or 16 bits mono (default: Y800)")
+    parser.add_argument("--output-dir", default=".", help="Directory of the CSV files, one per pipeline (default: .)")
+    parser.add_argument("--refresh", type=float, default=2.0, help="Refresh period of the dashboard, in seconds (default: 2)")
+    parser.add_argument("--gui", action="store_true", help="Show the dashboard in a window")
+    addProcessorArguments(parser)
+    parser.set_defaults(block=None)
+    args = parser.parse_args(argv)
+
+    if not args.camera and not args.video:
+        parser.error("at least one --camera or --video is needed")
+    if args.camera:
+        try:
+            devices = listDevices()
+        except IOError as e:
+            parser.error(str(e))
+        for name in args.camera:
+            if name not in devices:
+                parser.error("no camera '{}', connected: {}".format(name, ", ".join(devices) or "none"))
+
+    names = args.camera + [splitext(basename(filename))[0] for filename in args.video]
+    if len(set(map(outputName, names))) != len(names):
+        parser.error("every camera and video must have a distinct name")
+    return args
+
+
+def main(argv=None):
+    args = parseArguments(argv)
+    if args.list:
+        try:
+            devices = listDevices()
+        except IOError as e:
+            print(e)
+            return 1
+        for name in devices:
+            print(name)
+        return
+
+    writable = args.calibration is not None
+    sources = [(name, CameraSource(name, args.format)) for name in args.camera]
+    sources += [(splitext(basename(filename))[0], ReplaySource(filename, writable)) for filename in args.video]
+
+    group = PipelineGroup(sources, args)
+    group.start()
+    try:
+        if args.gui:
+            from multi_dashboard import runDashboard
+            return runDashboard(group, args.refresh)
+        consoleDashboard(group, args.refresh)
+    finally:
+        group.stop()
+        print(group.status())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+Command line entry point of the DIMM tools.
+
+Only the module of the requested command is imported: the headless commands
+(`batch`, `multi`, `masters`, `benchmark`) need neither Qt nor a display, and nothing
+heavier than `argparse` is loaded before the command runs, so that scripted
+and cron-style runs start quickly. The arguments after the command are those
+of the corresponding script, e.g. `python seeing.py batch --help`.
+
+Example:
+    python seeing.py batch night.avi -o night.csv --b 200 --d 60 --wavelength 0.5 \\
+        --focal 2000 --pixel-width 5.6 --pixel-height 5.6
+"""
+import argparse
+from importlib import import_module
+import sys
+
+
+# Command: (module with a `main(argv)`, description)
+COMMANDS = {
+    "batch": ("batch_seeing", "seeing of a recorded video, as fast as possible"),
+    "multi": ("multi_seeing", "several cameras (or videos), one pipeline process each"),
+    "masters": ("build_masters", "master dark and flat frames from recorded sequences"),
+    "benchmark": ("benchmark_seeing", "per-stage benchmark of the pipeline"),
+    "monitor": ("seeing_monitor", "real-time monitor (PyQt5 and a display required)"),
+    "compile-ui": ("compile_ui", "compile ui/layout.ui into ui/ui_mainwindow.py"),
+}
+
+
+def parseArguments(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="commands:\n" + "\n".join("  {:<12}{}".format(name, description)
+            for name, (_, description) in COMMANDS.items()))
+    parser.add_argument("command", choices=COMMANDS, metavar="command", help="One of: " + ", ".join(COMMANDS))
+    parser.add_argument("args", nargs=argparse.REMAINDER, help="Arguments of the command")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parseArguments(argv)
+    module = import_module(COMMANDS[args.command][0])
+    return module.main(args.args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,35 +1,28 @@
-from collections import deque
+import argparse
 import logging
 import traceback
 import time
 from os.path import splitext, join
 import threading
-from random import random
-import csv
+import platform
 
 import numpy as np
 import cv2
-import matplotlib.pyplot as plt
 
-from PyQt5.QtCore import QObject, QEvent, QTimer, QDir, Qt, QDateTime
+from PyQt5.QtCore import QObject, QEvent, QTimer, QDir, Qt, QDateTime, QPointF, pyqtSignal
 from PyQt5.QtGui import QImage, QPalette, QPixmap, QPainter, QFont
 from PyQt5.QtWidgets import (QWidget, QGridLayout, QAction, QApplication, QPushButton, QLabel,
     QMainWindow, QMenu, QMessageBox, QSizePolicy, QFileDialog)
 from PyQt5.QtChart import QLineSeries, QDateTimeAxis, QValueAxis, QChart, QChartView
 from qimage2ndarray import array2qimage, gray2qimage
 
-from utils.state_enum import VideoSource
+from utils.state_enum import VideoSource, CentroidEstimator, OverflowPolicy
 
 
-# Dev only ########################################################
-import platform
-if platform.system() == 'Linux':
-    from PyQt5.uic import compileUi
-    with open("./code/real-time-seeing/ui/ui_mainwindow.py", "wt") as ui_file:
-        compileUi("./code/real-time-seeing/ui/layout.ui", ui_file)
-    from ui.ui_mainwindow import Ui_MainWindow
-else:
-    from ui.ui_mainwindow import Ui_MainWindow
+# Compiled ahead of time from ui/layout.ui, see compile_ui.py
+from ui.ui_mainwindow import Ui_MainWindow
+
+if platform.system() != 'Linux':
     import tis.tisgrabber as IC
     import ctypes as C
 
@@ -39,7 +32,50 @@ else:
     COLORFORMAT     = C.c_int()
 
 from utils.fake_stars import FakeStars
-from utils.matplotlib_widget import MatplotlibWidget
+from utils.dimm import SeeingProcessor, CSV_FIELDNAMES, toBGR, drawOverlay
+from utils.frame_ring import FrameRingBuffer
+from utils.burst import BurstBuffer
+from utils.result_sink import ResultSink, FrameResult
+from utils.results_writer import ResultsWriter
+from utils.instrumentation import PipelineStats
+from utils.seeing_history import SeeingHistory
+from utils.background import BackgroundThreshold
+from utils.calibration import Calibration, MasterBuilder, CALIBRATION_FILENAME
+from utils.video_export import VideoExporter
+from utils.raw_video import RAW_EXTENSION, recordDtype
+from utils.ring_recorder import RingRecorder
+from utils.replay import openVideo
+
+
+# Size of the preview, the analysis runs on the native (or sensor ROI) frame
+DISPLAY_SIZE = (640, 480)
+
+# Acquisition timer interval (ms) of the simulation, and of the videos without a frame rate
+TIMER_INTERVAL = 100
+
+# Pixel formats that can be requested to the camera (`--format`), and their bits per pixel
+SINK_FORMAT_BITS = {"Y800": 8, "Y16": 16, "RGB32": 32}
+
+# Pipeline statistics: refresh period of the panel (ms), period (s) and file of the JSON dump
+STATS_REFRESH = 1000
+STATS_DUMP_INTERVAL = 10.0
+STATS_FILENAME = "seeing_stats.json"
+
+# Seeing chart: refresh period (ms) and time spans (s) of the items of `combobox_span`, None for the whole history
+CHART_REFRESH = 500
+CHART_SPANS = [10, 60, 10 * 60, 60 * 60, None]
+
+# Frame rate of the exported MJPG videos when the frames are not paced by a timer (live camera)
+EXPORT_FPS = 30
+
+# Black box: ring file (in the results directory), minimum time (s) between two automatic
+# freezes, and seeing spike (ratio to the slow moving average of the seeing) triggering one
+BLACKBOX_FILENAME = "blackbox" + RAW_EXTENSION
+FREEZE_COOLDOWN = 60.0
+FREEZE_SPIKE = 2.0
+
+# Number of frames averaged into a master dark or flat recorded from the stream
+MASTER_FRAMES = 50
 
 
 if platform.system() == 'Linux':
@@ -75,7 +111,7 @@ class EventHandler(QObject):
             if self.seeingMonitor.select_noiseArea == True and self.mouse_pressed == True:
                 self.seeingMonitor._set_noiseArea(self.starting_point[0], self.starting_point[1], event.x(), event.y())
                 if self.seeingMonitor.pause_pressed:
-                    self.seeingMonitor.draw_only_frame = self.seeingMonitor.frame.copy()
+                    self.seeingMonitor._resetDrawOnlyFrame()
                     self.seeingMonitor._draw_noiseArea()
                     self.seeingMonitor._displayImage()
             return True
@@ -92,29 +128,59 @@ class EventHandler(QObject):
 
 
 
+class ResultSignal(QObject):
+    """
+    Forwards the batches of results of the sink worker, the recorded masters, the messages
+    of the processing and the calibration errors to the GUI thread.
+    """
+    results = pyqtSignal(object)
+    master = pyqtSignal(str)
+    info = pyqtSignal(str)
+    calibration = pyqtSignal(str)
+
+
+
 class SeeingMonitor(QMainWindow, Ui_MainWindow):
 
-    def __init__(self):
+    def __init__(self, sensor_roi=None, sink_format="Y800"):
         super(SeeingMonitor, self).__init__()
         self.setupUi(self)
 
         self.Camera = None
+        self.frame_ring = None
+        self.burst = None           # Burst acquisition buffer, None when every frame is processed
+        self.processor = SeeingProcessor(durations=(60, 10 * 60))
         self.THRESH = None
         self.threshold_auto = False
+        self.background = BackgroundThreshold()     # Automatic threshold, from a sparse sample of the frame
+        self.calibration = Calibration()            # Master dark and flat, empty until recorded or loaded
+        self.master_builder = None                  # Master being recorded from the stream
+        self.master_kind = None                     # "dark" or "flat"
         self.frame = None
         self.draw_only_frame = None
+        self.preview_frame = None   # Latest annotated preview, prepared by the processing at the preview rate
+        self.preview_shown = None
+        self.preview_time = 0
+        self.sensor_roi = sensor_roi    # (x, y, width, height) of the analysed part of the frames, None for the full frame
+        self.sink_format = sink_format  # Pixel format requested to the camera: "Y800" (8-bit mono), "Y16" or "RGB32"
         self.video_source = VideoSource.NONE
-        self.export_video = False
+        self.exporter = VideoExporter()     # Encoder worker of the video export, fed by the processing
+        self.ring_recorder = None           # Black box of the last raw camera frames, None when disabled
+        self.freeze_thread = None
+        self.freeze_time = 0                # Time of the last freeze of the black box
+        self.auto_freeze = False
+        self.seeing_average = None          # Reference of the seeing spike trigger
         self.select_noiseArea = False
         self.coordinates_noiseArea = []
         self.lineedit_path.setText(QDir.currentPath())
         self.lineedit_filename.setText("seeing.csv")
-        self.save_filename = None
-        self._updateFileSave()
+        self.results_writer = ResultsWriter(self.lineedit_path.text(), self.lineedit_filename.text(), CSV_FIELDNAMES)
         self.pause_pressed = False
+        self.star = ""
 
         self.datetimeedit_start.setMinimumDateTime(QDateTime.currentDateTime())
         self.datetimeedit_end.setMinimumDateTime(QDateTime.currentDateTime())
+        self._updateRecordingRange()
 
         if platform.system() == 'Linux':
             self.button_start.setEnabled(False)
@@ -126,10 +192,24 @@ class SeeingMonitor(QMainWindow, Ui_MainWindow):
         self.button_import.clicked.connect(self.importVideo)
         self.button_export.clicked.connect(self.exportVideo)
         self.button_noise.clicked.connect(self.selectNoiseArea)
-        self.lineedit_path.textEdited.connect(self._updateFileSave)
-        self.lineedit_filename.textEdited.connect(self._updateFileSave)
+        self.lineedit_path.editingFinished.connect(self._updateFileSave)
+        self.lineedit_filename.editingFinished.connect(self._updateFileSave)
+        self.lineedit_star.textChanged.connect(self._updateStar)
+        self.datetimeedit_start.dateTimeChanged.connect(self._updateRecordingRange)
+        self.datetimeedit_end.dateTimeChanged.connect(self._updateRecordingRange)
         self.slider_threshold.valueChanged.connect(self._updateThreshold)
         self.checkbox_thresh.stateChanged.connect(self._updateThresholdState)
+        self.checkbox_tracking.stateChanged.connect(self._updateTracking)
+        self.combobox_centroid.currentIndexChanged.connect(self._updateCentroidEstimator)
+        self.spinbox_apertures.valueChanged.connect(self._updateApertures)
+        self.checkbox_stats.stateChanged.connect(self._updateStatsState)
+        self.combobox_span.currentIndexChanged.connect(self._updateChartSpan)
+        self.button_dark.clicked.connect(lambda: self._recordMaster("dark"))
+        self.button_flat.clicked.connect(lambda: self._recordMaster("flat"))
+        self.button_masters.clicked.connect(self.loadMasters)
+        self.checkbox_calibration.stateChanged.connect(self._updateCalibrationState)
+        self.button_freeze.clicked.connect(lambda: self.freezeBlackBox("manual"))
+        self.checkbox_autofreeze.stateChanged.connect(self._updateAutoFreeze)
 
         # Update the Tilt value
         self.spinbox_b.valueChanged.connect(self._updateFormulaZTilt)
@@ -137,29 +217,38 @@ class SeeingMonitor(QMainWindow, Ui_MainWindow):
         # Update the constants in the FWHM seeing formula
         self.spinbox_d.valueChanged.connect(self._updateFormulaConstants)
         self.spinbox_lambda.valueChanged.connect(self._updateFormulaConstants)
+        # Update the pixel scale used to convert the seeing to arcsec
+        self.spinbox_pwidth.valueChanged.connect(self._updatePlateScale)
+        self.spinbox_pheight.valueChanged.connect(self._updatePlateScale)
+        self.spinbox_focal.valueChanged.connect(self._updatePlateScale)
+        self.spinbox_preview.valueChanged.connect(self._updatePreviewRate)
+        self.spinbox_burst.valueChanged.connect(self._updateBurst)
+        self.spinbox_cadence.valueChanged.connect(self._updateBurst)
 
 
         # Timer for acquiring images at regular intervals
         self.acquisition_timer = QTimer(parent=self.centralwidget)
         self.timer_interval = None
 
+        # The preview is refreshed at its own rate, whatever the processing rate
+        self.preview_timer = QTimer(parent=self.centralwidget)
+        self.preview_timer.timeout.connect(self._refreshPreview)
+        self._updatePreviewRate(self.spinbox_preview.value())
+        self.preview_timer.start()
+
 
         self._updateThreshold()
         self._updateFormulaZTilt()
         self._updateFormulaConstants()
+        self._updatePlateScale()
+        self._updateBurst()
 
-
-        # Storing the Delta X and Y in an array to calculate the Standard Deviation
-        self.arr_delta_x = deque(maxlen=100)
-        self.arr_delta_y = deque(maxlen=100)
-
-        self.plot_length = 1000
         self.fwhm_lat = 0
         self.fwhm_tra = 0
-        self.max_lat = 1
-        self.min_lat = 0
-        self.max_tra = 1
-        self.min_tra = 0
+
+        # Whole night of seeing values, the chart only shows a min/max decimation of it
+        self.history = SeeingHistory()
+        self.chart_span = CHART_SPANS[self.combobox_span.currentIndex()]
 
 
         self.series_lat = QLineSeries()
@@ -175,17 +264,17 @@ class SeeingMonitor(QMainWindow, Ui_MainWindow):
         self.axis_horizontal = QDateTimeAxis()
         self.axis_horizontal.setMin(QDateTime.currentDateTime().addSecs(-60 * 1))
         self.axis_horizontal.setMax(QDateTime.currentDateTime().addSecs(0))
-        self.axis_horizontal.setFormat("HH:mm:ss.zzz")
+        self.axis_horizontal.setFormat("HH:mm:ss")
         self.axis_horizontal.setLabelsFont(QFont(QFont.defaultFamily(self.font()), pointSize=5))
         self.axis_horizontal.setLabelsAngle(-20)
         self.chart.addAxis(self.axis_horizontal, Qt.AlignBottom)
 
         self.axis_vertical_lat = QValueAxis()
-        self.axis_vertical_lat.setRange(self.max_lat, self.min_lat)
+        self.axis_vertical_lat.setRange(0, 1)
         self.chart.addAxis(self.axis_vertical_lat, Qt.AlignLeft)
 
         self.axis_vertical_tra = QValueAxis()
-        self.axis_vertical_tra.setRange(self.max_tra, self.min_tra)
+        self.axis_vertical_tra.setRange(0, 1)
         self.chart.addAxis(self.axis_vertical_tra, Qt.AlignRight)
 
         self.series_lat.attachAxis(self.axis_horizontal)
@@ -202,57 +291,120 @@ class SeeingMonitor(QMainWindow, Ui_MainWindow):
         self.chartView.setSizePolicy(QSizePolicy.Maximum, QSizePolicy.Maximum)
         self.chartView.setRenderHint(QPainter.Antialiasing)
 
+        self.chart_timer = QTimer(parent=self.centralwidget)
+        self.chart_timer.timeout.connect(self._plotSeeing)
+        self.chart_timer.start(CHART_REFRESH)
+
+
+        # Per-frame results are delivered in order, and in batches, by a single worker:
+        # CSV directly from the worker, chart and labels on the GUI thread. The video
+        # export has its own worker, which drops frames rather than slowing the processing
+        self.result_signal = ResultSignal()
+        self.result_signal.results.connect(self._showResults)
+        self.result_signal.master.connect(self._saveMaster)
+        self.result_signal.info.connect(self.label_info.setText)
+        self.result_signal.calibration.connect(self._calibrationDisabled)
+
+        self.sink = ResultSink(policy=OverflowPolicy.BLOCK)
+        self.sink.register(self._writeCSV)
+        self.sink.register(self.result_signal.results.emit)
+        self.sink.registerIdle(self.results_writer.flushIfDue)
+        self.sink.start()
+
+
+        # Instrumentation of the processing path, off by default
+        self.stats = PipelineStats()
+        self.stats.addGauge("dropped_driver", lambda: self.frame_ring.dropped_driver)
+        self.stats.addGauge("dropped_full", lambda: self.frame_ring.dropped_full)
+        self.stats.addGauge("dropped_sink", lambda: self.sink.dropped)
+        self.stats.addGauge("frame_ring_depth", lambda: self.frame_ring.qsize())
+        self.stats.addGauge("sink_depth", self.sink.qsize)
+        self.stats.addGauge("export_written", lambda: self.exporter.written)
+        self.stats.addGauge("export_dropped", lambda: self.exporter.dropped)
+        self.stats.addGauge("export_depth", self.exporter.qsize)
+        self.stats_timer = QTimer(parent=self.centralwidget)
+        self.stats_timer.timeout.connect(self._showStats)
+        self.label_stats.setVisible(False)
+
 
     def closeEvent(self, event):
+        self.video_source = VideoSource.NONE
+
         try:
             self.Camera.StopLive()
         except AttributeError:
             pass
 
+        self.sink.stop(timeout=5)
+        self.results_writer.close()
+        self.stats.stopDump()
+
         try:
             self.cap.release()
         except AttributeError:
             pass
 
-        try:
-            self.video_writer.release()
-        except AttributeError:
-            pass
+        self.exporter.close()
+        self._stopBlackBox()
 
         event.accept()
 
 
     def _callbackFunction(self, hGrabber, pBuffer, framenumber, pData):
-        """ This is an example callback function for image processig  with 
-            opencv. The image data in pBuffer is converted into a cv Matrix
-            and with cv.mean() the average brightness of the image is
-            measuered.
+        """ Frame ready callback, called from the driver thread.
+            The image is only copied into the frame ring buffer, the processing
+            is done by `_processCameraFrames` in its own thread.
 
         :param: hGrabber: This is the real pointer to the grabber object.
         :param: pBuffer : Pointer to the first pixel's first byte
         :param: framenumber : Number of the frame since the stream started
         :param: pData : Pointer to additional user data structure
         """
-        if pData.buffer_size > 0:
-            image = C.cast(pBuffer, C.POINTER(C.c_ubyte * pData.buffer_size))
-
-            cvMat = np.ndarray(
-                buffer = image.contents,
-                dtype  = np.uint8,
-                shape  = (pData.height, pData.width, pData.iBitsPerPixel)
-            )
-
-            frame = np.uint8(cvMat)
-            self.frame = cv2.resize(frame, (640, 480))
-            self.draw_only_frame = self.frame.copy()
-            self._monitor()
+        if pData.buffer_size <= 0:
+            return
+        if self.ring_recorder is not None:
+            self.ring_recorder.push(pBuffer, framenumber)
+        if self.burst is not None:
+            self.burst.push(pBuffer, framenumber)
+        elif self.frame_ring is not None:
+            self.frame_ring.push(pBuffer, framenumber)
+
+
+    def _processCameraFrames(self):
+        while self.video_source == VideoSource.CAMERA:
+            index = self.frame_ring.get(timeout=0.1)
+            if index is None:
+                continue
+
+            try:
+                self._setFrame(self.frame_ring.frames[index])
+                self._monitor()
+            finally:
+                self.frame_ring.release(index)
+
+
+    def _processCameraBursts(self):
+        """ Burst mode: capture `burst_length` frames, process them at once, and wait for the next burst. """
+        while self.video_source == VideoSource.CAMERA:
+            start = time.time()
+
+            self.burst.arm()
+            while not self.burst.wait(timeout=0.1):
+                if self.video_source != VideoSource.CAMERA:
+                    self.burst.disarm()
+                    return
+
+            self._monitorBurst()
+
+            while self.video_source == VideoSource.CAMERA and time.time() < start + self.burst_cadence:
+                time.sleep(min(0.1, max(start + self.burst_cadence - time.time(), 0)))
 
 
     def _startLiveCamera(self):
 
-        # Create a function pointer
-        Callbackfunc = IC.TIS_GrabberDLL.FRAMEREADYCALLBACK(self._callbackFunction)
-        ImageDescription = CallbackUserData()    
+        # Create a function pointer, kept alive as long as the camera may call it
+        self.Callbackfunc = IC.TIS_GrabberDLL.FRAMEREADYCALLBACK(self._callbackFunction)
+        self.ImageDescription = ImageDescription = CallbackUserData()
 
         # Create the camera object
         self.Camera = IC.TIS_CAM()
@@ -265,11 +417,14 @@ class SeeingMonitor(QMainWindow, Ui_MainWindow):
             return
 
         # Now pass the function pointer and our user data to the library
-        self.Camera.SetFrameReadyCallback(Callbackfunc, ImageDescription)
+        self.Camera.SetFrameReadyCallback(self.Callbackfunc, ImageDescription)
 
         # Handle each incoming frame automatically
         self.Camera.SetContinuousMode(0)
 
+        # Mono frames (1 or 2 bytes per pixel) are processed without any colour conversion
+        self.Camera.SetFormat(IC.SinkFormats[self.sink_format])
+
         print('Starting live stream ...')
         self.Camera.StartLive(0)    ####### PAUSE LIVE STREAM WHEN PAUSE CLICKED ??? ##############################################
         # self.Camera.StartLive(1)
@@ -278,10 +433,31 @@ class SeeingMonitor(QMainWindow, Ui_MainWindow):
         ImageDescription.width = Imageformat[0]
         ImageDescription.height= Imageformat[1]
         ImageDescription.iBitsPerPixel=Imageformat[2]//8
-        ImageDescription.buffer_size = ImageDescription.width * ImageDescription.height * ImageDescription.iBitsPerPixel
 
-        while self.video_source == VideoSource.CAMERA:
-            pass
+        if Imageformat[2] != SINK_FORMAT_BITS[self.sink_format]:
+            self._info("The camera does not provide the format {}, {} bits per pixel are used".format(
+                self.sink_format, Imageformat[2]))
+        self._checkSensorRoi(ImageDescription.width, ImageDescription.height)
+
+        if self.Camera.GetFormat() == IC.SinkFormats.Y16:
+            self.frame_ring = FrameRingBuffer((ImageDescription.height, ImageDescription.width), dtype=np.uint16)
+        elif ImageDescription.iBitsPerPixel == 1:
+            self.frame_ring = FrameRingBuffer((ImageDescription.height, ImageDescription.width))
+        else:
+            self.frame_ring = FrameRingBuffer(
+                (ImageDescription.height, ImageDescription.width, ImageDescription.iBitsPerPixel))
+
+        self._startBlackBox(self.frame_ring.frames.shape[1:], self.frame_ring.frames.dtype)
+
+        # Processing thread, the driver thread only fills the frame ring buffer (or the burst buffer)
+        if self.burst_length > 0:
+            self.burst = BurstBuffer(self.burst_length, self.frame_ring.frames.shape[1:], self.frame_ring.frames.dtype)
+            ImageDescription.buffer_size = self.burst.nbytes
+            self._processCameraBursts()
+        else:
+            self.burst = None
+            ImageDescription.buffer_size = self.frame_ring.nbytes
+            self._processCameraFrames()
 
         # self.timer_interval = 20
         # try:
@@ -321,6 +497,8 @@ class SeeingMonitor(QMainWindow, Ui_MainWindow):
             logging.error(traceback.format_exc())
             QMessageBox.warning(self, "Property Dialog Error", traceback.format_exc())
 
+        self._readExposure()
+
 
     # def _updateLiveCamera(self):
     #     # Capturing a frame
@@ -364,7 +542,7 @@ class SeeingMonitor(QMainWindow, Ui_MainWindow):
 
         # Generating fake images of DIMM star (One single star that is split by the DIMM)
         self.starsGenerator = FakeStars()
-        self.timer_interval = 100
+        self.timer_interval = TIMER_INTERVAL
 
         try:
             self.acquisition_timer.disconnect()
@@ -375,28 +553,51 @@ class SeeingMonitor(QMainWindow, Ui_MainWindow):
 
 
     def _updateSimulation(self):
-        frame = self.starsGenerator.generate()
-        self.frame = cv2.resize(frame, (640, 480))
-        self.draw_only_frame = self.frame.copy()
+        self._setFrame(self.starsGenerator.generate())
         self._monitor()
 
 
-################################################################################################################################################################
-    def _writeCSV(self, headerOnly=False):
-        if headerOnly:
-            with open(self.save_filename, "w") as csvFile:
-                fieldnames = ["timestamp", "lateral", "transversal", "star"]
-                writer = csv.DictWriter(csvFile, fieldnames=fieldnames)
-                writer.writeheader()
-                csvFile.close()
+    def _setFrame(self, frame):
+        """ New frame to analyse, at native resolution (cropped to the sensor ROI, if any). """
+        if self.sensor_roi is not None and self._checkSensorRoi(frame.shape[1], frame.shape[0]):
+            x, y, width, height = self.sensor_roi
+            frame = frame[y:y + height, x:x + width]
+
+        self.frame = frame
+
+
+    def _checkSensorRoi(self, width, height):
+        """ Keep the sensor ROI only if it lies within frames of `width` x `height` pixels. """
+        if self.sensor_roi is None:
+            return False
+        x, y, roi_width, roi_height = self.sensor_roi
+        if x + roi_width <= width and y + roi_height <= height:
+            return True
+        self._info("The sensor ROI {} does not fit in the {}x{} frames, the full frame is analysed".format(
+            self.sensor_roi, width, height))
+        self.sensor_roi = None
+        return False
+
+
+    def _info(self, text):
+        """ Message of the processing, shown in `label_info` from the GUI thread. """
+        logging.warning(text)
+        self.result_signal.info.emit(text)
 
+
+    def _resetDrawOnlyFrame(self):
+        # Overlays are drawn in colour on an 8-bit copy of the frame
+        self.draw_only_frame = toBGR(self.frame)
+
+
+################################################################################################################################################################
+    def _writeCSV(self, results):
+        rows = [[int(result.timestamp), result.fwhm_lat, result.fwhm_tra, result.star]
+            for result in results if result.fwhm_lat is not None]
+        if rows:
+            self.results_writer.write(rows)
         else:
-            with open(self.save_filename, "a") as csvFile:
-                writer = csv.writer(csvFile)
-                writer.writerow([self.current.toTime_t() , self.fwhm_lat, self.fwhm_tra, self.lineedit_star.text()])
-                # csvFile.write(",".join([str(self.current) , str(self.fwhm_lat), str(self.fwhm_tra), self.lineedit_star.text()]))
-                # csvFile.write("\n")
-                # csvFile.close()
+            self.results_writer.flushIfDue()
 
 
     def selectNoiseArea(self):
@@ -407,6 +608,13 @@ class SeeingMonitor(QMainWindow, Ui_MainWindow):
 
 
     def _set_noiseArea(self, x1, y1, x2, y2):
+        # From the preview coordinates to the analysed frame coordinates
+        if self.frame is not None:
+            scale_x = self.frame.shape[1] / float(DISPLAY_SIZE[0])
+            scale_y = self.frame.shape[0] / float(DISPLAY_SIZE[1])
+            x1, x2 = int(x1 * scale_x), int(x2 * scale_x)
+            y1, y2 = int(y1 * scale_y), int(y2 * scale_y)
+
         if len(self.coordinates_noiseArea) == 0:
             self.coordinates_noiseArea.append([x1, y1])
             self.coordinates_noiseArea.append([x2, y2])
@@ -415,6 +623,9 @@ class SeeingMonitor(QMainWindow, Ui_MainWindow):
             self.coordinates_noiseArea[0] = [x1, y1]
             self.coordinates_noiseArea[1] = [x2, y2]
 
+        if self.threshold_auto:
+            self.background.setArea(self._noiseArea())
+
 
     def _draw_noiseArea(self):
         if len(self.coordinates_noiseArea) >= 2:
@@ -425,198 +636,530 @@ class SeeingMonitor(QMainWindow, Ui_MainWindow):
                 (0, 255, 0), 1)
 
 
+    def _updateStar(self, text):
+        self.star = text
+
+
+    def _updateRecordingRange(self):
+        self.record_start = self.datetimeedit_start.dateTime().toMSecsSinceEpoch() / 1000.0
+        self.record_end = self.datetimeedit_end.dateTime().toMSecsSinceEpoch() / 1000.0
+
+
     def _updateFileSave(self):
-        self.save_filename = join(self.lineedit_path.text(), self.lineedit_filename.text())
-        self._writeCSV(headerOnly=True)
+        self.results_writer.setDestination(self.lineedit_path.text(), self.lineedit_filename.text())
 
 
     def _updateThreshold(self):
         if self.threshold_auto:
-            if self.coordinates_noiseArea.__len__() >= 2:
-                noise_area = self.frame[
-                    self.coordinates_noiseArea[0][1] : self.coordinates_noiseArea[1][1],
-                    self.coordinates_noiseArea[0][0] : self.coordinates_noiseArea[1][0]
-                ]
-                try:
-                    self.THRESH = noise_area.max() + 20
-                    # self.THRESH = int(round(noise_area.mean()))
-                except ValueError:
-                    return
+            return
+        self.THRESH = self.slider_threshold.value()
+        self.checkbox_thresh.setText("Threshold ({})".format(self.THRESH))
+        self.processor.thresh = self.THRESH
 
-                self.slider_threshold.setValue(self.THRESH)
-                self.checkbox_thresh.setText("Threshold ({}, auto)".format(self.THRESH))
-        else:
-            self.THRESH = self.slider_threshold.value()
-            self.checkbox_thresh.setText("Threshold ({})".format(self.THRESH))
+
+    def _showThreshold(self):
+        """
+        GUI thread: the threshold estimated by the processor itself (background level
+        + noise) in automatic mode, the widgets are only touched when it changes.
+        """
+        thresh = self.processor.thresh
+        if not self.threshold_auto or thresh == self.THRESH:
+            return
+        self.THRESH = thresh
+        self.slider_threshold.setValue(self.THRESH)
+        self.checkbox_thresh.setText("Threshold ({}, auto)".format(self.THRESH))
 
 
     def _updateThresholdState(self, state):
         if state == 0:
             self.threshold_auto = False
+            self.processor.background = None
             self.slider_threshold.setEnabled(True)
+            self._updateThreshold()
         else:
-            if self.coordinates_noiseArea.__len__() < 2:
-                QMessageBox.information(self, "Select Noise Area", "Please select the noise area")
-                self.selectNoiseArea()
-
+            # Whole frame, or the noise area when one is selected
+            self.background.setArea(self._noiseArea())
+            self.processor.background = self.background
             self.threshold_auto = True
             self.slider_threshold.setEnabled(False)
 
 
+    def _noiseArea(self):
+        if len(self.coordinates_noiseArea) < 2:
+            return None
+        (x1, y1), (x2, y2) = self.coordinates_noiseArea[:2]
+        if x1 == x2 or y1 == y2:
+            return None
+        return (x1, y1, x2, y2)
+
+
+    def _recordMaster(self, kind):
+        self.master_builder = MasterBuilder(MASTER_FRAMES)
+        self.master_kind = kind
+        self.label_info.setText("Recording the master {} ({} frames) ...".format(kind, MASTER_FRAMES))
+
+
+    def _addToMaster(self, frame):
+        """ Processing thread: accumulate a raw frame into the master being recorded, and use it once complete. """
+        if not self.master_builder.add(frame):
+            return
+
+        master = self.master_builder.master()
+        self.master_builder = None
+
+        dark, flat = self.calibration.dark, self.calibration.flat
+        if self.master_kind == "dark":
+            dark = master
+            if flat is not None and flat.shape != master.shape:
+                flat = None
+        else:
+            if dark is not None and dark.shape != master.shape:
+                dark = None
+            flat = master - dark if dark is not None else master
+        self.calibration.setMasters(dark, flat)
+        self.result_signal.master.emit(self.master_kind)
+
+
+    def _saveMaster(self, kind):
+        """ GUI thread: save the masters once one of them was recorded. """
+        filename = join(self.lineedit_path.text(), CALIBRATION_FILENAME)
+        try:
+            self.calibration.save(filename)
+        except Exception:
+            logging.error(traceback.format_exc())
+        self.label_info.setText("Master {} recorded, saved to '{}'".format(kind, filename))
+
+
+    def loadMasters(self):
+        options = QFileDialog.Options()
+        options |= QFileDialog.DontUseNativeDialog
+        filename, _ = QFileDialog.getOpenFileName(self,
+            "Load Master Frames",
+            self.lineedit_path.text(),
+            "Master Frames (*.npz);;All Files (*)",
+            options=options)
+
+        if filename:
+            try:
+                calibration = Calibration.load(filename)
+            except Exception:
+                QMessageBox.warning(self, "Load Master Frames", "Cannot load file '{}'.".format(filename))
+                return
+
+            self.calibration = calibration
+            self._updateCalibrationState(self.checkbox_calibration.checkState())
+
+
+    def _updateCalibrationState(self, state):
+        calibration = None
+        if state != 0:
+            if self.calibration.empty:
+                QMessageBox.information(self, "Calibration", "Please record or load the master frames")
+            elif self.frame is not None and self.frame.shape != self.calibration.shape:
+                QMessageBox.warning(self, "Calibration",
+                    "The master frames ({}) do not match the frames ({}).".format(self.calibration.shape, self.frame.shape))
+            else:
+                calibration = self.calibration
+
+            if calibration is None:
+                self.checkbox_calibration.setChecked(False)
+
+        self.processor.calibration = calibration
+
+
+    def _checkCalibration(self):
+        """ Processing thread: report a calibration disabled by the processor (masters not matching the frames). """
+        error = self.processor.calibration_error
+        if error is not None:
+            self.processor.calibration_error = None
+            self.result_signal.calibration.emit(error)
+
+
+    def _calibrationDisabled(self, error):
+        """ GUI thread: the calibration was disabled by the processing. """
+        self.checkbox_calibration.setChecked(False)
+        QMessageBox.warning(self, "Calibration", "The calibration was disabled: {}.".format(error))
+
+
+    def _startBlackBox(self, shape, dtype):
+        """ Black box of the raw camera frames, sized from `spinbox_ring` (MB), replaces the previous one. """
+        self._stopBlackBox()
+        megabytes = self.spinbox_ring.value()
+        if megabytes == 0:
+            return
+
+        capacity = max(2, megabytes * 1000000 // recordDtype(shape, dtype).itemsize)
+        try:
+            self.ring_recorder = RingRecorder(join(self.lineedit_path.text(), BLACKBOX_FILENAME), capacity, shape, dtype)
+        except Exception:
+            logging.error(traceback.format_exc())
+            return
+        self._readExposure()
+
+
+    def _stopBlackBox(self):
+        if self.ring_recorder is None:
+            return
+        recorder, self.ring_recorder = self.ring_recorder, None
+        if self.freeze_thread is not None:
+            self.freeze_thread.join()
+        recorder.close()
+
+
+    def _readExposure(self):
+        """ Exposure stored with the frames of the black box, read when the camera settings may have changed. """
+        if self.ring_recorder is None:
+            return
+        exposure = [float("nan")]
+        try:
+            self.Camera.GetPropertyAbsoluteValue("Exposure", "Value", exposure)
+        except Exception:
+            logging.error(traceback.format_exc())
+        self.ring_recorder.exposure = exposure[0]
+
+
+    def freezeBlackBox(self, reason="manual"):
+        """ Save the last seconds of the black box to a new file, from a background thread. """
+        recorder = self.ring_recorder
+        if recorder is None:
+            if reason == "manual":
+                self.label_info.setText("The black box is disabled (no camera started, or a size of 0 MB)")
+            return False
+        if self.freeze_thread is not None and self.freeze_thread.is_alive():
+            return False
+
+        self.freeze_time = time.time()
+        filename = join(self.lineedit_path.text(),
+            "blackbox_{}_{}{}".format(time.strftime("%Y%m%d-%H%M%S"), reason, RAW_EXTENSION))
+        self.freeze_thread = threading.Thread(target=self._freezeBlackBox,
+            args=(recorder, filename, self.spinbox_freeze.value()), daemon=True)
+        self.freeze_thread.start()
+        return True
+
+
+    def _freezeBlackBox(self, recorder, filename, seconds):
+        try:
+            frames = recorder.freeze(filename, seconds)
+            print("Black box: {} frames saved to '{}'".format(frames, filename))
+        except Exception:
+            logging.error(traceback.format_exc())
+
+
+    def _updateAutoFreeze(self, state):
+        self.auto_freeze = state != 0
+        self.seeing_average = None
+
+
+    def _autoFreeze(self, reason):
+        if time.time() - self.freeze_time >= FREEZE_COOLDOWN:
+            self.freezeBlackBox(reason)
+
+
+    def _checkSeeingSpike(self):
+        seeing = self.fwhm_lat
+        if not np.isfinite(seeing) or seeing <= 0:
+            return
+        if self.seeing_average is not None and seeing > FREEZE_SPIKE * self.seeing_average:
+            self._autoFreeze("spike")
+            return
+        self.seeing_average = seeing if self.seeing_average is None else \
+            self.seeing_average + 0.01 * (seeing - self.seeing_average)
+
+
+    def _updateTracking(self, state):
+        self.processor.tracking = state != 0
+        self.processor.previous_centroids = None
+
+
+    def _updateCentroidEstimator(self, index):
+        self.processor.estimator = CentroidEstimator(index)
+        self.processor.previous_centroids = None
+
+
+    def _updateApertures(self, apertures):
+        self.processor.setApertures(apertures)
+
+
+    def _updateStatsState(self, state):
+        if state == 0:
+            self.stats.enabled = False
+            self.stats.stopDump()
+            self.stats_timer.stop()
+            self.label_stats.setVisible(False)
+        else:
+            self.stats.reset()
+            self.stats.enabled = True
+            self.stats.startDump(join(self.lineedit_path.text(), STATS_FILENAME), STATS_DUMP_INTERVAL)
+            self.stats_timer.start(STATS_REFRESH)
+            self.label_stats.setVisible(True)
+
+
+    def _showStats(self):
+        self.label_stats.setText(self.stats.text())
+
+
+    def _updateBurst(self):
+        # Used from the next start of the camera
+        self.burst_length = self.spinbox_burst.value()
+        self.burst_cadence = self.spinbox_cadence.value()
+
+
+    def _updatePreviewRate(self, rate):
+        self.preview_interval = 1.0 / rate
+        self.preview_timer.setInterval(int(1000 / rate))
+
+
     def _updateFormulaZTilt(self):
         self.spinbox_d.setStyleSheet("QSpinBox { background-color: blue; }")
         try:
-            b = float(self.spinbox_b.value()) / float(self.spinbox_d.value())
+            self.processor.setBaseline(self.spinbox_b.value(), self.spinbox_d.value())
         except ZeroDivisionError:
             QMessageBox.warning(self, "Zero Division Error", "D (Apertures Diameter cannot be Zero")
             return
-        self.K_lat = 0.364 * (1 - 0.532 * np.power(b, -1 / 3) - 0.024 * np.power(b, -7 / 3))
-        self.K_tra = 0.364 * (1 - 0.798 * np.power(b, -1 / 3) - 0.018 * np.power(b, -7 / 3))
 
 
     def _updateFormulaConstants(self):
-        # Calculate value to make process faster
-        self.A = 0.98 * np.power(float(self.spinbox_d.value()) / float(self.spinbox_lambda.value()), 0.2)
-
-
-    def _calcSeeing(self):
-        std_x = np.std(self.arr_delta_x)
-        std_y = np.std(self.arr_delta_y)
-
-        # Seeing
-        self.current = QDateTime.currentDateTime()
-        self.fwhm_lat = self.A * np.power(std_x / self.K_lat, 0.6)
-        self.fwhm_tra = self.A * np.power(std_y / self.K_tra, 0.6)
+        self.processor.setWavelength(self.spinbox_d.value(), self.spinbox_lambda.value())
 
-        threading.Thread(target=self._plotSeeing, args=(), daemon=True).start()
-        threading.Thread(target=self._writeCSV, args=(), daemon=True).start()
 
-        self.label_info.setText("lat: " + str(self.fwhm_lat) + " | lon: " + str(self.fwhm_tra))
+    def _updatePlateScale(self):
+        self.processor.setPlateScale(
+            self.spinbox_pwidth.value(), self.spinbox_pheight.value(), self.spinbox_focal.value())
 
 
     def _calcSeeing_arcsec(self):
-        std_x = np.std(self.arr_delta_x)
-        std_y = np.std(self.arr_delta_y)
-
         # Seeing
-        self.current = QDateTime.currentDateTime()
-        self.fwhm_lat = self.A * np.power(std_x / self.K_lat, 0.6) * 205.0 * self.spinbox_pwidth.value() / self.spinbox_focal.value()
-        self.fwhm_tra = self.A * np.power(std_y / self.K_tra, 0.6) * 205.0 * self.spinbox_pheight.value() / self.spinbox_focal.value()
+        self.fwhm_lat, self.fwhm_tra = self.processor.seeing()
 
-        threading.Thread(target=self._plotSeeing, args=(), daemon=True).start()
-        threading.Thread(target=self._writeCSV, args=(), daemon=True).start()
 
-        self.label_info.setText("lat: " + str(self.fwhm_lat) + " | lon: " + str(self.fwhm_tra))
+    def _seeingWindows(self):
+        """ `(name, lateral, transversal)` seeing of every statistics window, then of every pair of apertures. """
+        seeing = [(window.name,) + tuple(self.processor.seeing(index))
+            for index, window in enumerate(self.processor.windows)]
+        if len(self.processor.pairs) > 1:
+            seeing += [("pair {}-{}".format(i + 1, j + 1), fwhm_lat, fwhm_tra)
+                for (i, j), fwhm_lat, fwhm_tra in self.processor.pairSeeing()]
+        return seeing
 
 
     def _monitor(self):
 
         tic = time.time()
+        measured = False
+        centroids = None
 
-        gray = cv2.cvtColor(self.frame, cv2.COLOR_BGR2GRAY)
-
-        self._updateThreshold()
-        _, thresholded = cv2.threshold(gray, self.THRESH, 255, cv2.THRESH_TOZERO)
+        stats = self.stats
+        if stats.enabled:
+            lap = stats.clock()
 
-        # _, contours, _ = cv2.findContours(thresholded, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        contours, _ = cv2.findContours(thresholded, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
+        if self.master_builder is not None:
+            self._addToMaster(self.frame)
 
-        contours = contours[:2]
+        contours = self.processor.findSpots(self.frame)
+        self._checkCalibration()
+        if stats.enabled:
+            lap = stats.lap("detection", lap)
 
         # if contours.__len__() > 2:
         #     QMessageBox.warning(self, "Thresholding error", "More than 2 projections were found. " + \
         #         "Please increase threshold manually or select a better noise area.")
 
-        cv2.drawContours(self.draw_only_frame, contours, -1, (0,255,0), 2)
-        self._draw_noiseArea()
-
         try:
-            moments_star_1 = cv2.moments(contours[0])
-            moments_star_2 = cv2.moments(contours[1])
+            centroids = self.processor.centroids(self.frame, contours)
 
         except IndexError:
-            print("Only {} were found ! (Must be at least 2)".format(len(contours)))
+            if stats.enabled:
+                stats.count("lost_spots")
+                stats.count("rejected")
+            if self.auto_freeze:
+                self._autoFreeze("lost_spots")
+
+        except ZeroDivisionError:
+            if stats.enabled:
+                stats.count("zero_moment")
+                stats.count("rejected")
+            return
 
         else:
+            if stats.enabled:
+                lap = stats.lap("centroids", lap)
 
-            try:
-                cX_star1 = int(moments_star_1["m10"] / moments_star_1["m00"])
-                cY_star1 = int(moments_star_1["m01"] / moments_star_1["m00"])
+            if self.enable_seeing.isChecked():
+                self.processor.addDeltas(centroids)
 
-                cX_star2 = int(moments_star_2["m10"] / moments_star_2["m00"])
-                cY_star2 = int(moments_star_2["m01"] / moments_star_2["m00"])
+                self._calcSeeing_arcsec()
+                measured = True
+                if self.auto_freeze:
+                    self._checkSeeingSpike()
 
-            except ZeroDivisionError:
-                return
+                if stats.enabled:
+                    lap = stats.lap("statistics", lap)
 
-            if self.enable_seeing.isChecked():
-                delta_x = abs(cX_star2 - cX_star1)
-                delta_y = abs(cY_star2 - cY_star1)
+        finally:
+            if stats.enabled:
+                lap = stats.clock()
+
+            # Overlays are only drawn on the frames which will be shown
+            if tic - self.preview_time >= self.preview_interval:
+                self.preview_time = tic
+                self._updatePreview(contours, centroids)
+
+                if stats.enabled:
+                    lap = stats.lap("preview", lap)
+
+            # The frame may be a slot of the frame ring buffer: copied only if it is exported
+            exported = self._exporting(tic)
+            frame = self.frame.copy() if exported else None
+            if measured:
+                seeing = self._seeingWindows()
+                result = FrameResult(tic, self.fwhm_lat, self.fwhm_tra, self.star, seeing, contours, centroids, frame)
+            else:
+                result = FrameResult(tic, None, None, self.star, [], contours, centroids, frame)
+            self.sink.put(result)
+            if exported:
+                self.exporter.put(result)
+
+            if stats.enabled:
+                stats.lap("sink", lap)
+                stats.record("total", time.time() - tic)
+                stats.count("processed")
+
+
+    def _monitorBurst(self):
+        """ Processing of a whole burst: vectorized centroids, then one seeing value for the burst. """
+        tic = time.time()
+        burst = self.burst
+        measured = False
 
-                self.arr_delta_x.append(delta_x)
-                self.arr_delta_y.append(delta_y)
+        stats = self.stats
+        if stats.enabled:
+            lap = stats.clock()
 
-                # self._calcSeeing()
-                self._calcSeeing_arcsec()
+        # Only the frames captured by this burst, which may have ended early
+        filled = burst.filled
+        if filled == 0:
+            return
+        frames = burst.frames[:filled]
+        timestamps = burst.timestamps[:filled]
+        if self.sensor_roi is not None:
+            x, y, width, height = self.sensor_roi
+            frames = frames[:, y:y + height, x:x + width]
+
+        for frame in frames:
+            if self.master_builder is None:
+                break
+            self._addToMaster(frame)
+
+        self._setFrame(burst.frames[filled - 1])
+        centroids = self.processor.centroidsStack(frames)
+        self._checkCalibration()
+        valid = np.isfinite(centroids).all(axis=(1, 2))
+
+        if stats.enabled:
+            lap = stats.lap("burst", lap)
+            stats.count("bursts")
+            stats.count("processed", filled)
+            stats.count("rejected", int((~valid).sum()))
+            stats.count("dropped_burst", burst.dropped)
+
+        if self.enable_seeing.isChecked():
+            self.processor.addDeltasStack(centroids, timestamps)
+            seeing = self.processor.stackSeeing(centroids)
+            if seeing is not None:
+                self.fwhm_lat, self.fwhm_tra = seeing
+                measured = True
+
+        last = centroids[-1].tolist() if valid[-1] else None
+        self._updatePreview([], last)
+
+        if self._exporting(timestamps[0]):
+            for index in range(filled):
+                self.exporter.put(FrameResult(timestamps[index], None, None, self.star, [], [],
+                    centroids[index].tolist() if valid[index] else None, frames[index].copy()))
+
+        if measured:
+            seeing = self._seeingWindows()
+            self.sink.put(FrameResult(
+                timestamps[0], self.fwhm_lat, self.fwhm_tra, self.star, seeing, [], last, None))
+
+        if stats.enabled:
+            stats.record("total", time.time() - tic)
+
+
+    def _updatePreview(self, contours, centroids):
+        """ Annotated preview of the current frame, shown by the GUI thread on its next refresh. """
+        self._resetDrawOnlyFrame()
+        drawOverlay(self.draw_only_frame, contours, centroids)
+        self._draw_noiseArea()
 
+        frame = self.draw_only_frame
+        if (frame.shape[1], frame.shape[0]) != DISPLAY_SIZE:
+            frame = cv2.resize(frame, DISPLAY_SIZE, interpolation=cv2.INTER_AREA)
+        self.preview_frame = frame
 
-            cv2.drawMarker(
-                self.draw_only_frame,
-                (cX_star1, cY_star1),
-                color=(0, 0, 255), markerSize=30, thickness=1)
-            cv2.drawMarker(
-                self.draw_only_frame,
-                (cX_star2, cY_star2),
-                color=(0, 0, 255), markerSize=30, thickness=1)
 
-        finally:
+    def _refreshPreview(self):
+        """ GUI thread, at the preview rate: show the latest preview, if it changed. """
+        frame = self.preview_frame
+        if frame is None or frame is self.preview_shown:
+            return
+        self.preview_shown = frame
+        self._displayImage(frame)
 
-            self._displayImage()
 
-            threading.Thread(target=self._writeVideoFile, args=(), daemon=True).start()
+    def _displayImage(self, frame=None):
+        if frame is None:
+            frame = self.draw_only_frame
+        if (frame.shape[1], frame.shape[0]) != DISPLAY_SIZE:
+            frame = cv2.resize(frame, DISPLAY_SIZE, interpolation=cv2.INTER_AREA)
 
-        toc = time.time()
-        elapsed = toc - tic
-        try:
-            print("FPS max = {}".format(int(1.0 / elapsed)))
-        except ZeroDivisionError:
-            pass
+        qImage = array2qimage(frame)
+        self.stars_capture.setPixmap(QPixmap(qImage))
 
 
-    def _displayImage(self):
-        qImage = array2qimage(self.draw_only_frame)
-        self.stars_capture.setPixmap(QPixmap(qImage))
+    def _showResults(self, results):
+        """ GUI thread: history of the chart and seeing labels, for a batch of results of the sink. """
+        self._showThreshold()
 
+        results = [result for result in results if result.fwhm_lat is not None]
+        if not results:
+            return
 
-    def _plotSeeing(self):
+        self.history.append(
+            [result.timestamp for result in results],
+            [(result.fwhm_lat, result.fwhm_tra) for result in results])
 
-        self.axis_horizontal.setMin(QDateTime.currentDateTime().addSecs(-60 * 1))
-        self.axis_horizontal.setMax(QDateTime.currentDateTime().addSecs(0))
+        info = ""
+        for name, fwhm_lat, fwhm_tra in results[-1].seeing:
+            info += "{}: lat: {:.3f} | lon: {:.3f}\n".format(name, fwhm_lat, fwhm_tra)
+        self.label_info.setText(info.strip())
 
-        if self.series_lat.count() > self.plot_length - 1:
-            self.series_lat.removePoints(0, self.series_lat.count() - self.plot_length - 1)
 
-        if self.series_tra.count() > self.plot_length - 1:
-            self.series_tra.removePoints(0, self.series_tra.count() - self.plot_length - 1)
+    def _updateChartSpan(self, index):
+        self.chart_span = CHART_SPANS[index]
+        self._plotSeeing()
 
-        if self.fwhm_lat > self.max_lat:
-            self.max_lat = self.fwhm_lat
-            self.axis_vertical_lat.setMax(self.max_lat + 10)
-        if self.fwhm_lat < self.min_lat:
-            self.min_lat = self.fwhm_lat
-            self.axis_vertical_lat.setMax(self.min_lat - 10)
-        if self.fwhm_tra > self.max_tra:
-            self.max_tra = self.fwhm_tra
-            self.axis_vertical_tra.setMax(self.max_tra + 10)
-        if self.fwhm_tra < self.min_tra:
-            self.min_tra = self.fwhm_tra
-            self.axis_vertical_tra.setMax(self.min_tra - 10)
 
+    def _plotSeeing(self):
+        """ Chart timer: min/max envelope of the history over the selected span, one bucket per pixel. """
+        if len(self.history) == 0:
+            return
+
+        end = max(time.time(), self.history.last())
+        start = self.history.first() if self.chart_span is None else end - self.chart_span
+        buckets = max(int(self.chart.plotArea().width()), 100)
+        timestamps, values = self.history.decimate(start, end, buckets)
 
-        # print(self.fwhm_lat, self.fwhm_tra)
+        timestamps = (timestamps * 1000.0).tolist()
+        self.series_lat.replace([QPointF(t, v) for t, v in zip(timestamps, values[:, 0].tolist())])
+        self.series_tra.replace([QPointF(t, v) for t, v in zip(timestamps, values[:, 1].tolist())])
 
-        self.series_lat.append(self.current.toMSecsSinceEpoch(), self.fwhm_lat)
-        self.series_tra.append(self.current.toMSecsSinceEpoch(), self.fwhm_tra)
+        self.axis_horizontal.setFormat("HH:mm:ss" if end - start <= 60 * 60 else "HH:mm")
+        self.axis_horizontal.setRange(
+            QDateTime.fromMSecsSinceEpoch(int(start * 1000)), QDateTime.fromMSecsSinceEpoch(int(end * 1000)))
+        if len(values) > 0:
+            self.axis_vertical_lat.setRange(0, float(values[:, 0].max()) * 1.1)
+            self.axis_vertical_tra.setRange(0, float(values[:, 1].max()) * 1.1)
 
 
     def importVideo(self):
@@ -630,14 +1173,16 @@ class SeeingMonitor(QMainWindow, Ui_MainWindow):
         filename, _ = QFileDialog.getOpenFileName(self,
             "Import from Video File",
             QDir.currentPath(),
-            "Video Files (*.avi *.mp4 *.mpeg *.flv *.3gp *.mov);;All Files (*)",
+            "Video Files (*.avi *.mp4 *.mpeg *.flv *.3gp *.mov *{});;All Files (*)".format(RAW_EXTENSION),
             options=options)
 
         if filename:
             if self.Camera != None and self.Camera.IsDevValid() == 1:
                 self.Camera.StopLive()
 
-            self.cap = cv2.VideoCapture(filename)
+            # Raw video files are replayed from the mapped file, without decoding (copy-on-write
+            # frames, for the in-place calibration)
+            self.cap = openVideo(filename, writable=True)
 
             # print("CAP_PROP_POS_MSEC :", self.cap.get(cv2.CAP_PROP_POS_MSEC))
             # print("CAP_PROP_POS_FRAMES :", self.cap.get(cv2.CAP_PROP_POS_FRAMES))
@@ -666,7 +1211,9 @@ class SeeingMonitor(QMainWindow, Ui_MainWindow):
                 QMessageBox.warning(self, "Import from Video", "Cannot load file '{}'.".format(filename))
                 return
 
-            self.timer_interval = round(1000.0 / self.cap.get(cv2.CAP_PROP_FPS))
+            # Raw files report 0 FPS with less than two frames or equal timestamps, as OpenCV does for unknown rates
+            fps = self.cap.get(cv2.CAP_PROP_FPS)
+            self.timer_interval = max(round(1000.0 / fps), 1) if fps > 0 else TIMER_INTERVAL
             try:
                 self.acquisition_timer.disconnect()
             except TypeError:
@@ -678,8 +1225,7 @@ class SeeingMonitor(QMainWindow, Ui_MainWindow):
     def _grabVideoFrame(self):
         ret, frame = self.cap.read()
         if ret == True:
-            self.frame = cv2.resize(frame, (640, 480))
-            self.draw_only_frame = self.frame.copy()
+            self._setFrame(frame)
             self._monitor()
 
         else:
@@ -708,31 +1254,23 @@ class SeeingMonitor(QMainWindow, Ui_MainWindow):
         filename, _ = QFileDialog.getSaveFileName(self,
             "Export to Video File",
             QDir.currentPath(),
-            "All Files (*);;Video Files (*.avi *.mp4 *.mpeg *.flv *.3gp *.mov)",
+            "MJPG Video (*.avi);;Raw Frames, lossless (*{});;All Files (*)".format(RAW_EXTENSION),
             options=options)
 
         if filename:
-            if splitext(filename)[1] != ".avi":
+            if splitext(filename)[1] not in (".avi", RAW_EXTENSION):
                 filename = splitext(filename)[0] + ".avi"
-                QMessageBox.information(self, "Export to Video File", "Only '.avi' extension is supported. Video will be saved as '{}'".format(filename))
+                QMessageBox.information(self, "Export to Video File",
+                    "Only '.avi' and '{}' extensions are supported. Video will be saved as '{}'".format(RAW_EXTENSION, filename))
 
-            print(round(1000.0 / float(self.timer_interval)))
+            # The file is created on the first frame, with the size of the analysed frames
+            fps = round(1000.0 / float(self.timer_interval)) if self.timer_interval else EXPORT_FPS
+            self.exporter.open(filename, fps, annotate=self.checkbox_overlay.isChecked())
 
-            self.video_writer = cv2.VideoWriter(
-                filename,
-                cv2.VideoWriter_fourcc(*'MJPG'),
-                round(1000.0 / float(self.timer_interval)),
-                (640, 480)  #################################################################################
-            )
-            self.export_video = True
 
-    def _writeVideoFile(self):
-        current = QDateTime.currentDateTime()
-        if self.export_video and current >= self.datetimeedit_start.dateTime() and \
-            current < self.datetimeedit_end.dateTime():
-
-            # self.video_writer.write(self.frame)
-            self.video_writer.write(self.draw_only_frame)
+    def _exporting(self, timestamp):
+        """ Whether the frame taken at `timestamp` is to be exported. """
+        return self.exporter.active and self.record_start <= timestamp < self.record_end
 
 
     def _setPauseButton(self):
@@ -759,6 +1297,7 @@ class SeeingMonitor(QMainWindow, Ui_MainWindow):
         self._setPauseButton()
 
         if self.video_source == VideoSource.CAMERA:
+            self.frame_ring.reset()
             self.Camera.StartLive(0)
         else:
             try:
@@ -780,14 +1319,34 @@ class SeeingMonitor(QMainWindow, Ui_MainWindow):
 
 
 
-if __name__ == '__main__':
+def parseArguments(argv):
+    """ Options of the monitor, the other arguments are left to Qt. """
+    parser = argparse.ArgumentParser(description="Real-time DIMM seeing monitor.")
+    parser.add_argument("--roi", type=int, nargs=4, metavar=("X", "Y", "WIDTH", "HEIGHT"),
+        help="Sensor ROI: only this part of the frames is analysed (default: the full frame)")
+    parser.add_argument("--format", choices=sorted(SINK_FORMAT_BITS), default="Y800",
+        help="Pixel format requested to the camera: 8 or 16 bits mono, or colour (default: Y800)")
+    args, qt_argv = parser.parse_known_args(argv)
+    if args.roi is not None and (min(args.roi[:2]) < 0 or min(args.roi[2:]) <= 0):
+        parser.error("the ROI needs a positive origin and size")
+    return args, qt_argv
+
 
+def main(argv=None):
     import sys
 
-    app = QApplication(sys.argv)
+    args, qt_argv = parseArguments(sys.argv[1:] if argv is None else list(argv))
+    app = QApplication(sys.argv[:1] + qt_argv)
 
-    seeingMonitor = SeeingMonitor()
+    seeingMonitor = SeeingMonitor(sensor_roi=tuple(args.roi) if args.roi is not None else None, sink_format=args.format)
     eventHandler = EventHandler(seeingMonitor)
     seeingMonitor.stars_capture.installEventFilter(eventHandler)
     seeingMonitor.show()
-    sys.exit(app.exec_())
+    return app.exec_()
+
+
+if __name__ == '__main__':
+
+    import sys
+
+    sys.exit(main())
@@ -0,0 +1,61 @@
+import unittest
+
+import numpy as np
+
+from utils.background import BackgroundThreshold, clippedStatistics
+
+
+def skyFrame(level, noise, shape=(480, 640), dtype=np.uint8, seed=0):
+    """ Gaussian background with two bright spots and a few hot pixels. """
+    rng = np.random.RandomState(seed)
+    frame = rng.normal(level, noise, size=shape)
+    frame[230:250, 200:220] = frame[230:250, 400:420] = np.iinfo(dtype).max
+    frame[rng.randint(0, shape[0], 50), rng.randint(0, shape[1], 50)] = np.iinfo(dtype).max
+    return np.clip(np.round(frame), 0, np.iinfo(dtype).max).astype(dtype)
+
+
+class BackgroundThresholdTest(unittest.TestCase):
+
+    def test_clipped_statistics(self):
+        samples = np.random.RandomState(1).normal(20.0, 3.0, size=10000)
+        samples[:300] = 255
+        median, sigma = clippedStatistics(samples)
+        self.assertAlmostEqual(median, 20.0, delta=0.2)
+        self.assertAlmostEqual(sigma, 3.0, delta=0.2)
+
+    def test_threshold(self):
+        background = BackgroundThreshold(nsigma=5.0)
+        thresh = background.update(skyFrame(20, 3))
+        self.assertAlmostEqual(background.level, 20, delta=0.5)
+        self.assertAlmostEqual(thresh, 20 + 5 * 3, delta=2)
+
+    def test_16_bit_frames(self):
+        background = BackgroundThreshold(nsigma=5.0)
+        thresh = background.update(skyFrame(20 * 257, 3 * 257, dtype=np.uint16))
+        # On the 8-bit scale
+        self.assertAlmostEqual(thresh, 20 + 5 * 3, delta=2)
+
+    def test_only_re_estimated_when_needed(self):
+        background = BackgroundThreshold(every=100, check=10)
+        frame = skyFrame(20, 3)
+        for _ in range(50):
+            background.update(frame)
+        self.assertEqual(background.updates, 1)
+
+        # Twilight: the drift is caught by the next check
+        brighter = skyFrame(60, 3)
+        thresholds = [background.update(brighter) for _ in range(10)]
+        self.assertEqual(background.updates, 2)
+        self.assertGreater(thresholds[-1], 60)
+
+    def test_area(self):
+        frame = skyFrame(20, 3)
+        frame[:, 320:] = np.clip(frame[:, 320:].astype(np.int32) + 40, 0, 255)
+        background = BackgroundThreshold()
+        background.setArea((300, 400, 0, 0))
+        background.update(frame)
+        self.assertAlmostEqual(background.level, 20, delta=0.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+import shutil
+import tempfile
+import unittest
+from os.path import join
+
+import numpy as np
+
+from build_masters import readFrames
+from utils.calibration import Calibration, MasterBuilder, combineFrames
+from utils.dimm import SeeingProcessor
+from utils.raw_video import RawVideoWriter
+
+
+class CalibrationTest(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.dark = rng.uniform(5, 15, size=(60, 80)).astype(np.float32)
+        self.flat = rng.uniform(900, 1100, size=(60, 80)).astype(np.float32)
+        self.calibration = Calibration(self.dark, self.flat)
+
+    def expected(self, frame):
+        dark = np.round(self.dark)
+        return np.clip((frame - dark) * self.calibration.gain, 0, 255)
+
+    def test_apply(self):
+        frame = np.full((60, 80), 100, dtype=np.uint8)
+        expected = self.expected(frame)
+        self.calibration.apply(frame)
+        np.testing.assert_allclose(frame, expected, atol=1)
+
+    def test_windows_then_complete(self):
+        raw = np.random.RandomState(1).randint(20, 200, size=(60, 80)).astype(np.uint8)
+        frame = raw.copy()
+        windows = [(0, 0, 20, 20), (40, 30, 60, 50)]
+        self.calibration.apply(frame, windows)
+
+        np.testing.assert_allclose(frame[0:20, 0:20], self.expected(raw)[0:20, 0:20], atol=1)
+        np.testing.assert_array_equal(frame[20:, 20:40], raw[20:, 20:40])
+
+        self.calibration.complete(frame)
+        np.testing.assert_allclose(frame, self.expected(raw), atol=1)
+
+    def test_16_bit_frames(self):
+        frame = np.full((60, 80), 40000, dtype=np.uint16)
+        self.calibration.apply(frame)
+        self.assertEqual(frame.dtype, np.uint16)
+        self.assertAlmostEqual(float(np.median(frame)), 40000 - 10, delta=300)
+
+    def test_shape_mismatch(self):
+        with self.assertRaises(ValueError):
+            self.calibration.apply(np.zeros((30, 40), dtype=np.uint8))
+
+    def test_mismatch_disables_the_calibration_of_the_processor(self):
+        processor = SeeingProcessor(thresh=100, calibration=self.calibration)
+        processor.findSpots(np.zeros((30, 40), dtype=np.uint8))
+        self.assertIsNone(processor.calibration)
+        self.assertIsNotNone(processor.calibration_error)
+
+        processor = SeeingProcessor(thresh=100, calibration=Calibration(self.dark, self.flat))
+        processor.centroidsStack(np.zeros((3, 30, 40), dtype=np.uint8))
+        self.assertIsNone(processor.calibration)
+
+    def test_cropped(self):
+        roi = (10, 5, 30, 20)
+        frame = np.full((60, 80), 100, dtype=np.uint8)
+        part = frame[5:25, 10:40].copy()
+        self.calibration.apply(frame)
+        self.calibration.cropped(roi).apply(part)
+        np.testing.assert_array_equal(part, frame[5:25, 10:40])
+
+    def test_save_and_load(self):
+        path = tempfile.mkdtemp()
+        try:
+            filename = join(path, "calibration.npz")
+            self.calibration.save(filename)
+            loaded = Calibration.load(filename)
+        finally:
+            shutil.rmtree(path)
+        np.testing.assert_array_equal(loaded.dark, self.dark)
+        np.testing.assert_array_equal(loaded.flat, self.flat)
+
+
+class MasterTest(unittest.TestCase):
+
+    def test_master_builder(self):
+        builder = MasterBuilder(count=3)
+        self.assertEqual([builder.add(np.full((4, 5), value, dtype=np.uint8)) for value in (1, 2, 6)],
+            [False, False, True])
+        np.testing.assert_array_equal(builder.master(), np.full((4, 5), 3.0))
+        with self.assertRaises(ValueError):
+            builder.add(np.zeros((5, 4), dtype=np.uint8))
+
+    def test_median_rejects_outliers(self):
+        frames = np.full((5, 4, 4), 10, dtype=np.uint8)
+        frames[2, 1, 1] = 255
+        np.testing.assert_array_equal(combineFrames(frames), np.full((4, 4), 10.0))
+
+    def test_read_raw_frames(self):
+        # Masters from a raw recording keep the shape and the bit depth of the camera frames
+        path = tempfile.mkdtemp()
+        try:
+            filename = join(path, "dark.dimmraw")
+            writer = RawVideoWriter(filename, (4, 5), np.uint16)
+            for index in range(10):
+                writer.write(np.full((4, 5), index, dtype=np.uint16), float(index))
+            writer.close()
+            frames = readFrames(filename, 6)
+        finally:
+            shutil.rmtree(path)
+        self.assertEqual((frames.shape, frames.dtype), ((6, 4, 5), np.uint16))
+        np.testing.assert_array_equal(combineFrames(frames), np.full((4, 5), 2.5))
+
+
+if __name__ == "__main__":
+    unittest.main()
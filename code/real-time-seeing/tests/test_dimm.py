@@ -0,0 +1,159 @@
+import unittest
+
+import numpy as np
+
+from utils.dimm import SeeingProcessor, baselineDeltas, labelSpots
+from utils.state_enum import CentroidEstimator
+
+
+def spotsFrame(spots, shape=(480, 640), size=4, level=200, dtype=np.uint8):
+    """ Mono frame with a square spot of `2 * size + 1` pixels centred on every `(x, y)` of `spots`. """
+    frame = np.zeros(shape, dtype=dtype)
+    for x, y in spots:
+        frame[y - size:y + size + 1, x - size:x + size + 1] = level
+    return frame
+
+
+def sortedCentroids(centroids):
+    return sorted((round(x, 6), round(y, 6)) for x, y in centroids)
+
+
+class TrackingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.processor = SeeingProcessor(thresh=100, tracking=True, roi_size=32)
+
+    def _detect(self, spots):
+        """ Full frame detection, the next frames are tracked. """
+        frame = spotsFrame(spots)
+        self.processor.centroids(frame, self.processor.findSpots(frame))
+
+    def test_follows_the_spots(self):
+        self._detect([(200, 240), (400, 240)])
+        frame = spotsFrame([(203, 238), (405, 241)])
+        contours = self.processor._trackSpots(frame)
+        self.assertIsNotNone(contours)
+        self.assertEqual(sortedCentroids(self.processor.centroids(frame, contours)), [(203, 238), (405, 241)])
+
+    def test_overlapping_windows_keep_their_own_spot(self):
+        # The spots are closer than roi_size: each window sees both of them
+        self._detect([(300, 240), (318, 240)])
+
+        frame = spotsFrame([(301, 240), (318, 241)])
+        contours = self.processor._trackSpots(frame)
+        self.assertIsNotNone(contours)
+        self.assertEqual(sortedCentroids(self.processor.centroids(frame, contours)), [(301, 240), (318, 241)])
+
+    def test_windows_on_the_same_spot_lose_the_tracking(self):
+        self.processor.previous_centroids = [(318, 240), (318, 240)]
+        frame = spotsFrame([(300, 240), (318, 240)])
+        self.assertIsNone(self.processor._trackSpots(frame))
+
+        # Full frame search instead
+        contours = self.processor.findSpots(frame)
+        self.assertEqual(sortedCentroids(self.processor.centroids(frame, contours)), [(300, 240), (318, 240)])
+
+    def test_lost_spot(self):
+        self._detect([(200, 240), (400, 240)])
+        self.assertIsNone(self.processor._trackSpots(spotsFrame([(200, 240)])))
+
+
+class CentroidTest(unittest.TestCase):
+
+    def gaussianFrame(self, x, y, sigma=2.0, peak=200, dtype=np.uint8):
+        rows, cols = np.indices((120, 160), dtype=np.float64)
+        frame = np.zeros((120, 160), dtype=np.float64)
+        for cx in (x, x + 60):
+            frame += peak * np.exp(-((cols - cx) ** 2 + (rows - y) ** 2) / (2 * sigma ** 2))
+        if dtype != np.uint8:
+            frame *= 257
+        return np.round(frame).astype(dtype)
+
+    def measure(self, frame, estimator, thresh=20):
+        processor = SeeingProcessor(thresh=thresh, estimator=estimator)
+        return sorted(processor.centroids(frame, processor.findSpots(frame)))
+
+    def test_sub_pixel_estimators(self):
+        frame = self.gaussianFrame(40.3, 60.7)
+        for estimator in (CentroidEstimator.COG, CentroidEstimator.WCOG, CentroidEstimator.COMPONENTS):
+            (x1, y1), (x2, y2) = self.measure(frame, estimator)
+            self.assertAlmostEqual(x1, 40.3, delta=0.05, msg=estimator)
+            self.assertAlmostEqual(y1, 60.7, delta=0.05, msg=estimator)
+            self.assertAlmostEqual(x2 - x1, 60.0, delta=0.05, msg=estimator)
+
+        (x1, y1), _ = self.measure(frame, CentroidEstimator.CONTOUR)
+        self.assertAlmostEqual(x1, 40.3, delta=0.5)
+        self.assertAlmostEqual(y1, 60.7, delta=0.5)
+
+    def test_16_bit_frames(self):
+        centroids = self.measure(self.gaussianFrame(40.3, 60.7), CentroidEstimator.COG)
+        np.testing.assert_allclose(self.measure(self.gaussianFrame(40.3, 60.7, dtype=np.uint16), CentroidEstimator.COG),
+            centroids, atol=0.01)
+
+    def test_pixels_at_the_threshold_are_left_out(self):
+        # Same pixels as the spot mask: a corner of the bounding box at the threshold does not move the spot
+        frame = spotsFrame([(40, 60), (100, 60)], shape=(120, 160), size=2)
+        frame[58:60, 41:43] = 100
+        rows, cols = np.nonzero(frame[:, :70] > 100)
+        centroids = self.measure(frame, CentroidEstimator.COG, thresh=100)
+        self.assertEqual(sortedCentroids(centroids), [(round(cols.mean(), 6), round(rows.mean(), 6)), (100, 60)])
+
+    def test_missing_spot(self):
+        processor = SeeingProcessor(thresh=100)
+        frame = spotsFrame([(200, 240)])
+        with self.assertRaises(IndexError):
+            processor.centroids(frame, processor.findSpots(frame))
+        self.assertEqual(processor.process(frame)[1:], (None, None))
+
+
+class BaselineTest(unittest.TestCase):
+
+    def test_baseline_deltas(self):
+        self.assertEqual(baselineDeltas(10.0, 2.0), (10.0, 2.0))
+        # Same deltas whatever the order of the spots
+        self.assertEqual(baselineDeltas(-10.0, -2.0), (10.0, 2.0))
+        # Diagonal baseline
+        longitudinal, transverse = baselineDeltas(3.0, 4.0, (0.6, 0.8))
+        self.assertAlmostEqual(longitudinal, 5.0)
+        self.assertAlmostEqual(transverse, 0.0)
+        longitudinal, transverse = baselineDeltas(np.array([0.0, -1.0]), np.array([1.0, 0.0]), (0.0, 1.0))
+        np.testing.assert_allclose(longitudinal, [1.0, 0.0])
+        np.testing.assert_allclose(transverse, [0.0, 1.0])
+
+    def test_label_spots(self):
+        frame = spotsFrame([(50, 40), (120, 40)], shape=(100, 200))
+        frame[36:45, 116:125] = 250
+        centroids, flux, boxes = labelSpots(frame, 100)
+        # Ranked by decreasing flux
+        np.testing.assert_allclose(centroids, [(120, 40), (50, 40)])
+        self.assertGreater(flux[0], flux[1])
+        np.testing.assert_array_equal(boxes[1], (46, 36, 9, 9))
+
+    def test_pairs_along_their_own_baseline(self):
+        # Four apertures on a square: the motion of every pair is only along its own baseline
+        rest = np.array([(100.0, 100.0), (200.0, 100.0), (200.0, 200.0), (100.0, 200.0)])
+        processor = SeeingProcessor(thresh=100, window=500, estimator=CentroidEstimator.COMPONENTS, apertures=4)
+        processor.setPlateScale(5.6, 5.6, 2000)
+        processor.setWavelength(60, 0.5)
+        processor.setPairBaselines([(bx * 0.3, by * 0.3) for bx, by in
+            (rest[j] - rest[i] for i, j in processor.pairs)], 60)
+
+        rng = np.random.RandomState(0)
+        for _ in range(500):
+            # Breathing of the mask: every spot moves radially, i.e. along the baselines from the centre
+            scale = 1.0 + rng.normal(0, 0.01)
+            centroids = (rest - 150.0) * scale + 150.0
+            processor.addDeltas(centroids.tolist(), 0.0)
+
+        for (i, j), window in zip(processor.pairs, processor.pair_windows):
+            std_lat, std_tra = window.std()
+            self.assertGreater(std_lat, 0.1, msg=(i, j))
+            self.assertLess(std_tra, 1e-9, msg=(i, j))
+
+        for (i, j), lateral, transversal in processor.pairSeeing():
+            self.assertGreater(lateral, 0)
+            self.assertAlmostEqual(transversal, 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import shutil
+import tempfile
+import unittest
+from os.path import join
+
+import numpy as np
+
+from utils.raw_video import RawVideoWriter, openRawVideo, readRawHeader
+
+
+class RawVideoTest(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.filename = join(self.path, "video.dimmraw")
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def record(self, shape, dtype, count, chunk=4):
+        writer = RawVideoWriter(self.filename, shape, dtype, chunk=chunk)
+        frames = np.random.RandomState(0).randint(0, np.iinfo(dtype).max, size=(count,) + shape).astype(dtype)
+        for index, frame in enumerate(frames):
+            writer.write(frame, 1000.0 + index, framenumber=index, exposure=0.01)
+        writer.close()
+        return frames
+
+    def test_lossless(self):
+        for shape, dtype in (((6, 8), np.uint8), ((6, 8), np.uint16), ((6, 8, 3), np.uint8)):
+            frames = self.record(shape, dtype, 10)
+            self.assertEqual(readRawHeader(self.filename)[:2], (shape, np.dtype(dtype)))
+
+            records = openRawVideo(self.filename)
+            np.testing.assert_array_equal(records["frame"], frames)
+            np.testing.assert_array_equal(records["framenumber"], np.arange(10))
+            np.testing.assert_array_equal(records["timestamp"], 1000.0 + np.arange(10))
+            del records
+
+    def test_incomplete_last_record(self):
+        self.record((6, 8), np.uint8, 5)
+        with open(self.filename, "ab") as rawFile:
+            rawFile.write(b"\0" * 10)
+        self.assertEqual(len(openRawVideo(self.filename)), 5)
+
+    def test_copy_on_write(self):
+        self.record((6, 8), np.uint8, 3)
+        records = openRawVideo(self.filename, mode="c")
+        records["frame"][0] = 0
+        del records
+        self.assertTrue(openRawVideo(self.filename)["frame"][0].any())
+
+    def test_not_a_raw_file(self):
+        with open(self.filename, "wb") as rawFile:
+            rawFile.write(b"RIFF" + b"\0" * 100)
+        with self.assertRaises(ValueError):
+            readRawHeader(self.filename)
+
+    def test_frame_shape(self):
+        writer = RawVideoWriter(self.filename, (6, 8), np.uint8)
+        with self.assertRaises(ValueError):
+            writer.write(np.zeros((8, 6), dtype=np.uint8), 0.0)
+        writer.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import shutil
+import tempfile
+import unittest
+from os.path import join
+
+import cv2
+import numpy as np
+
+from utils.raw_video import RawVideoWriter
+from utils.replay import RawVideoCapture, openVideo
+from utils.ring_recorder import RingRecorder
+
+
+class ReplayTest(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.filename = join(self.path, "video.dimmraw")
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def record(self, timestamps):
+        writer = RawVideoWriter(self.filename, (4, 6), np.uint8)
+        for index, timestamp in enumerate(timestamps):
+            writer.write(np.full((4, 6), index, dtype=np.uint8), timestamp, framenumber=index)
+        writer.close()
+
+    def readAll(self, cap):
+        frames = []
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                return frames
+            frames.append(int(frame[0, 0]))
+
+    def test_read(self):
+        self.record(100.0 + np.arange(10) * 0.04)
+        cap = openVideo(self.filename)
+        self.assertIsInstance(cap, RawVideoCapture)
+        self.assertTrue(cap.isOpened())
+        self.assertAlmostEqual(cap.get(cv2.CAP_PROP_FPS), 25.0)
+        self.assertEqual(cap.get(cv2.CAP_PROP_FRAME_COUNT), 10)
+        self.assertEqual(self.readAll(cap), list(range(10)))
+        self.assertAlmostEqual(cap.timestamp, 100.36)
+
+    def test_range_and_seek(self):
+        self.record(np.arange(10, dtype=np.float64))
+        cap = RawVideoCapture(self.filename, start=2, stop=6)
+        self.assertEqual(len(cap), 4)
+        self.assertTrue(cap.set(cv2.CAP_PROP_POS_FRAMES, 1))
+        self.assertEqual(self.readAll(cap), [3, 4, 5])
+
+    def test_no_frame_rate(self):
+        # A single frame, or equal timestamps: no frame rate, like OpenCV for unknown rates
+        self.record([100.0])
+        self.assertEqual(openVideo(self.filename).get(cv2.CAP_PROP_FPS), 0.0)
+        self.record([100.0, 100.0, 100.0])
+        self.assertEqual(openVideo(self.filename).get(cv2.CAP_PROP_FPS), 0.0)
+
+    def test_writable_frames_leave_the_file(self):
+        self.record([0.0, 1.0])
+        _, frame = openVideo(self.filename, writable=True).read()
+        frame[...] = 255
+        _, frame = openVideo(self.filename).read()
+        self.assertEqual(int(frame.max()), 0)
+
+    def test_ring_in_chronological_order(self):
+        recorder = RingRecorder(self.filename, 4, (4, 6), np.uint8)
+        for index in range(7):
+            recorder.write(np.full((4, 6), index, dtype=np.uint8), float(index))
+        recorder.close()
+        self.assertEqual(self.readAll(openVideo(self.filename)), [3, 4, 5, 6])
+
+    def test_not_a_video(self):
+        with open(self.filename, "wb") as rawFile:
+            rawFile.write(b"\0" * 100)
+        self.assertFalse(openVideo(self.filename).isOpened())
+
+
+if __name__ == "__main__":
+    unittest.main()
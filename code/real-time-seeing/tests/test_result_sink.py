@@ -0,0 +1,57 @@
+import unittest
+
+from utils.result_sink import ResultSink
+from utils.state_enum import OverflowPolicy
+
+
+class ResultSinkTest(unittest.TestCase):
+
+    def test_delivers_in_order(self):
+        sink = ResultSink(batch_size=8)
+        received = []
+        sink.register(received.extend)
+        sink.start()
+        for index in range(100):
+            sink.put(index)
+        sink.stop(timeout=5)
+        self.assertEqual(received, list(range(100)))
+
+    def test_sentinel_in_the_middle_of_a_batch(self):
+        sink = ResultSink(batch_size=64)
+        batches = []
+        sink.register(batches.append)
+
+        # The sentinel is queued between results before the worker drains them
+        sink.put(1)
+        sink.put(2)
+        sink._queue.put(None)
+        sink.put(3)
+        sink.start()
+        sink._thread.join(timeout=5)
+
+        self.assertFalse(sink._thread.is_alive())
+        self.assertEqual(sum(batches, []), [1, 2, 3])
+        self.assertTrue(all(None not in batch for batch in batches))
+
+    def test_drop_policy(self):
+        sink = ResultSink(maxsize=2, policy=OverflowPolicy.DROP)
+        self.assertEqual([sink.put(index) for index in range(4)], [True, True, False, False])
+        self.assertEqual(sink.dropped, 2)
+
+    def test_failing_consumer(self):
+        sink = ResultSink()
+        received = []
+
+        def failing(batch):
+            raise RuntimeError("consumer failure")
+
+        sink.register(failing)
+        sink.register(received.extend)
+        sink.start()
+        sink.put(1)
+        sink.stop(timeout=5)
+        self.assertEqual(received, [1])
+
+
+if __name__ == "__main__":
+    unittest.main()
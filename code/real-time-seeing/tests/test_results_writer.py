@@ -0,0 +1,90 @@
+import csv
+from datetime import datetime
+from os import listdir
+from os.path import join, exists
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from utils.result_sink import ResultSink
+from utils.results_writer import ResultsWriter
+from utils.state_enum import FileRotation
+
+
+FIELDNAMES = ["timestamp", "lateral", "transversal", "star"]
+
+
+class ResultsWriterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def read(self, filename):
+        """ Rows written to disk so far. """
+        if not exists(join(self.path, filename)):
+            return []
+        with open(join(self.path, filename), newline="") as csvFile:
+            return list(csv.reader(csvFile))
+
+    def test_buffered_rows(self):
+        writer = ResultsWriter(self.path, "seeing.csv", FIELDNAMES, rotation=FileRotation.NONE,
+            flush_rows=3, flush_interval=3600)
+        timestamp = time.time()
+        writer.write([[timestamp, 1.0, 1.1, "star"]] * 2)
+        self.assertLessEqual(len(self.read("seeing.csv")), 1)
+        writer.write([[timestamp, 1.0, 1.1, "star"]])
+        self.assertEqual(len(self.read("seeing.csv")), 4)
+        writer.close()
+
+    def test_appends_without_a_second_header(self):
+        for _ in range(2):
+            writer = ResultsWriter(self.path, "seeing.csv", FIELDNAMES, rotation=FileRotation.NONE)
+            writer.write([[time.time(), 1.0, 1.1, ""]])
+            writer.close()
+        rows = self.read("seeing.csv")
+        self.assertEqual(rows[0], FIELDNAMES)
+        self.assertEqual(len(rows), 3)
+
+    def test_night_rotation(self):
+        writer = ResultsWriter(self.path, "seeing.csv", FIELDNAMES)
+        # The morning belongs to the night of the previous evening
+        evening = datetime(2019, 1, 21, 22, 0).timestamp()
+        morning = datetime(2019, 1, 22, 5, 0).timestamp()
+        evening_next = datetime(2019, 1, 22, 21, 0).timestamp()
+        writer.write([[evening, 1.0, 1.0, ""], [morning, 1.0, 1.0, ""], [evening_next, 1.0, 1.0, ""]])
+        writer.close()
+        self.assertEqual(sorted(listdir(self.path)), ["seeing_2019-01-21.csv", "seeing_2019-01-22.csv"])
+        self.assertEqual(len(self.read("seeing_2019-01-21.csv")), 3)
+
+    def test_flush_when_the_results_stop(self):
+        writer = ResultsWriter(self.path, "seeing.csv", FIELDNAMES, rotation=FileRotation.NONE,
+            flush_rows=100, flush_interval=0.1)
+        sink = ResultSink(idle_interval=0.05)
+        sink.register(lambda results: writer.write([[time.time(), value, value, ""] for value in results]))
+        sink.registerIdle(writer.flushIfDue)
+        sink.start()
+        try:
+            sink.put(1.0)
+            deadline = time.time() + 5
+            while len(self.read("seeing.csv")) < 2 and time.time() < deadline:
+                time.sleep(0.02)
+            self.assertEqual(len(self.read("seeing.csv")), 2)
+        finally:
+            sink.stop(timeout=5)
+            writer.close()
+
+    def test_close_flushes(self):
+        writer = ResultsWriter(self.path, "seeing.csv", FIELDNAMES, rotation=FileRotation.NONE,
+            flush_rows=100, flush_interval=3600)
+        writer.write([[time.time(), 1.0, 1.0, ""]])
+        writer.close()
+        self.assertEqual(len(self.read("seeing.csv")), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
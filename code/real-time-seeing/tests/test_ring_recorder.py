@@ -0,0 +1,55 @@
+import shutil
+import tempfile
+import unittest
+from os.path import join
+
+import numpy as np
+
+from utils.raw_video import openRawVideo, readRawHeader
+from utils.ring_recorder import RingRecorder, ringSlots
+
+
+class RingRecorderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_ring_slots(self):
+        np.testing.assert_array_equal(ringSlots(3, 5), [0, 1, 2])
+        np.testing.assert_array_equal(ringSlots(7, 5), [2, 3, 4, 0, 1])
+
+    def recorder(self, count, capacity=5):
+        recorder = RingRecorder(join(self.path, "ring.dimmraw"), capacity, (4, 6), np.uint16)
+        for index in range(count):
+            recorder.write(np.full((4, 6), index, dtype=np.uint16), 100.0 + index, framenumber=index)
+        return recorder
+
+    def test_keeps_the_last_frames(self):
+        recorder = self.recorder(12)
+        recorder.close()
+        _, _, _, capacity, written = readRawHeader(recorder.filename)
+        self.assertEqual((capacity, written), (5, 12))
+        records = openRawVideo(recorder.filename)
+        self.assertEqual(sorted(records["framenumber"][ringSlots(written, capacity)].tolist()), list(range(7, 12)))
+
+    def test_freeze(self):
+        recorder = self.recorder(12)
+        filename = join(self.path, "frozen.dimmraw")
+        # The last 2 seconds: frames 9 to 11
+        self.assertEqual(recorder.freeze(filename, 2.0), 3)
+
+        records = openRawVideo(filename)
+        self.assertEqual(readRawHeader(filename)[3], 0)
+        self.assertEqual(records["framenumber"].tolist(), [9, 10, 11])
+        np.testing.assert_array_equal(records["frame"][:, 0, 0], [9, 10, 11])
+
+    def test_freeze_empty(self):
+        recorder = self.recorder(0)
+        self.assertEqual(recorder.freeze(join(self.path, "frozen.dimmraw"), 10.0), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
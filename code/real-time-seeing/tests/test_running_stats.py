@@ -0,0 +1,64 @@
+import unittest
+
+import numpy as np
+
+from utils.running_stats import SlidingWindow, BlockStatistics, RunningStatistics
+
+
+class SlidingWindowTest(unittest.TestCase):
+
+    def test_length(self):
+        samples = np.random.RandomState(0).normal(3.0, 2.0, size=(500, 2))
+        window = SlidingWindow(length=100)
+        for index, values in enumerate(samples):
+            window.add(tuple(values), index)
+            last = samples[max(index - 99, 0):index + 1]
+            np.testing.assert_allclose(window.mean, last.mean(axis=0), rtol=1e-9, atol=1e-12)
+            np.testing.assert_allclose(window.std(), last.std(axis=0), rtol=1e-7, atol=1e-12)
+        self.assertEqual(len(window), 100)
+
+    def test_duration(self):
+        window = SlidingWindow(duration=10)
+        for timestamp in range(30):
+            window.add((float(timestamp), 0.0), float(timestamp))
+        # Samples within the last 10 seconds, both ends included
+        self.assertEqual(len(window), 11)
+        self.assertAlmostEqual(window.mean[0], 24.0)
+        self.assertEqual(window.name, "10 s")
+        self.assertEqual(SlidingWindow(duration=600).name, "10 min")
+
+    def test_needs_a_bound(self):
+        with self.assertRaises(ValueError):
+            SlidingWindow()
+
+    def test_empty(self):
+        window = SlidingWindow(length=1)
+        window.add((1.0, 2.0))
+        window.reset()
+        self.assertEqual(window.std(), [0.0, 0.0])
+
+
+class BlockStatisticsTest(unittest.TestCase):
+
+    def test_blocks(self):
+        blocks = BlockStatistics(4)
+        completed = [blocks.add((float(i), 0.0), float(i)) for i in range(10)]
+        self.assertEqual([block is not None for block in completed], [False, False, False, True] * 2 + [False, False])
+        timestamp, mean, std = completed[7]
+        self.assertEqual(timestamp, 7.0)
+        self.assertAlmostEqual(mean[0], 5.5)
+        self.assertAlmostEqual(std[0], np.std([4, 5, 6, 7]))
+
+    def test_reset(self):
+        statistics = RunningStatistics([SlidingWindow(length=10)], block_length=4)
+        for i in range(6):
+            statistics.add((float(i), 0.0))
+        statistics.reset()
+        self.assertIsNone(statistics.blocks.last)
+        self.assertEqual(len(statistics.windows[0]), 0)
+        # The block in progress was dropped too
+        self.assertEqual([statistics.add((1.0, 1.0)) is None for _ in range(4)], [True, True, True, False])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+
+import numpy as np
+
+from utils.seeing_history import SeeingHistory
+
+
+class SeeingHistoryTest(unittest.TestCase):
+
+    def fill(self, history, start, count):
+        timestamps = np.arange(start, start + count, dtype=np.float64)
+        values = np.stack([timestamps, -timestamps], axis=1)
+        history.append(timestamps, values)
+        return timestamps, values
+
+    def test_ring(self):
+        history = SeeingHistory(capacity=10)
+        self.fill(history, 0, 7)
+        self.fill(history, 7, 7)
+        self.assertEqual(len(history), 10)
+        self.assertEqual(history.first(), 4)
+        self.assertEqual(history.last(), 13)
+
+        timestamps, values = history.range(5, 12)
+        np.testing.assert_array_equal(timestamps, np.arange(5, 12))
+        np.testing.assert_array_equal(values[:, 1], -np.arange(5, 12))
+
+    def test_more_points_than_the_capacity(self):
+        history = SeeingHistory(capacity=10)
+        self.fill(history, 0, 25)
+        self.assertEqual((history.first(), history.last()), (15, 24))
+
+    def test_decimate(self):
+        history = SeeingHistory(capacity=100000)
+        timestamps, values = self.fill(history, 0, 10000)
+        times, envelope = history.decimate(0, 10000, 100)
+
+        self.assertEqual(len(times), 200)
+        # Real sample times, in order, within the range
+        self.assertTrue(np.all(np.diff(times) > 0))
+        self.assertTrue(np.isin(times, timestamps).all())
+        # Minimum then maximum of every bucket of 100 points
+        np.testing.assert_array_equal(envelope[0::2, 0], np.arange(0, 10000, 100))
+        np.testing.assert_array_equal(envelope[1::2, 0], np.arange(99, 10000, 100))
+        np.testing.assert_array_equal(envelope[1::2, 1], -np.arange(0, 10000, 100))
+
+    def test_decimate_few_points(self):
+        history = SeeingHistory(capacity=100)
+        timestamps, _ = self.fill(history, 0, 50)
+        times, _ = history.decimate(0, 50, 100)
+        np.testing.assert_array_equal(times, timestamps)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+
+import numpy as np
+
+from utils.dimm import SeeingProcessor
+from utils.turbulence import TurbulenceSimulator
+
+
+def processorFor(simulator, window):
+    """ Processor configured with the geometry of `simulator`. """
+    processor = SeeingProcessor(thresh=20, window=window)
+    processor.setBaseline(simulator.b, simulator.d)
+    processor.setWavelength(simulator.d, simulator.wavelength)
+    processor.setPlateScale(simulator.pixel_width, simulator.pixel_height, simulator.focal)
+    return processor
+
+
+class GroundTruthTest(unittest.TestCase):
+
+    def test_seeing_of_the_simulated_motion(self):
+        # Uncorrelated frames: the estimate only depends on the formula
+        simulator = TurbulenceSimulator(r0=100.0, coherence=0, seed=1)
+        count = 20000
+        processor = processorFor(simulator, count)
+        positions, seeing = simulator.motions(count)
+        for centroids in positions.tolist():
+            processor.addDeltas(centroids, 0.0)
+
+        fwhm_lat, fwhm_tra = processor.seeing()
+        self.assertAlmostEqual(fwhm_lat / seeing[0], 1.0, delta=0.03)
+        self.assertAlmostEqual(fwhm_tra / seeing[0], 1.0, delta=0.03)
+
+    def test_seeing_of_the_rendered_frames(self):
+        simulator = TurbulenceSimulator(r0=80.0, coherence=0, spot_sigma=2.0, noise=2.0,
+            height=64, width=160, seed=2)
+        frames, _, seeing = simulator.generateBatch(1000)
+        processor = processorFor(simulator, len(frames))
+
+        fwhm_lat, fwhm_tra = processor.stackSeeing(processor.centroidsStack(frames))
+        self.assertAlmostEqual(fwhm_lat / seeing[0], 1.0, delta=0.1)
+        self.assertAlmostEqual(fwhm_tra / seeing[0], 1.0, delta=0.1)
+
+
+if __name__ == "__main__":
+    unittest.main()
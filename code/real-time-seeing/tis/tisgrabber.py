@@ -426,6 +426,13 @@ class TIS_CAM(object):
             self._callback_registered = False
             self._frame = {'num'    :   -1,
                            'ready'  :   False}    
+            self._invalidateImageCache()
+
+        def _invalidateImageCache(self):
+            """ Forget the cached image description and view, after any change of format or device. """
+            self._description = None
+            self._view = None
+            self._view_ptr = None
                                   
         def s(self,strin):
             if sys.version[0] == "2":
@@ -457,17 +464,21 @@ class TIS_CAM(object):
             
             unique_device_name : The name and serial number of the device to be opened. The device name and serial number are separated by a space.
             """
+            self._invalidateImageCache()
             test = TIS_GrabberDLL.open_device_by_unique_name(self._handle,
                                                        self.s(unique_device_name))
 
             return test                                           
 
         def ShowDeviceSelectionDialog(self):
+            self._invalidateImageCache()
             self._handle = TIS_GrabberDLL.ShowDeviceSelectionDialog(self._handle)
             
         def ShowPropertyDialog(self):
             # self._handle = TIS_GrabberDLL.ShowPropertyDialog(self._handle)
             TIS_GrabberDLL.ShowPropertyDialog(self._handle)
+            # The video format may have been changed in the dialog
+            self._invalidateImageCache()
             
         def IsDevValid(self):
             return TIS_GrabberDLL.IsDevValid(self._handle)
@@ -479,10 +490,12 @@ class TIS_CAM(object):
             return TIS_GrabberDLL.SaveDeviceStateToFile(self._handle, self.s(FileName))
             
         def LoadDeviceStateFromFile(self,FileName):
+            self._invalidateImageCache()
             self._handle = TIS_GrabberDLL.LoadDeviceStateFromFile(self._handle,self.s(FileName))
             
 
         def SetVideoFormat(self,Format):
+            self._invalidateImageCache()
             return TIS_GrabberDLL.set_videoformat(self._handle, self.s(Format))
 
         def SetFrameRate(self,FPS):
@@ -530,6 +543,7 @@ class TIS_CAM(object):
             Sets the pixel format in memory
             @param Format Sinkformat enumeration
             '''
+            self._invalidateImageCache()
             TIS_GrabberDLL.SetFormat(self._handle, Format.value)
 
         def GetFormat(self):
@@ -553,6 +567,7 @@ class TIS_CAM(object):
 
             showlive: 1 : a live video is shown, 0 : the live video is not shown.
             """
+            self._invalidateImageCache()
             Error = TIS_GrabberDLL.StartLive(self._handle, showlive)
             return Error
 
@@ -584,8 +599,52 @@ class TIS_CAM(object):
             
             return ImagePtr
            
+        def GetImageFormat(self):
+            """ Return the (shape, dtype) of the images, from the cached image description.
+            The description is only queried again after a change of format or device.
+            Use it to preallocate the arrays passed to GetImageInto().
+            """
+            if self._description is None:
+                self._description = self.GetImageDescription()
+
+            lWidth, lHeight, iBitsPerPixel, Format = self._description
+            if Format == 4: #SinkFormats.Y16:
+                return (lHeight, lWidth, 1), np.uint16
+            return (lHeight, lWidth, iBitsPerPixel // 8), np.uint8
+
+        def GetImageView(self):
+            """ Return a numpy array over the image buffer of the grabber, without any copy.
+            The array is cached and reused as long as the format and the buffer do not change.
+            The buffer is owned by the grabber: its content is overwritten by the next
+            SnapImage(), copy it (or use GetImageInto()) to keep the image.
+            """
+            ImagePtr = self.GetImagePtr()
+            if self._view is None or ImagePtr != self._view_ptr:
+                shape, pixeltype = self.GetImageFormat()
+                buffer_size = int(np.prod(shape)) * np.dtype(pixeltype).itemsize
+                Bild = C.cast(ImagePtr, C.POINTER(C.c_ubyte * buffer_size))
+                self._view = np.ndarray(buffer = Bild.contents,
+                             dtype = pixeltype,
+                             shape = shape)
+                self._view_ptr = ImagePtr
+            return self._view
+
+        def GetImageInto(self, out):
+            """ Copy the last snapped image into the caller's preallocated array `out`
+            (see GetImageFormat() for its shape and dtype) and return it.
+            The caller owns `out`, the grabber buffer can be reused right after the call.
+            """
+            shape, pixeltype = self.GetImageFormat()
+            buffer_size = int(np.prod(shape)) * np.dtype(pixeltype).itemsize
+            if out.nbytes != buffer_size or not out.flags['C_CONTIGUOUS']:
+                raise ValueError("Expected a contiguous array of {} bytes, like {} {}".format(
+                    buffer_size, shape, np.dtype(pixeltype).name))
+            C.memmove(out.ctypes.data, self.GetImagePtr(), buffer_size)
+            return out
+
         def GetImage(self):
-            BildDaten = self.GetImageDescription()[:4]
+            self.GetImageFormat()
+            BildDaten = self._description
             lWidth=BildDaten[0]
             lHeight= BildDaten[1]
             iBitsPerPixel=BildDaten[2]//8
@@ -607,7 +666,8 @@ class TIS_CAM(object):
             """ Return a numpy array with the image data tyes
             If the sink is Y16 or RGB64 (not supported yet), the dtype in the array is uint16, othereise it is uint8
             """
-            BildDaten = self.GetImageDescription()[:4]
+            self.GetImageFormat()
+            BildDaten = self._description
             lWidth=BildDaten[0]
             lHeight= BildDaten[1]
             iBytesPerPixel=BildDaten[2]//8
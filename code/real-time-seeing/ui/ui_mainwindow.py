@@ -83,6 +83,10 @@ class Ui_MainWindow(object):
         self.button_export.setEnabled(False)
         self.button_export.setObjectName("button_export")
         self.verticalLayout_2.addWidget(self.button_export)
+        self.checkbox_overlay = QtWidgets.QCheckBox(self.widget)
+        self.checkbox_overlay.setChecked(True)
+        self.checkbox_overlay.setObjectName("checkbox_overlay")
+        self.verticalLayout_2.addWidget(self.checkbox_overlay)
         self.line_4 = QtWidgets.QFrame(self.widget)
         self.line_4.setFrameShape(QtWidgets.QFrame.HLine)
         self.line_4.setFrameShadow(QtWidgets.QFrame.Sunken)
@@ -97,6 +101,27 @@ class Ui_MainWindow(object):
         self.enable_seeing.setChecked(True)
         self.enable_seeing.setObjectName("enable_seeing")
         self.verticalLayout_2.addWidget(self.enable_seeing)
+        self.checkbox_tracking = QtWidgets.QCheckBox(self.widget)
+        self.checkbox_tracking.setObjectName("checkbox_tracking")
+        self.verticalLayout_2.addWidget(self.checkbox_tracking)
+        self.combobox_centroid = QtWidgets.QComboBox(self.widget)
+        self.combobox_centroid.setObjectName("combobox_centroid")
+        self.combobox_centroid.addItem("")
+        self.combobox_centroid.addItem("")
+        self.combobox_centroid.addItem("")
+        self.combobox_centroid.addItem("")
+        self.verticalLayout_2.addWidget(self.combobox_centroid)
+        self.checkbox_stats = QtWidgets.QCheckBox(self.widget)
+        self.checkbox_stats.setObjectName("checkbox_stats")
+        self.verticalLayout_2.addWidget(self.checkbox_stats)
+        self.combobox_span = QtWidgets.QComboBox(self.widget)
+        self.combobox_span.setObjectName("combobox_span")
+        self.combobox_span.addItem("")
+        self.combobox_span.addItem("")
+        self.combobox_span.addItem("")
+        self.combobox_span.addItem("")
+        self.combobox_span.addItem("")
+        self.verticalLayout_2.addWidget(self.combobox_span)
         self.line = QtWidgets.QFrame(self.widget)
         self.line.setFrameShape(QtWidgets.QFrame.HLine)
         self.line.setFrameShadow(QtWidgets.QFrame.Sunken)
@@ -233,6 +258,81 @@ class Ui_MainWindow(object):
         self.checkbox_thresh.setLayoutDirection(QtCore.Qt.RightToLeft)
         self.checkbox_thresh.setObjectName("checkbox_thresh")
         self.formLayout.setWidget(11, QtWidgets.QFormLayout.LabelRole, self.checkbox_thresh)
+        self.label_preview = QtWidgets.QLabel(self.widget)
+        self.label_preview.setObjectName("label_preview")
+        self.formLayout.setWidget(18, QtWidgets.QFormLayout.LabelRole, self.label_preview)
+        self.spinbox_preview = QtWidgets.QSpinBox(self.widget)
+        self.spinbox_preview.setMinimum(1)
+        self.spinbox_preview.setMaximum(60)
+        self.spinbox_preview.setProperty("value", 15)
+        self.spinbox_preview.setObjectName("spinbox_preview")
+        self.formLayout.setWidget(18, QtWidgets.QFormLayout.FieldRole, self.spinbox_preview)
+        self.label_burst = QtWidgets.QLabel(self.widget)
+        self.label_burst.setObjectName("label_burst")
+        self.formLayout.setWidget(19, QtWidgets.QFormLayout.LabelRole, self.label_burst)
+        self.spinbox_burst = QtWidgets.QSpinBox(self.widget)
+        self.spinbox_burst.setMaximum(100000)
+        self.spinbox_burst.setSingleStep(100)
+        self.spinbox_burst.setProperty("value", 0)
+        self.spinbox_burst.setObjectName("spinbox_burst")
+        self.formLayout.setWidget(19, QtWidgets.QFormLayout.FieldRole, self.spinbox_burst)
+        self.label_cadence = QtWidgets.QLabel(self.widget)
+        self.label_cadence.setObjectName("label_cadence")
+        self.formLayout.setWidget(20, QtWidgets.QFormLayout.LabelRole, self.label_cadence)
+        self.spinbox_cadence = QtWidgets.QDoubleSpinBox(self.widget)
+        self.spinbox_cadence.setDecimals(1)
+        self.spinbox_cadence.setMaximum(3600.0)
+        self.spinbox_cadence.setProperty("value", 10.0)
+        self.spinbox_cadence.setObjectName("spinbox_cadence")
+        self.formLayout.setWidget(20, QtWidgets.QFormLayout.FieldRole, self.spinbox_cadence)
+        self.label_apertures = QtWidgets.QLabel(self.widget)
+        self.label_apertures.setObjectName("label_apertures")
+        self.formLayout.setWidget(21, QtWidgets.QFormLayout.LabelRole, self.label_apertures)
+        self.spinbox_apertures = QtWidgets.QSpinBox(self.widget)
+        self.spinbox_apertures.setMinimum(2)
+        self.spinbox_apertures.setMaximum(8)
+        self.spinbox_apertures.setProperty("value", 2)
+        self.spinbox_apertures.setObjectName("spinbox_apertures")
+        self.formLayout.setWidget(21, QtWidgets.QFormLayout.FieldRole, self.spinbox_apertures)
+        self.button_dark = QtWidgets.QPushButton(self.widget)
+        self.button_dark.setObjectName("button_dark")
+        self.formLayout.setWidget(22, QtWidgets.QFormLayout.LabelRole, self.button_dark)
+        self.button_flat = QtWidgets.QPushButton(self.widget)
+        self.button_flat.setObjectName("button_flat")
+        self.formLayout.setWidget(22, QtWidgets.QFormLayout.FieldRole, self.button_flat)
+        self.checkbox_calibration = QtWidgets.QCheckBox(self.widget)
+        self.checkbox_calibration.setLayoutDirection(QtCore.Qt.RightToLeft)
+        self.checkbox_calibration.setObjectName("checkbox_calibration")
+        self.formLayout.setWidget(23, QtWidgets.QFormLayout.LabelRole, self.checkbox_calibration)
+        self.button_masters = QtWidgets.QPushButton(self.widget)
+        self.button_masters.setObjectName("button_masters")
+        self.formLayout.setWidget(23, QtWidgets.QFormLayout.FieldRole, self.button_masters)
+        self.label_ring = QtWidgets.QLabel(self.widget)
+        self.label_ring.setObjectName("label_ring")
+        self.formLayout.setWidget(24, QtWidgets.QFormLayout.LabelRole, self.label_ring)
+        self.spinbox_ring = QtWidgets.QSpinBox(self.widget)
+        self.spinbox_ring.setMinimum(0)
+        self.spinbox_ring.setMaximum(100000)
+        self.spinbox_ring.setSingleStep(1000)
+        self.spinbox_ring.setProperty("value", 0)
+        self.spinbox_ring.setObjectName("spinbox_ring")
+        self.formLayout.setWidget(24, QtWidgets.QFormLayout.FieldRole, self.spinbox_ring)
+        self.label_freeze = QtWidgets.QLabel(self.widget)
+        self.label_freeze.setObjectName("label_freeze")
+        self.formLayout.setWidget(25, QtWidgets.QFormLayout.LabelRole, self.label_freeze)
+        self.spinbox_freeze = QtWidgets.QSpinBox(self.widget)
+        self.spinbox_freeze.setMinimum(1)
+        self.spinbox_freeze.setMaximum(3600)
+        self.spinbox_freeze.setProperty("value", 10)
+        self.spinbox_freeze.setObjectName("spinbox_freeze")
+        self.formLayout.setWidget(25, QtWidgets.QFormLayout.FieldRole, self.spinbox_freeze)
+        self.button_freeze = QtWidgets.QPushButton(self.widget)
+        self.button_freeze.setObjectName("button_freeze")
+        self.formLayout.setWidget(26, QtWidgets.QFormLayout.LabelRole, self.button_freeze)
+        self.checkbox_autofreeze = QtWidgets.QCheckBox(self.widget)
+        self.checkbox_autofreeze.setLayoutDirection(QtCore.Qt.RightToLeft)
+        self.checkbox_autofreeze.setObjectName("checkbox_autofreeze")
+        self.formLayout.setWidget(26, QtWidgets.QFormLayout.FieldRole, self.checkbox_autofreeze)
         self.verticalLayout_2.addLayout(self.formLayout)
         self.label_info = QtWidgets.QLabel(self.widget)
         self.label_info.setFrameShape(QtWidgets.QFrame.Panel)
@@ -244,6 +344,13 @@ class Ui_MainWindow(object):
         self.label_info.setWordWrap(True)
         self.label_info.setObjectName("label_info")
         self.verticalLayout_2.addWidget(self.label_info)
+        self.label_stats = QtWidgets.QLabel(self.widget)
+        self.label_stats.setFrameShape(QtWidgets.QFrame.Panel)
+        self.label_stats.setFrameShadow(QtWidgets.QFrame.Plain)
+        self.label_stats.setText("")
+        self.label_stats.setAlignment(QtCore.Qt.AlignLeading|QtCore.Qt.AlignLeft|QtCore.Qt.AlignTop)
+        self.label_stats.setObjectName("label_stats")
+        self.verticalLayout_2.addWidget(self.label_stats)
         self.horizontalLayout.addWidget(self.widget)
         MainWindow.setCentralWidget(self.centralwidget)
         self.menubar = QtWidgets.QMenuBar(MainWindow)
@@ -288,6 +395,7 @@ class Ui_MainWindow(object):
         self.menubar.addAction(self.menuHelp.menuAction())
 
         self.retranslateUi(MainWindow)
+        self.combobox_span.setCurrentIndex(1)
         QtCore.QMetaObject.connectSlotsByName(MainWindow)
 
     def retranslateUi(self, MainWindow):
@@ -302,8 +410,25 @@ class Ui_MainWindow(object):
         self.button_simulation.setText(_translate("MainWindow", "Simulation"))
         self.button_import.setText(_translate("MainWindow", "Import"))
         self.button_export.setText(_translate("MainWindow", "Export"))
+        self.checkbox_overlay.setToolTip(_translate("MainWindow", "<html><head/><body><p>Draw the detected spots and centroids on the exported frames, otherwise the raw frames are exported</p></body></html>"))
+        self.checkbox_overlay.setText(_translate("MainWindow", "Export with overlays"))
         self.button_pause.setText(_translate("MainWindow", "⏸ Pause"))
         self.enable_seeing.setText(_translate("MainWindow", "Enable seeing monitoring"))
+        self.checkbox_tracking.setToolTip(_translate("MainWindow", "<html><head/><body><p>Only search the spots in small windows around their previous positions</p></body></html>"))
+        self.checkbox_tracking.setText(_translate("MainWindow", "Track spots (ROI)"))
+        self.combobox_centroid.setToolTip(_translate("MainWindow", "<html><head/><body><p>Sub-pixel centroid estimator</p></body></html>"))
+        self.combobox_centroid.setItemText(0, _translate("MainWindow", "Centre of gravity"))
+        self.combobox_centroid.setItemText(1, _translate("MainWindow", "Windowed centre of gravity"))
+        self.combobox_centroid.setItemText(2, _translate("MainWindow", "Contour moments"))
+        self.combobox_centroid.setItemText(3, _translate("MainWindow", "All spots, one pass (multi-aperture)"))
+        self.checkbox_stats.setToolTip(_translate("MainWindow", "<html><head/><body><p>Latency of each processing stage, dropped and rejected frames, queue depths (also written to seeing_stats.json)</p></body></html>"))
+        self.checkbox_stats.setText(_translate("MainWindow", "Pipeline statistics"))
+        self.combobox_span.setToolTip(_translate("MainWindow", "<html><head/><body><p>Time span of the seeing chart</p></body></html>"))
+        self.combobox_span.setItemText(0, _translate("MainWindow", "Chart: last 10 seconds"))
+        self.combobox_span.setItemText(1, _translate("MainWindow", "Chart: last minute"))
+        self.combobox_span.setItemText(2, _translate("MainWindow", "Chart: last 10 minutes"))
+        self.combobox_span.setItemText(3, _translate("MainWindow", "Chart: last hour"))
+        self.combobox_span.setItemText(4, _translate("MainWindow", "Chart: whole night"))
         self.button_noise.setToolTip(_translate("MainWindow", "<html><head/><body><p>Press this button to select the Regions of Interest (where the two star projections are located)</p></body></html>"))
         self.button_noise.setWhatsThis(_translate("MainWindow", "<html><head/><body><p>Press this button to select the Regions of Interest (where the two star projections are located)</p></body></html>"))
         self.button_noise.setText(_translate("MainWindow", "Select Noise Area"))
@@ -331,6 +456,30 @@ class Ui_MainWindow(object):
         self.label_6.setWhatsThis(_translate("MainWindow", "<html><head/><body><p>Pixel Height in micrometers</p></body></html>"))
         self.label_6.setText(_translate("MainWindow", "Pixel Height (µm)"))
         self.checkbox_thresh.setText(_translate("MainWindow", "Threshold (auto)"))
+        self.label_preview.setToolTip(_translate("MainWindow", "<html><head/><body><p>Refresh rate of the preview, the frames are processed at the camera rate</p></body></html>"))
+        self.label_preview.setText(_translate("MainWindow", "Preview (Hz)"))
+        self.label_burst.setToolTip(_translate("MainWindow", "<html><head/><body><p>Number of frames of a camera burst, processed at once (0: continuous processing of every frame)</p></body></html>"))
+        self.label_burst.setText(_translate("MainWindow", "Burst (frames)"))
+        self.label_cadence.setToolTip(_translate("MainWindow", "<html><head/><body><p>Time between the starts of two camera bursts, in seconds</p></body></html>"))
+        self.label_cadence.setText(_translate("MainWindow", "Burst cadence (s)"))
+        self.label_apertures.setToolTip(_translate("MainWindow", "<html><head/><body><p>Number of apertures of the mask, the seeing is measured on every pair (with the one pass detection of all the spots)</p></body></html>"))
+        self.label_apertures.setText(_translate("MainWindow", "Apertures"))
+        self.button_dark.setToolTip(_translate("MainWindow", "<html><head/><body><p>Average the next frames into the master dark (shutter closed or telescope covered, same exposure and gain)</p></body></html>"))
+        self.button_dark.setText(_translate("MainWindow", "Record Dark"))
+        self.button_flat.setToolTip(_translate("MainWindow", "<html><head/><body><p>Average the next frames into the master flat (uniformly lit field), the master dark is subtracted</p></body></html>"))
+        self.button_flat.setText(_translate("MainWindow", "Record Flat"))
+        self.checkbox_calibration.setToolTip(_translate("MainWindow", "<html><head/><body><p>Subtract the master dark and divide by the master flat, in place, before the detection</p></body></html>"))
+        self.checkbox_calibration.setText(_translate("MainWindow", "Calibration"))
+        self.button_masters.setToolTip(_translate("MainWindow", "<html><head/><body><p>Load master dark and flat frames (.npz, see build_masters.py)</p></body></html>"))
+        self.button_masters.setText(_translate("MainWindow", "Load Masters..."))
+        self.label_ring.setToolTip(_translate("MainWindow", "<html><head/><body><p>Size of the black box file, which keeps the last raw camera frames (0: disabled), taken into account when the camera starts</p></body></html>"))
+        self.label_ring.setText(_translate("MainWindow", "Black box (MB)"))
+        self.label_freeze.setToolTip(_translate("MainWindow", "<html><head/><body><p>Duration of the black box recording saved by a freeze, in seconds</p></body></html>"))
+        self.label_freeze.setText(_translate("MainWindow", "Freeze (s)"))
+        self.button_freeze.setToolTip(_translate("MainWindow", "<html><head/><body><p>Save the last seconds of the black box to a permanent file</p></body></html>"))
+        self.button_freeze.setText(_translate("MainWindow", "Freeze Black Box"))
+        self.checkbox_autofreeze.setToolTip(_translate("MainWindow", "<html><head/><body><p>Freeze the black box automatically when the spots are lost or on a seeing spike</p></body></html>"))
+        self.checkbox_autofreeze.setText(_translate("MainWindow", "Auto freeze"))
         self.menuStart.setTitle(_translate("MainWindow", "&Start"))
         self.menuHelp.setTitle(_translate("MainWindow", "&Help"))
         self.actionSelect_camera.setText(_translate("MainWindow", "Select &Camera and Start"))
@@ -0,0 +1,101 @@
+import numpy as np
+
+
+# Standard deviation of a gaussian noise from its median absolute deviation
+MAD_TO_SIGMA = 1.4826
+
+
+def clippedStatistics(samples, clip=3.0, iterations=3):
+    """
+    Sigma-clipped median and standard deviation (from the MAD) of `samples`: the
+    spots, hot pixels and cosmic rays are rejected, only the background remains.
+    """
+    samples = np.asarray(samples, dtype=np.float64).ravel()
+    median, sigma = 0.0, 0.0
+    for _ in range(iterations):
+        if samples.size == 0:
+            break
+        median = np.median(samples)
+        sigma = MAD_TO_SIGMA * np.median(np.abs(samples - median))
+        kept = samples[np.abs(samples - median) <= clip * max(sigma, 0.5)]
+        if kept.size == samples.size:
+            break
+        samples = kept
+    return median, sigma
+
+
+class BackgroundThreshold(object):
+    """
+    Automatic threshold: background level plus `nsigma` times the background noise.
+
+    Level and noise are estimated on a sparse grid of pixels (one every `step` pixels
+    in each direction, about 5000 pixels at 640x480) with a sigma-clipped median and
+    MAD, so that neither the spots nor the hot pixels bias them. The estimate is only
+    refreshed every `every` frames, or earlier when the median of a much sparser grid,
+    checked every `check` frames, drifts by more than `drift` sigmas (e.g. moonrise,
+    twilight, clouds). On the other frames, `update` only increments a counter.
+
+    `area` optionally restricts the estimate to a part of the frame `(x0, y0, x1, y1)`.
+    """
+
+    def __init__(self, nsigma=5.0, step=8, every=100, check=10, drift=3.0, clip=3.0):
+        self.nsigma = nsigma
+        self.step = step
+        self.every = every
+        self.check = check
+        self.drift = drift
+        self.clip = clip
+        self.area = None
+
+        self.level = None
+        self.noise = None
+        self.thresh = None
+        self.updates = 0
+        self._frames = 0
+
+    def reset(self):
+        self.level = None
+        self._frames = 0
+
+    def update(self, frame):
+        """
+        Return the threshold (8-bit scale, like `SeeingProcessor.thresh`) for `frame`
+        (mono or BGR, 8 or 16 bits), re-estimating the background when needed.
+        """
+        self._frames += 1
+        if self.level is None or self._frames >= self.every or \
+                (self._frames % self.check == 0 and self._drifted(frame)):
+            self._estimate(frame)
+        return self.thresh
+
+    def setArea(self, area):
+        """ Restrict the estimate to `(x0, y0, x1, y1)` (any corner order), None for the whole frame. """
+        if area is not None:
+            (x0, y0, x1, y1) = area
+            area = (min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1))
+        self.area = area
+        self.reset()
+
+    def _samples(self, frame, step):
+        if self.area is not None:
+            x0, y0, x1, y1 = self.area
+            frame = frame[y0:y1, x0:x1]
+            step = max(1, min(step, (x1 - x0) // 8, (y1 - y0) // 8))
+        samples = frame[step // 2::step, step // 2::step]
+        if samples.ndim == 3:
+            samples = samples[..., :3].mean(axis=2)
+        return samples
+
+    def _drifted(self, frame):
+        current = np.median(self._samples(frame, self.step * 4))
+        return abs(current - self.level) > self.drift * max(self.noise, 1.0)
+
+    def _estimate(self, frame):
+        self.level, self.noise = clippedStatistics(self._samples(frame, self.step), self.clip)
+        self._frames = 0
+        self.updates += 1
+
+        # On the 8-bit scale of the slider, whatever the bit depth of the frame
+        scale = 255.0 / np.iinfo(frame.dtype).max if frame.dtype != np.uint8 else 1.0
+        thresh = (self.level + self.nsigma * max(self.noise, 1.0 / scale)) * scale
+        self.thresh = int(min(max(np.ceil(thresh), 1), 254))
@@ -0,0 +1,67 @@
+import ctypes as C
+import threading
+import time
+
+import numpy as np
+
+
+class BurstBuffer(object):
+    """
+    Preallocated `(count, height, width)` stack filled by the camera driver during a burst.
+
+    `arm` starts a burst: the next `count` frames given to `push` (frame ready
+    callback) are copied, once each, into the stack with their frame number and
+    time of arrival, then `wait` returns. Frames pushed while the buffer is not
+    armed (e.g. during the processing of the previous burst) are ignored.
+    """
+
+    def __init__(self, count, shape, dtype=np.uint8):
+        self.count = count
+        self.frames = np.empty((count,) + tuple(shape), dtype=dtype)
+        self.nbytes = self.frames[0].nbytes
+        self.framenumbers = np.zeros(count, dtype=np.int64)
+        self.timestamps = np.zeros(count, dtype=np.float64)
+
+        self.filled = 0
+        self._armed = False
+        self._complete = threading.Event()
+
+    def arm(self):
+        self.filled = 0
+        self._complete.clear()
+        self._armed = True
+
+    def disarm(self):
+        self._armed = False
+
+    def push(self, pBuffer, framenumber):
+        """
+        Copy the image pointed by `pBuffer` into the next frame of the burst. Driver side.
+
+        :param: pBuffer : Pointer to the first pixel's first byte
+        :param: framenumber : Number of the frame since the stream started
+        """
+        if not self._armed:
+            return False
+
+        index = self.filled
+        C.memmove(self.frames[index].ctypes.data, pBuffer, self.nbytes)
+        self.framenumbers[index] = framenumber
+        self.timestamps[index] = time.time()
+
+        self.filled = index + 1
+        if self.filled == self.count:
+            self._armed = False
+            self._complete.set()
+        return True
+
+    def wait(self, timeout=None):
+        """ Wait for the end of the burst. Returns False on timeout. """
+        return self._complete.wait(timeout)
+
+    @property
+    def dropped(self):
+        """ Frames lost by the driver during the last burst (gaps in the frame numbers). """
+        if self.filled < 2:
+            return 0
+        return int(self.framenumbers[self.filled - 1] - self.framenumbers[0] - (self.filled - 1))
@@ -0,0 +1,180 @@
+import numpy as np
+import cv2
+
+
+# Default file of the master frames
+CALIBRATION_FILENAME = "calibration.npz"
+
+
+def combineFrames(frames, method="median"):
+    """
+    Master frame (float32) of a captured sequence: per-pixel median (rejects the
+    cosmic rays and the passing satellites) or mean of the `(n, height, width)` frames.
+    """
+    frames = np.asarray(frames)
+    if method == "median":
+        return np.median(frames, axis=0).astype(np.float32)
+    return frames.mean(axis=0, dtype=np.float64).astype(np.float32)
+
+
+class MasterBuilder(object):
+    """
+    Incremental mean of frames, e.g. to build a master dark or flat from the live
+    stream: one accumulation per frame, nothing kept but the running sum.
+    """
+
+    def __init__(self, count=None):
+        self.count = count      # Number of frames to accumulate, None for no limit
+        self.sum = None
+        self.added = 0
+
+    def add(self, frame):
+        """ Accumulate `frame`. Returns True once `count` frames were added. """
+        if self.sum is None:
+            self.sum = np.zeros(frame.shape, dtype=np.float64)
+        elif self.sum.shape != frame.shape:
+            raise ValueError("Frame shape {} differs from the master shape {}".format(frame.shape, self.sum.shape))
+
+        np.add(self.sum, frame, out=self.sum)
+        self.added += 1
+        return self.complete
+
+    @property
+    def complete(self):
+        return self.count is not None and self.added >= self.count
+
+    def master(self):
+        if self.added == 0:
+            return None
+        return (self.sum / self.added).astype(np.float32)
+
+
+class Calibration(object):
+    """
+    Dark subtraction and flat field correction, applied in place on the frames.
+
+    The masters are converted once to what the hot path needs: the dark rounded
+    to the bit depth of the frames (saturating subtraction) and the flat as a
+    float32 gain map normalized to its median. `apply` then costs two OpenCV
+    operations, on the whole frame or only on some windows `(x0, y0, x1, y1)`
+    (e.g. the tracking windows); the raw pixels of the windows are kept, so
+    that `complete` can still calibrate the whole frame when the spots are lost.
+
+    :param: dark : Master dark (same exposure and gain as the frames)
+    :param: flat : Master flat, dark subtracted
+    """
+
+    def __init__(self, dark=None, flat=None):
+        self.dark = None
+        self.flat = None
+        self.setMasters(dark, flat)
+
+    def setMasters(self, dark=None, flat=None):
+        if dark is not None and flat is not None and dark.shape != flat.shape:
+            raise ValueError("Dark shape {} differs from the flat shape {}".format(dark.shape, flat.shape))
+
+        self.dark = None if dark is None else np.asarray(dark, dtype=np.float32)
+        self.flat = None if flat is None else np.asarray(flat, dtype=np.float32)
+
+        self.gain = None
+        if self.flat is not None:
+            median = np.median(self.flat)
+            # Dead or unexposed pixels are left as they are
+            valid = self.flat > 0.1 * median
+            self.gain = np.ones(self.flat.shape, dtype=np.float32)
+            self.gain[valid] = median / self.flat[valid]
+
+        # Prepared for the bit depth of the frames on the first `apply`
+        self._dtype = None
+        self._dark = None
+        self._raw = None
+        self._windows = None
+
+    @property
+    def shape(self):
+        master = self.dark if self.dark is not None else self.flat
+        return None if master is None else master.shape
+
+    @property
+    def empty(self):
+        return self.dark is None and self.flat is None
+
+    def _prepare(self, frame):
+        if frame.shape != self.shape:
+            raise ValueError("Frame shape {} differs from the masters shape {}".format(frame.shape, self.shape))
+
+        if self.dark is not None:
+            maximum = np.iinfo(frame.dtype).max if frame.dtype.kind in "ui" else None
+            self._dark = np.clip(np.round(self.dark), 0, maximum).astype(frame.dtype)
+        self._raw = np.empty_like(frame)
+        self._dtype = frame.dtype
+
+    def apply(self, frame, windows=None):
+        """
+        Calibrate `frame` in place, entirely or only within `windows` (`[(x0, y0, x1, y1), ...]`,
+        the whole frame is calibrated if they overlap).
+        """
+        if self.empty:
+            return
+        if frame.dtype != self._dtype or frame.shape != self._raw.shape:
+            self._prepare(frame)
+
+        if windows is not None and not self._disjoint(windows):
+            windows = None
+        self._windows = windows
+
+        if windows is None:
+            self._calibrate(frame, slice(None), slice(None))
+            return
+
+        for x0, y0, x1, y1 in windows:
+            rows, columns = slice(y0, y1), slice(x0, x1)
+            self._raw[rows, columns] = frame[rows, columns]
+            self._calibrate(frame, rows, columns)
+
+    def complete(self, frame):
+        """ After an `apply` restricted to windows, calibrate the whole frame. """
+        if self._windows is None:
+            return
+        for x0, y0, x1, y1 in self._windows:
+            frame[y0:y1, x0:x1] = self._raw[y0:y1, x0:x1]
+        self.apply(frame)
+
+    def _calibrate(self, frame, rows, columns):
+        view = frame[rows, columns]
+        if self._dark is not None:
+            cv2.subtract(view, self._dark[rows, columns], dst=view)
+        if self.gain is not None:
+            cv2.multiply(view, self.gain[rows, columns], dst=view, dtype=cv2.CV_8U if view.dtype == np.uint8 else cv2.CV_16U)
+
+    @staticmethod
+    def _disjoint(windows):
+        for i, (ax0, ay0, ax1, ay1) in enumerate(windows):
+            for bx0, by0, bx1, by1 in windows[i + 1:]:
+                if ax0 < bx1 and bx0 < ax1 and ay0 < by1 and by0 < ay1:
+                    return False
+        return True
+
+    def cropped(self, roi):
+        """ Calibration of the `(x, y, width, height)` part of the frames (e.g. the sensor ROI). """
+        x, y, width, height = roi
+        calibration = Calibration(
+            None if self.dark is None else self.dark[y:y + height, x:x + width],
+            None if self.flat is None else self.flat[y:y + height, x:x + width])
+        # Same normalization as the whole frame
+        if self.gain is not None:
+            calibration.gain = self.gain[y:y + height, x:x + width].copy()
+        return calibration
+
+    def save(self, filename=CALIBRATION_FILENAME):
+        masters = {}
+        if self.dark is not None:
+            masters["dark"] = self.dark
+        if self.flat is not None:
+            masters["flat"] = self.flat
+        np.savez_compressed(filename, **masters)
+
+    @classmethod
+    def load(cls, filename=CALIBRATION_FILENAME):
+        with np.load(filename) as masters:
+            return cls(masters["dark"] if "dark" in masters else None, masters["flat"] if "flat" in masters else None)
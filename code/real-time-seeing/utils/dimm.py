@@ -0,0 +1,598 @@
+from itertools import combinations
+import logging
+import time
+
+import numpy as np
+import cv2
+
+from utils.state_enum import CentroidEstimator
+from utils.running_stats import SlidingWindow, RunningStatistics
+
+
+CSV_FIELDNAMES = ["timestamp", "lateral", "transversal", "star"]
+
+RAD_TO_ARCSEC = 206264.806
+
+
+def scaledThreshold(thresh, dtype):
+    """ `thresh` is given on the 8-bit scale (0-255), return it at the bit depth of `dtype`. """
+    if dtype == np.uint8:
+        return thresh
+    return thresh * (np.iinfo(dtype).max / 255.0)
+
+
+def spotMask(gray, thresh):
+    """
+    8-bit image of the pixels above `thresh` (8-bit scale), usable by `cv2.findContours`.
+    Mono 8-bit (Y800) and 16-bit (Y16) frames are both supported.
+    """
+    if gray.dtype == np.uint8:
+        _, thresholded = cv2.threshold(gray, thresh, 255, cv2.THRESH_TOZERO)
+        return thresholded
+    return cv2.compare(gray, scaledThreshold(thresh, gray.dtype), cv2.CMP_GT)
+
+
+def toUint8(frame):
+    """ 8-bit version of a frame, e.g. for display or video export. """
+    if frame.dtype == np.uint8:
+        return frame
+    return (frame >> (8 * frame.dtype.itemsize - 8)).astype(np.uint8)
+
+
+def labelSpots(gray, thresh):
+    """
+    Detect and measure all the spots of a mono frame in a single pass: outer contours
+    of the pixels above `thresh` (8-bit scale, cheaper than labelling every pixel of
+    the frame), then centre of gravity of the thresholded pixels in the bounding box
+    of each spot, computed from its row and column sums.
+
+    :returns: `(centroids, flux, boxes)`, ranked by decreasing flux: the `(k, 2)`
+              centroids `(x, y)`, the `(k,)` fluxes and the `(k, 4)` bounding boxes
+              `(x, y, width, height)`
+    """
+    contours, _ = cv2.findContours(spotMask(gray, thresh), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    count = len(contours)
+
+    centroids = np.zeros((count, 2))
+    flux = np.zeros(count)
+    boxes = np.array([cv2.boundingRect(contour) for contour in contours], dtype=np.int32).reshape(count, 4)
+
+    level = scaledThreshold(thresh, gray.dtype)
+    for index, (x, y, w, h) in enumerate(boxes.tolist()):
+        patch = gray[y:y + h, x:x + w]
+        patch = np.where(patch > level, patch, 0).astype(np.float64)
+        flux[index] = patch.sum()
+        if flux[index] > 0:
+            centroids[index, 0] = x + patch.sum(axis=0) @ np.arange(w) / flux[index]
+            centroids[index, 1] = y + patch.sum(axis=1) @ np.arange(h) / flux[index]
+        else:
+            centroids[index] = np.nan
+
+    order = np.argsort(-flux, kind="stable")
+    return centroids[order], flux[order], boxes[order]
+
+
+def zTilt(b, d):
+    """
+    Longitudinal and transverse Z-tilt response coefficients `(K_lat, K_tra)` of the DIMM
+    (Tokovinin 2002, eq. 5), for an apertures separation `b` and diameter `d` (same unit).
+    """
+    b = float(b) / float(d)
+    K_lat = 0.364 * (1 - 0.532 * np.power(b, -1 / 3) - 0.024 * np.power(b, -7 / 3))
+    K_tra = 0.364 * (1 - 0.798 * np.power(b, -1 / 3) - 0.018 * np.power(b, -7 / 3))
+    return K_lat, K_tra
+
+
+def unitVector(x, y):
+    norm = float(np.hypot(x, y))
+    return x / norm, y / norm
+
+
+def baselineDeltas(delta_x, delta_y, axis=(1.0, 0.0)):
+    """
+    Differential motion along (longitudinal) and across (transverse) a baseline of unit
+    vector `axis` (image axes, square pixels), from the signed deltas of two spots, as
+    scalars or arrays. Both are oriented so that the longitudinal delta is positive,
+    i.e. whatever the order of the two spots; the transverse delta keeps its sign.
+    """
+    ux, uy = axis
+    longitudinal = delta_x * ux + delta_y * uy
+    transverse = delta_y * ux - delta_x * uy
+    sign = np.copysign(1.0, longitudinal)
+    return longitudinal * sign, transverse * sign
+
+
+def toBGR(frame):
+    """ 8-bit BGR copy of a frame (mono, BGR or BGRA), to draw overlays on. """
+    if frame.ndim == 2:
+        return cv2.cvtColor(toUint8(frame), cv2.COLOR_GRAY2BGR)
+    if frame.shape[2] == 4:
+        return cv2.cvtColor(toUint8(frame), cv2.COLOR_BGRA2BGR)
+    return toUint8(frame).copy()
+
+
+def drawOverlay(image, contours, centroids=None):
+    """ Draw the spot contours and, if known, their centroids on the BGR `image`, in place. """
+    cv2.drawContours(image, contours, -1, (0, 255, 0), 2)
+    if centroids is not None:
+        for cX, cY in centroids:
+            cv2.drawMarker(image, (int(round(cX)), int(round(cY))), color=(0, 0, 255), markerSize=30, thickness=1)
+    return image
+
+
+class SeeingProcessor(object):
+    """
+    Centroid and seeing computation of the DIMM, without any Qt dependency.
+
+    This is the logic behind `SeeingMonitor._monitor`, so that the GUI and the
+    headless tools (e.g. `batch_seeing.py`) produce the same numbers.
+    """
+
+    def __init__(self, thresh=127, window=100, tracking=False, roi_size=32,
+                 estimator=CentroidEstimator.COG, wcog_sigma=3.0, durations=(), block_length=None,
+                 apertures=2, pairs=None, background=None, calibration=None):
+        self.thresh = thresh
+        self.window = window
+
+        # Dark and flat correction applied in place on the frames (`Calibration`), None to disable.
+        # It is disabled when the masters do not match the frames, `calibration_error` tells why
+        self.calibration = calibration
+        self.calibration_error = None
+
+        # Automatic threshold (e.g. `BackgroundThreshold`), None to keep `thresh`
+        self.background = background
+
+        # Sub-pixel centroid estimator, and width (pixels) of the gaussian window
+        # of the windowed centre of gravity
+        self.estimator = estimator
+        self.wcog_sigma = wcog_sigma
+
+        # ROI tracking: after a full-frame detection, only search the spots in
+        # windows of `2 * roi_size` pixels centred on the previous centroids
+        self.tracking = tracking
+        self.roi_size = roi_size
+        self.previous_centroids = None
+
+        # Standard deviation of the deltas along and across the baseline, over the last
+        # `window` frames (the main seeing value) and over the extra `durations` (seconds),
+        # plus the statistics of consecutive blocks of `block_length` frames
+        self.statistics = RunningStatistics(
+            [SlidingWindow(length=window)] + [SlidingWindow(duration=duration) for duration in durations],
+            block_length=block_length)
+        self.last_block = None
+
+        # Multi-aperture masks (`CentroidEstimator.COMPONENTS` only): the `apertures`
+        # brightest spots keep their identity from frame to frame, and the deltas of
+        # every pair of `pairs` go to their own window of `window` frames
+        self.setApertures(apertures, pairs)
+
+        self.K_lat = None
+        self.K_tra = None
+        self.A = None
+
+        self.pixel_width = 0.0
+        self.pixel_height = 0.0
+        self.focal = 0.0
+
+
+    def setBaseline(self, b, d):
+        """
+        Update the Z-tilt constants from the apertures separation `b` and diameter `d`.
+        Raises ZeroDivisionError when `d` is zero.
+        """
+        self.K_lat, self.K_tra = zTilt(b, d)
+
+
+    def setPairBaselines(self, baselines, d):
+        """
+        Geometry of each pair `(i, j)` of `pairs` (same order): its baseline vector `(bx, by)`
+        (mm, from aperture i to aperture j, in the axes of the image), which gives its Z-tilt
+        constants and the directions along and across which its motion is measured.
+        None to use the separation given to `setBaseline` for every pair, along the direction
+        of its spots on the first frame where all of them are measured.
+        """
+        if baselines is None:
+            self.pair_K = None
+            self.pair_axes = None
+            return
+        self.pair_K = [zTilt(np.hypot(bx, by), d) for bx, by in baselines]
+        self.pair_axes = [unitVector(bx, by) for bx, by in baselines]
+
+
+    def setApertures(self, apertures, pairs=None):
+        """
+        Number of apertures of the mask, and the pairs `(i, j)` of spot identities
+        whose differential motion is measured (default: every pair, i.e. 6 for 4 apertures).
+        """
+        self.apertures = apertures
+        self.pairs = list(pairs) if pairs is not None else list(combinations(range(apertures), 2))
+        self.pair_windows = [SlidingWindow(length=self.window) for _ in self.pairs]
+        self.pair_K = None
+        self.pair_axes = None
+        self.spots = None
+
+
+    def setWavelength(self, d, wavelength):
+        """ Aperture diameter `d` (mm) and `wavelength` (µm), through the constant 0.98 * (d / wavelength)^0.2. """
+        self.A = 0.98 * np.power(float(d) * 1e-3 / (float(wavelength) * 1e-6), 0.2)
+
+
+    def setPlateScale(self, pixel_width, pixel_height, focal):
+        self.pixel_width = float(pixel_width)
+        self.pixel_height = float(pixel_height)
+        self.focal = float(focal)
+
+
+    def findSpots(self, frame):
+        """
+        Threshold the frame and return the contours of the (at most) two DIMM spots.
+
+        In tracking mode, the spots are first searched around their previous
+        centroids, and the whole frame is only searched when one of them is lost.
+        With `CentroidEstimator.COMPONENTS`, all the spots are detected in one pass
+        (see `labelSpots`) and tracked by identity instead.
+        """
+        tracked = self.tracking and self.estimator != CentroidEstimator.COMPONENTS and self.previous_centroids is not None
+
+        if self.calibration is not None:
+            # Only the tracking windows need to be calibrated, unless the background
+            # level is estimated (on the whole frame)
+            self._calibrate(frame, self._trackingWindows(frame) if tracked and self.background is None else None)
+
+        if self.background is not None:
+            self.thresh = self.background.update(frame)
+
+        if tracked:
+            contours = self._trackSpots(frame)
+            if contours is not None:
+                return contours
+            self.previous_centroids = None
+            if self.calibration is not None:
+                self.calibration.complete(frame)
+
+        if frame.ndim == 3:
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        else:
+            gray = frame
+
+        if self.estimator == CentroidEstimator.COMPONENTS:
+            return self._labelSpots(gray)
+
+        contours, _ = cv2.findContours(spotMask(gray, self.thresh), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
+
+        return contours[:2]
+
+
+    def _calibrate(self, frame, windows=None):
+        """
+        Calibrate `frame` in place (see `Calibration.apply`). When the masters do not match
+        the frame (e.g. other masters loaded, or another sensor ROI), the calibration is
+        disabled rather than failing the processing, and the reason is kept in `calibration_error`.
+        """
+        try:
+            self.calibration.apply(frame, windows)
+        except ValueError as e:
+            logging.error("Calibration disabled: {}".format(e))
+            self.calibration = None
+            self.calibration_error = str(e)
+            return False
+        return True
+
+
+    def _labelSpots(self, gray):
+        """
+        One pass detection of the `apertures` brightest spots, in the order of their
+        identities. Their centroids are kept in `spots`, and their bounding boxes are
+        returned as contours (for display).
+        """
+        centroids, _, boxes = labelSpots(gray, self.thresh)
+        centroids, boxes = centroids[:self.apertures], boxes[:self.apertures]
+
+        if len(centroids) == self.apertures:
+            order = self._identify(centroids)
+            centroids, boxes = centroids[order], boxes[order]
+        self.spots = centroids
+
+        return [np.array([[[x, y]], [[x + w - 1, y]], [[x + w - 1, y + h - 1]], [[x, y + h - 1]]], dtype=np.int32)
+            for x, y, w, h in boxes.tolist()]
+
+
+    def _identify(self, centroids):
+        """
+        Order of `centroids` following the identities of the spots: each previous spot
+        takes the nearest new one. Identities are (re)assigned from left to right (then
+        top to bottom) on the first detection, or when a spot jumped more than `roi_size`.
+        """
+        previous = self.previous_centroids
+        if previous is not None and len(previous) == len(centroids):
+            distances = np.hypot(*(np.asarray(previous)[:, np.newaxis, :] - centroids[np.newaxis, :, :]).transpose(2, 0, 1))
+            order = np.full(len(centroids), -1)
+            for _ in range(len(centroids)):
+                i, j = np.unravel_index(np.argmin(distances), distances.shape)
+                if distances[i, j] > self.roi_size:
+                    break
+                order[i] = j
+                distances[i, :] = np.inf
+                distances[:, j] = np.inf
+            else:
+                return order
+
+        return np.lexsort((centroids[:, 1], centroids[:, 0]))
+
+
+    def _trackingWindows(self, frame):
+        """ Search windows `(x0, y0, x1, y1)` centred on the previous centroids, within the frame. """
+        height, width = frame.shape[:2]
+        windows = []
+        for cX, cY in self.previous_centroids:
+            cX, cY = int(round(cX)), int(round(cY))
+            windows.append((max(cX - self.roi_size, 0), max(cY - self.roi_size, 0),
+                min(cX + self.roi_size, width), min(cY + self.roi_size, height)))
+        return windows
+
+
+    def _trackSpots(self, frame):
+        """
+        Return the contours of the two spots found in their ROI (in frame coordinates),
+        or None when a spot is lost: nothing above the threshold, a spot touching the
+        border of its window, or both windows (overlapping when the spots are closer
+        than `roi_size`) locked onto the same spot.
+
+        In each window, the spot is the contour whose bounding box centre is the
+        nearest to the previous centroid.
+        """
+        height, width = frame.shape[:2]
+        contours = []
+        boxes = []
+
+        for (x0, y0, x1, y1), (cX, cY) in zip(self._trackingWindows(frame), self.previous_centroids):
+            window = frame[y0:y1, x0:x1]
+            if window.ndim == 3:
+                window = cv2.cvtColor(window, cv2.COLOR_BGR2GRAY)
+
+            found, _ = cv2.findContours(spotMask(window, self.thresh), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE, offset=(x0, y0))
+            if len(found) == 0:
+                return None
+
+            found = [(contour, cv2.boundingRect(contour)) for contour in found]
+            spot, box = min(found, key=lambda item:
+                np.hypot(item[1][0] + item[1][2] / 2.0 - cX, item[1][1] + item[1][3] / 2.0 - cY))
+            x, y, w, h = box
+            if (x <= x0 and x0 > 0) or (y <= y0 and y0 > 0) or \
+                (x + w >= x1 and x1 < width) or (y + h >= y1 and y1 < height):
+                return None
+            if box in boxes:
+                return None
+
+            contours.append(spot)
+            boxes.append(box)
+
+        return contours
+
+
+    def centroids(self, frame, contours):
+        """
+        Return the sub-pixel centroids `[(x1, y1), (x2, y2)]` (floats) of the two spots,
+        using the selected `estimator`.
+
+        Raises IndexError when less than two contours were found and
+        ZeroDivisionError on spots with a null flux.
+        """
+        if self.estimator == CentroidEstimator.COMPONENTS:
+            if self.spots is None or len(self.spots) < self.apertures:
+                raise IndexError("Only {} spots were found".format(0 if self.spots is None else len(self.spots)))
+            if not np.isfinite(self.spots).all():
+                raise ZeroDivisionError("Spot without any pixel above the threshold")
+            self.previous_centroids = [tuple(centroid) for centroid in self.spots.tolist()]
+            return self.previous_centroids
+
+        if len(contours) < 2:
+            raise IndexError("Only {} spots were found".format(len(contours)))
+
+        self.previous_centroids = [self._centroid(frame, contour) for contour in contours[:2]]
+        return self.previous_centroids
+
+
+    def _centroid(self, frame, contour):
+        if self.estimator == CentroidEstimator.CONTOUR:
+            moments = cv2.moments(contour)
+            return moments["m10"] / moments["m00"], moments["m01"] / moments["m00"]
+
+        # Centre of gravity of the pixels above the threshold (same test as `spotMask`) inside the bounding box of the spot
+        x, y, w, h = cv2.boundingRect(contour)
+        patch = frame[y:y + h, x:x + w]
+        if patch.ndim == 3:
+            patch = cv2.cvtColor(patch, cv2.COLOR_BGR2GRAY)
+        patch = np.where(patch > scaledThreshold(self.thresh, patch.dtype), patch, 0).astype(np.float64)
+
+        flux = patch.sum()
+        if flux == 0:
+            raise ZeroDivisionError("Spot without any pixel above the threshold")
+
+        rows, cols = np.indices(patch.shape, dtype=np.float64)
+        cX = (patch * cols).sum() / flux
+        cY = (patch * rows).sum() / flux
+
+        if self.estimator == CentroidEstimator.WCOG:
+            # Iterate the centre of gravity weighted by a gaussian window centred on the last estimate
+            for _ in range(3):
+                weighted = patch * np.exp(-((cols - cX) ** 2 + (rows - cY) ** 2) / (2 * self.wcog_sigma ** 2))
+                flux = weighted.sum()
+                if flux == 0:
+                    break
+                cX = (weighted * cols).sum() / flux
+                cY = (weighted * rows).sum() / flux
+
+        return x + cX, y + cY
+
+
+    def centroidsStack(self, frames):
+        """
+        Centroids of the two spots on every frame of a stack (e.g. a burst), as a
+        `(n, 2, 2)` array of `(x, y)`, NaN on the frames where a spot was not measured.
+
+        With the centre of gravity estimator the spots are detected only once, on the
+        maximum of the stack, and the centroids of all the frames are computed at once
+        within these fixed bounding boxes. The other estimators go frame by frame
+        through `findSpots` and `centroids`. The frames are calibrated in place.
+        """
+        if self.estimator == CentroidEstimator.COG:
+            if self.calibration is not None:
+                for frame in frames:
+                    if not self._calibrate(frame):
+                        break
+            if self.background is not None:
+                self.thresh = self.background.update(frames[0])
+
+        if frames.ndim == 4:
+            frames = np.stack([cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY if frame.shape[2] == 3
+                else cv2.COLOR_BGRA2GRAY) for frame in frames])
+
+        result = np.full((len(frames), 2, 2), np.nan)
+
+        if self.estimator != CentroidEstimator.COG:
+            for index, frame in enumerate(frames):
+                try:
+                    result[index] = self.centroids(frame, self.findSpots(frame))[:2]
+                except (IndexError, ZeroDivisionError):
+                    pass
+            return result
+
+        contours, _ = cv2.findContours(
+            spotMask(frames.max(axis=0), self.thresh), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
+        if len(contours) < 2:
+            return result
+
+        # The two brightest areas, from left to right
+        contours = sorted(contours, key=cv2.contourArea, reverse=True)[:2]
+        boxes = sorted(cv2.boundingRect(contour) for contour in contours)
+
+        thresh = scaledThreshold(self.thresh, frames.dtype)
+        for spot, (x, y, w, h) in enumerate(boxes):
+            patches = frames[:, y:y + h, x:x + w]
+            patches = np.where(patches > thresh, patches, 0).astype(np.float64)
+
+            flux = patches.sum(axis=(1, 2))
+            with np.errstate(invalid="ignore", divide="ignore"):
+                result[:, spot, 0] = x + patches.sum(axis=1) @ np.arange(w) / flux
+                result[:, spot, 1] = y + patches.sum(axis=2) @ np.arange(h) / flux
+
+        result[~np.isfinite(result).all(axis=(1, 2))] = np.nan
+        self.previous_centroids = None
+        return result
+
+
+    def addDeltasStack(self, centroids, timestamps):
+        """
+        Add the deltas of a `(n, 2, 2)` stack of centroids (see `centroidsStack`) taken at
+        `timestamps` to the statistics, skipping the unmeasured frames. Returns the last
+        completed block, if any.
+        """
+        block = None
+        valid = np.isfinite(centroids).all(axis=(1, 2))
+        deltas = centroids[valid, 1] - centroids[valid, 0]
+        longitudinal, transverse = baselineDeltas(deltas[:, 0], deltas[:, 1])
+        for delta in zip(longitudinal.tolist(), transverse.tolist(), np.asarray(timestamps)[valid].tolist()):
+            completed = self.statistics.add(delta[:2], delta[2])
+            if completed is not None:
+                block = completed
+
+        self.last_block = block if block is not None else self.last_block
+        return block
+
+
+    def stackSeeing(self, centroids):
+        """
+        Lateral and transversal FWHM seeing (arcsec) of a `(n, 2, 2)` stack of centroids,
+        from the standard deviation of its deltas, or None with less than two measured frames.
+        """
+        valid = np.isfinite(centroids).all(axis=(1, 2))
+        if valid.sum() < 2:
+            return None
+        deltas = centroids[valid, 1] - centroids[valid, 0]
+        longitudinal, transverse = baselineDeltas(deltas[:, 0], deltas[:, 1])
+        return self.fwhm(longitudinal.std(), transverse.std())
+
+
+    @property
+    def windows(self):
+        return self.statistics.windows
+
+
+    def addDeltas(self, centroids, timestamp=None):
+        """
+        Add the deltas of the two spots to the statistics, along and across the baseline
+        (the x axis of the image), and those of every pair along and across its own baseline
+        (see `setPairBaselines`). Returns the block that was completed by this sample, if
+        any (see `BlockStatistics.add`).
+        """
+        (cX_star1, cY_star1), (cX_star2, cY_star2) = centroids[0], centroids[1]
+        if timestamp is None:
+            timestamp = time.time()
+
+        self.last_block = self.statistics.add(baselineDeltas(cX_star2 - cX_star1, cY_star2 - cY_star1), timestamp)
+
+        if len(self.pairs) > 1 and len(centroids) >= self.apertures:
+            if self.pair_axes is None:
+                self.pair_axes = [unitVector(centroids[j][0] - centroids[i][0], centroids[j][1] - centroids[i][1])
+                    for i, j in self.pairs]
+            for window, (i, j), axis in zip(self.pair_windows, self.pairs, self.pair_axes):
+                window.add(baselineDeltas(
+                    centroids[j][0] - centroids[i][0], centroids[j][1] - centroids[i][1], axis), timestamp)
+
+        return self.last_block
+
+
+    def seeing(self, window=0):
+        """
+        Return the lateral and transversal FWHM seeing (arcsec) over one of the `windows`
+        (by default the main, frame count based, one).
+        """
+        return self.fwhm(*self.windows[window].std())
+
+
+    def pairSeeing(self):
+        """
+        Lateral and transversal FWHM seeing (arcsec) of every pair of apertures, over the
+        last `window` frames, as a list of `((i, j), lateral, transversal)`.
+        """
+        seeing = []
+        for index, (pair, window) in enumerate(zip(self.pairs, self.pair_windows)):
+            K = self.pair_K[index] if self.pair_K is not None else None
+            seeing.append((pair,) + tuple(self.fwhm(*window.std(), K=K)))
+        return seeing
+
+
+    def fwhm(self, std_x, std_y, K=None):
+        """
+        Lateral and transversal FWHM seeing (arcsec) from the standard deviations of the deltas
+        (pixels), with the Z-tilt constants `K = (K_lat, K_tra)` (default: the ones of `setBaseline`):
+        0.98 * (d / wavelength)^0.2 * (variance / K)^0.6, the variance in radians squared (Tokovinin 2002).
+        """
+        K_lat, K_tra = (self.K_lat, self.K_tra) if K is None else K
+        # Pixel size (µm) over focal length (mm): radians per pixel
+        variance_x = np.square(std_x * self.pixel_width / self.focal * 1e-3)
+        variance_y = np.square(std_y * self.pixel_height / self.focal * 1e-3)
+        fwhm_lat = self.A * np.power(variance_x / K_lat, 0.6) * RAD_TO_ARCSEC
+        fwhm_tra = self.A * np.power(variance_y / K_tra, 0.6) * RAD_TO_ARCSEC
+
+        return fwhm_lat, fwhm_tra
+
+
+    def process(self, frame, timestamp=None):
+        """
+        Run the whole pipeline on a frame, taken at `timestamp` (seconds, default: now).
+
+        Returns `(contours, centroids, seeing)`. `centroids` is None when the two
+        spots could not be measured, and `seeing` is None in that case as well.
+        """
+        contours = self.findSpots(frame)
+
+        try:
+            centroids = self.centroids(frame, contours)
+        except (IndexError, ZeroDivisionError):
+            return contours, None, None
+
+        self.addDeltas(centroids, timestamp)
+
+        return contours, centroids, self.seeing()
@@ -1,45 +1,104 @@
-import random
 import numpy as np
 
 class FakeStars(object):
+    """
+    Generator of fake DIMM images: two disks jittering around fixed positions.
 
-    def __init__(self, value = 255, height = 480, width = 640, depth = 3):
+    The disks are stamped from precomputed masks, only within their bounding
+    boxes, directly into uint8 buffers (which may be reused with `out`).
+    `generateBatch` emits a whole `(N, height, width)` stack at once.
+    """
+
+    MIN_RADIUS = 5
+    MAX_RADIUS = 10
+
+    def __init__(self, value = 255, height = 480, width = 640, depth = 3, seed = None):
         self.value = value
         self.height = height
         self.width = width
         self.depth = depth
-
-        self.x1 = random.randint(a=40, b=self.width // 2 - 40)
-        self.y1 = random.randint(a=40, b=self.height - 40)
-
-        self.x2 = random.randint(a=self.width // 2 + 40, b=self.width - 40)
-        self.y2 = random.randint(a=40, b=self.height - 40)
-
-    def generate(self, rand_range=5):
-        image = np.zeros(shape=(self.height, self.width, self.depth))
-
-        rand_x1 = self.x1 + random.randint(-rand_range, rand_range)
-        rand_y1 = self.y1 + random.randint(-rand_range, rand_range)
-        rand_radius1 = random.randint(5, 10)
-        image[self._get_circle(rand_x1, rand_y1, rand_radius1), :] = self.value
-        image[self._get_circle(rand_x1, rand_y1, rand_radius1), :] = self.value
-        image[self._get_circle(rand_x1, rand_y1, rand_radius1), :] = self.value
-
-        rand_x2 = self.x2 + random.randint(-rand_range, rand_range)
-        rand_y2 = self.y2 + random.randint(-rand_range, rand_range)
-        rand_radius2 = random.randint(5, 10)
-        image[self._get_circle(rand_x2, rand_y2, rand_radius2), :] = self.value
-        image[self._get_circle(rand_x2, rand_y2, rand_radius2), :] = self.value
-        image[self._get_circle(rand_x2, rand_y2, rand_radius2), :] = self.value
-
-        return np.uint8(image)
-
-
-    def _get_circle(self, center_x, center_y, radius):
-        range_x = np.arange(0, self.width)
-        range_y = np.arange(0, self.height)
-        
-        return (range_x[np.newaxis, :] - center_x) ** 2 + (range_y[:, np.newaxis] - center_y) ** 2 < radius ** 2
+        self.rng = np.random.RandomState(seed)
+
+        self.x1 = self.rng.randint(40, self.width // 2 - 40 + 1)
+        self.y1 = self.rng.randint(40, self.height - 40 + 1)
+
+        self.x2 = self.rng.randint(self.width // 2 + 40, self.width - 40 + 1)
+        self.y2 = self.rng.randint(40, self.height - 40 + 1)
+
+        # Disk masks and their pixel offsets, for every radius
+        self._disks = {}
+        self._offsets = {}
+        for radius in range(self.MIN_RADIUS, self.MAX_RADIUS + 1):
+            disk = self._get_circle(radius)
+            self._disks[radius] = disk
+            dy, dx = np.nonzero(disk)
+            self._offsets[radius] = (dy - radius, dx - radius)
+
+    def generate(self, rand_range=5, out=None):
+        """
+        Return one `(height, width, depth)` uint8 image, written into `out` if given.
+        """
+        if out is None:
+            out = np.zeros((self.height, self.width, self.depth), dtype=np.uint8)
+        else:
+            out[...] = 0
+
+        for x, y in ((self.x1, self.y1), (self.x2, self.y2)):
+            rand_x = x + self.rng.randint(-rand_range, rand_range + 1)
+            rand_y = y + self.rng.randint(-rand_range, rand_range + 1)
+            rand_radius = self.rng.randint(self.MIN_RADIUS, self.MAX_RADIUS + 1)
+            self._stamp(out, rand_x, rand_y, rand_radius)
+
+        return out
+
+    def generateBatch(self, n, rand_range=5, out=None):
+        """
+        Return `n` mono frames as one `(n, height, width)` uint8 array, written into `out` if given.
+        """
+        if out is None:
+            out = np.zeros((n, self.height, self.width), dtype=np.uint8)
+        else:
+            out[...] = 0
+
+        frames = np.arange(n)
+        for x, y in ((self.x1, self.y1), (self.x2, self.y2)):
+            rand_x = x + self.rng.randint(-rand_range, rand_range + 1, size=n)
+            rand_y = y + self.rng.randint(-rand_range, rand_range + 1, size=n)
+            rand_radius = self.rng.randint(self.MIN_RADIUS, self.MAX_RADIUS + 1, size=n)
+
+            # All the frames with the same radius are stamped by a single fancy-indexed assignment
+            for radius, (dy, dx) in self._offsets.items():
+                selected = rand_radius == radius
+                if not selected.any():
+                    continue
+                rows = rand_y[selected, np.newaxis] + dy
+                cols = rand_x[selected, np.newaxis] + dx
+                index = np.broadcast_to(frames[selected, np.newaxis], rows.shape)
+                inside = (rows >= 0) & (rows < self.height) & (cols >= 0) & (cols < self.width)
+                out[index[inside], rows[inside], cols[inside]] = self.value
+
+        return out
+
+    def _stamp(self, image, center_x, center_y, radius):
+        disk = self._disks[radius]
+
+        x0, y0 = center_x - radius, center_y - radius
+        x1, y1 = x0 + disk.shape[1], y0 + disk.shape[0]
+
+        # Clip the bounding box (and the mask) to the image
+        cx0, cy0 = max(x0, 0), max(y0, 0)
+        cx1, cy1 = min(x1, self.width), min(y1, self.height)
+        if cx0 >= cx1 or cy0 >= cy1:
+            return
+
+        mask = disk[cy0 - y0 : cy1 - y0, cx0 - x0 : cx1 - x0]
+        image[cy0:cy1, cx0:cx1][mask] = self.value
+
+
+    def _get_circle(self, radius):
+        range_xy = np.arange(-radius, radius + 1)
+
+        return range_xy[np.newaxis, :] ** 2 + range_xy[:, np.newaxis] ** 2 < radius ** 2
 
 
 if __name__ == "__main__":
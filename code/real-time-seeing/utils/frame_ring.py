@@ -0,0 +1,76 @@
+from collections import deque
+import ctypes as C
+import queue
+
+import numpy as np
+
+
+class FrameRingBuffer(object):
+    """
+    Fixed pool of preallocated frames shared between the camera driver and the processing.
+
+    The driver side (`push`, called from the TIS frame ready callback) copies the
+    incoming buffer into a free slot, exactly once, and never blocks: when no slot
+    is free the frame is counted as dropped. The processing side (`get`) receives
+    the index of a filled slot and must give it back with `release` once done.
+    """
+
+    def __init__(self, shape, dtype=np.uint8, slots=8):
+        self.frames = np.empty((slots,) + tuple(shape), dtype=dtype)
+        self.nbytes = self.frames[0].nbytes
+        self.framenumbers = np.zeros(slots, dtype=np.int64)
+
+        self._free = deque(range(slots))
+        self._ready = queue.Queue(maxsize=slots)
+
+        self.last_framenumber = None
+        self.received = 0
+        self.dropped_driver = 0     # Gaps in the frame numbers given by the driver
+        self.dropped_full = 0       # No free slot, i.e. the processing is too slow
+
+    @property
+    def dropped(self):
+        return self.dropped_driver + self.dropped_full
+
+    def qsize(self):
+        """ Number of filled slots waiting for the processing. """
+        return self._ready.qsize()
+
+    def push(self, pBuffer, framenumber):
+        """
+        Copy the image pointed by `pBuffer` into a free slot. Driver side, non blocking.
+
+        :param: pBuffer : Pointer to the first pixel's first byte
+        :param: framenumber : Number of the frame since the stream started
+        """
+        self.received += 1
+        if self.last_framenumber is not None and framenumber > self.last_framenumber + 1:
+            self.dropped_driver += framenumber - self.last_framenumber - 1
+        self.last_framenumber = framenumber
+
+        try:
+            index = self._free.popleft()
+        except IndexError:
+            self.dropped_full += 1
+            return False
+
+        C.memmove(self.frames[index].ctypes.data, pBuffer, self.nbytes)
+        self.framenumbers[index] = framenumber
+        self._ready.put_nowait(index)
+        return True
+
+    def get(self, timeout=None):
+        """
+        Return the index of the oldest filled slot, or None after `timeout` seconds.
+        """
+        try:
+            return self._ready.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def release(self, index):
+        self._free.append(index)
+
+    def reset(self):
+        """ Forget the frame numbers, e.g. when the live stream is restarted. """
+        self.last_framenumber = None
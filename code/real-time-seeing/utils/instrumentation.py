@@ -0,0 +1,169 @@
+from bisect import bisect_left
+import json
+import logging
+import os
+import threading
+import time
+import traceback
+
+import numpy as np
+
+
+class LatencyHistogram(object):
+    """
+    Fixed-size histogram of latencies (seconds), with logarithmic buckets.
+
+    Recording a value is a bisection in a short list, percentiles are read back
+    from the buckets (upper bound of the bucket holding the requested rank).
+    """
+
+    # From 1 us to 10 s, 10 buckets per decade
+    BOUNDS = list(np.logspace(-6, 1, 71))
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.counts[bisect_left(self.BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q):
+        if self.count == 0:
+            return None
+        rank = q / 100.0 * self.count
+        cumulated = 0
+        for index, count in enumerate(self.counts):
+            cumulated += count
+            if cumulated >= rank and count > 0:
+                return min(self.BOUNDS[index], self.max) if index < len(self.BOUNDS) else self.max
+        return self.max
+
+    def summary(self):
+        if self.count == 0:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "mean_us": self.total / self.count * 1e6,
+            "p50_us": self.percentile(50) * 1e6,
+            "p90_us": self.percentile(90) * 1e6,
+            "p99_us": self.percentile(99) * 1e6,
+            "max_us": self.max * 1e6,
+        }
+
+
+class PipelineStats(object):
+    """
+    Instrumentation of the processing path: per-stage latency histograms, event
+    counters and gauges (e.g. queue depths, read when a snapshot is taken).
+
+    The hot path is expected to check `enabled` before timing anything:
+
+        if stats.enabled:
+            tic = stats.clock()
+        ...
+        if stats.enabled:
+            tic = stats.lap("detection", tic)
+
+    so that a disabled instance costs one attribute lookup per stage.
+    `startDump` periodically writes `snapshot()` to a JSON file.
+    """
+
+    clock = staticmethod(time.perf_counter)
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.started = time.time()
+        self.stages = {}
+        self.counters = {}
+        self.gauges = {}
+
+        self._dump_thread = None
+        self._dump_stop = threading.Event()
+
+    def lap(self, stage, tic):
+        """ Record the time elapsed since `tic` for `stage`, and return the current clock. """
+        toc = time.perf_counter()
+        self.record(stage, toc - tic)
+        return toc
+
+    def record(self, stage, seconds):
+        try:
+            self.stages[stage].add(seconds)
+        except KeyError:
+            histogram = self.stages[stage] = LatencyHistogram()
+            histogram.add(seconds)
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def addGauge(self, name, function):
+        """ `function()` gives the current value of the gauge `name` (e.g. a queue size). """
+        self.gauges[name] = function
+
+    def reset(self):
+        self.started = time.time()
+        self.stages = {}
+        self.counters = {}
+
+    def snapshot(self):
+        gauges = {}
+        for name, function in list(self.gauges.items()):
+            try:
+                gauges[name] = function()
+            except Exception:
+                gauges[name] = None
+
+        # Copied first: the processing thread may add a counter meanwhile
+        counters = dict(self.counters)
+        elapsed = time.time() - self.started
+        return {
+            "timestamp": time.time(),
+            "elapsed": elapsed,
+            "counters": counters,
+            "rates": {name: value / elapsed for name, value in counters.items()} if elapsed > 0 else {},
+            "gauges": gauges,
+            "stages": {stage: histogram.summary() for stage, histogram in list(self.stages.items())},
+        }
+
+    def text(self):
+        """ Short human readable report, for the stats panel. """
+        snapshot = self.snapshot()
+        lines = []
+        for name, value in sorted(snapshot["counters"].items()):
+            lines.append("{}: {} ({:.1f}/s)".format(name, value, snapshot["rates"].get(name, 0)))
+        for name, value in sorted(snapshot["gauges"].items()):
+            lines.append("{}: {}".format(name, value))
+        for stage, summary in sorted(snapshot["stages"].items()):
+            if summary["count"] > 0:
+                lines.append("{}: p50 {:.0f} us | p99 {:.0f} us | max {:.0f} us".format(
+                    stage, summary["p50_us"], summary["p99_us"], summary["max_us"]))
+        return "\n".join(lines)
+
+    def startDump(self, filename, interval=10.0):
+        """ Write `snapshot()` to `filename` (JSON, replaced atomically) every `interval` seconds. """
+        self.stopDump()
+        self._dump_stop.clear()
+        self._dump_thread = threading.Thread(target=self._dump, args=(filename, interval), daemon=True)
+        self._dump_thread.start()
+
+    def stopDump(self):
+        if self._dump_thread is None:
+            return
+        self._dump_stop.set()
+        self._dump_thread.join()
+        self._dump_thread = None
+
+    def _dump(self, filename, interval):
+        while not self._dump_stop.wait(interval):
+            try:
+                with open(filename + ".tmp", "w") as jsonFile:
+                    json.dump(self.snapshot(), jsonFile, indent=2)
+                os.replace(filename + ".tmp", filename)
+            except Exception:
+                logging.error(traceback.format_exc())
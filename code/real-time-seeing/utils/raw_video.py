@@ -0,0 +1,126 @@
+import numpy as np
+
+
+# Lossless container of raw frames: a fixed header, then fixed-size records (frame
+# number, timestamp, exposure and the frame itself), so that a file can be memory
+# mapped as an array of records. Any bit depth and number of channels is supported.
+# A ring file (see `RingRecorder`) has a fixed number of records, `capacity`, the
+# frame `written` being stored in the record `written % capacity`.
+RAW_EXTENSION = ".dimmraw"
+RAW_MAGIC = b"DIMMRAW"
+RAW_VERSION = 1
+
+HEADER_SIZE = 64
+HEADER_DTYPE = np.dtype([
+    ("magic", "S8"),
+    ("version", "<u4"),
+    ("header_size", "<u4"),
+    ("dtype", "S8"),            # Pixel dtype, e.g. "<u2"
+    ("height", "<u4"),
+    ("width", "<u4"),
+    ("channels", "<u4"),        # 0 for mono frames stored as (height, width)
+    ("capacity", "<u8"),        # Number of records of a ring file, 0 for a sequence
+    ("written", "<u8"),         # Frames written to a ring file since its creation
+])
+
+
+def recordDtype(shape, dtype):
+    """ Record of one frame of `shape` and `dtype`. """
+    return np.dtype([
+        ("framenumber", "<i8"),
+        ("timestamp", "<f8"),
+        ("exposure", "<f8"),        # Seconds, NaN when unknown
+        ("frame", np.dtype(dtype).newbyteorder("<"), tuple(shape)),
+    ])
+
+
+def rawHeader(shape, dtype, capacity=0):
+    header = np.zeros(1, dtype=HEADER_DTYPE)
+    header["magic"] = RAW_MAGIC
+    header["version"] = RAW_VERSION
+    header["header_size"] = HEADER_SIZE
+    header["dtype"] = np.dtype(dtype).newbyteorder("<").str.encode("ascii")
+    header["height"], header["width"] = shape[:2]
+    header["channels"] = shape[2] if len(shape) == 3 else 0
+    header["capacity"] = capacity
+    return header.tobytes().ljust(HEADER_SIZE, b"\0")
+
+
+def readRawHeader(filename):
+    """ `(shape, dtype, header_size, capacity, written)` of a raw video file. """
+    with open(filename, "rb") as rawFile:
+        header = np.frombuffer(rawFile.read(HEADER_DTYPE.itemsize), dtype=HEADER_DTYPE)
+    if len(header) == 0 or header["magic"][0] != RAW_MAGIC:
+        raise ValueError("'{}' is not a raw video file".format(filename))
+    if header["version"][0] > RAW_VERSION:
+        raise ValueError("Unsupported raw video version {} in '{}'".format(header["version"][0], filename))
+
+    shape = (int(header["height"][0]), int(header["width"][0]))
+    if header["channels"][0]:
+        shape += (int(header["channels"][0]),)
+    return (shape, np.dtype(header["dtype"][0].decode("ascii")), int(header["header_size"][0]),
+        int(header["capacity"][0]), int(header["written"][0]))
+
+
+def openRawVideo(filename, mode="r"):
+    """
+    Memory map the records of a raw video file (no copy), as a structured array with
+    the fields `framenumber`, `timestamp`, `exposure` and `frame`. With `mode="c"`
+    (copy-on-write) the frames can be modified in memory, the file is left untouched.
+    An incomplete last record (e.g. interrupted recording) is ignored. The records
+    of a ring file are in the order of the slots (see `ringSlots`).
+    """
+    shape, dtype, header_size, _, _ = readRawHeader(filename)
+    record = recordDtype(shape, dtype)
+    with open(filename, "rb") as rawFile:
+        rawFile.seek(0, 2)
+        count = (rawFile.tell() - header_size) // record.itemsize
+    if count <= 0:
+        return np.zeros(0, dtype=record)
+    return np.memmap(filename, dtype=record, mode=mode, offset=header_size, shape=(count,))
+
+
+class RawVideoWriter(object):
+    """
+    Writer of a raw video file. The records are gathered in a preallocated chunk of
+    `chunk` frames, written to the file with a single call when it is full.
+    """
+
+    def __init__(self, filename, shape, dtype, chunk=32):
+        self.filename = filename
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.written = 0
+
+        self._chunk = np.zeros(chunk, dtype=recordDtype(self.shape, self.dtype))
+        self._filled = 0
+        self._file = open(filename, "wb")
+        self._file.write(rawHeader(self.shape, self.dtype))
+
+    def write(self, frame, timestamp, framenumber=-1, exposure=float("nan")):
+        if frame.shape != self.shape:
+            raise ValueError("Frame shape {} differs from the video shape {}".format(frame.shape, self.shape))
+
+        record = self._chunk[self._filled]
+        record["framenumber"] = framenumber
+        record["timestamp"] = timestamp
+        record["exposure"] = exposure
+        record["frame"] = frame
+        self._filled += 1
+        self.written += 1
+
+        if self._filled == len(self._chunk):
+            self.flush()
+
+    def flush(self):
+        if self._filled:
+            self._file.write(memoryview(self._chunk[:self._filled]).cast("B"))
+            self._filled = 0
+        self._file.flush()
+
+    def close(self):
+        if self._file is None:
+            return
+        self.flush()
+        self._file.close()
+        self._file = None
@@ -0,0 +1,91 @@
+from os.path import splitext
+
+import cv2
+import numpy as np
+
+from utils.raw_video import RAW_EXTENSION, openRawVideo, readRawHeader
+from utils.ring_recorder import ringSlots
+
+
+class RawVideoCapture(object):
+    """
+    Reader of raw video files (exports, frozen black boxes, or a black box ring itself,
+    in chronological order) with the interface of `cv2.VideoCapture` used here.
+
+    The frames are views of the memory mapped file: no decoding and no copy, the
+    pixels are the recorded ones. `timestamp` and `framenumber` are the recorded
+    metadata of the last frame read. `start` and `stop` restrict the reading to a
+    range of frames; with `writable`, the mapping is copy-on-write so that the
+    frames can be modified in place (e.g. calibration) without touching the file.
+    """
+
+    def __init__(self, filename, start=0, stop=None, writable=False):
+        self.filename = filename
+        try:
+            _, _, _, capacity, written = readRawHeader(filename)
+            self.records = openRawVideo(filename, mode="c" if writable else "r")
+        except (IOError, ValueError):
+            self.records = None
+            return
+
+        # Slots of a ring file, from the oldest frame
+        self.order = ringSlots(written, capacity) if capacity else None
+
+        count = len(self.order) if self.order is not None else len(self.records)
+        self.start = min(start, count)
+        self.stop = count if stop is None else min(stop, count)
+        self.position = self.start
+
+        self.timestamp = None
+        self.framenumber = None
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def isOpened(self):
+        return self.records is not None
+
+    @property
+    def timestamps(self):
+        """ Recorded timestamps of all the frames (copied, 8 bytes per frame). """
+        timestamps = self.records["timestamp"]
+        return timestamps[self.order] if self.order is not None else np.array(timestamps)
+
+    def read(self):
+        if self.records is None or self.position >= self.stop:
+            return False, None
+
+        index = self.order[self.position] if self.order is not None else self.position
+        self.position += 1
+        record = self.records[index]
+        self.timestamp = float(record["timestamp"])
+        self.framenumber = int(record["framenumber"])
+        return True, record["frame"]
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            timestamps = self.timestamps
+            if len(timestamps) < 2 or timestamps[-1] <= timestamps[0]:
+                return 0.0
+            return (len(timestamps) - 1) / float(timestamps[-1] - timestamps[0])
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return float(len(self))
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return float(self.position - self.start)
+        return 0.0
+
+    def set(self, prop, value):
+        if prop != cv2.CAP_PROP_POS_FRAMES:
+            return False
+        self.position = min(self.start + int(value), self.stop)
+        return True
+
+    def release(self):
+        self.records = None
+
+
+def openVideo(filename, writable=False):
+    """ `RawVideoCapture` for raw video files, `cv2.VideoCapture` for the others. """
+    if splitext(filename)[1] == RAW_EXTENSION:
+        return RawVideoCapture(filename, writable=writable)
+    return cv2.VideoCapture(filename)
@@ -0,0 +1,110 @@
+from collections import namedtuple
+import logging
+import queue
+import threading
+import traceback
+
+from utils.state_enum import OverflowPolicy
+
+
+# Result of the processing of one frame. `fwhm_lat` and `fwhm_tra` are None when
+# the seeing was not measured on this frame, `seeing` holds the `(name, lat, tra)`
+# of every statistics window, `contours` and `centroids` (None if not found) the
+# detected spots, and `frame` a copy of the analysed image, only when it is exported
+# (None otherwise). Overlays are drawn by the consumers, see `drawOverlay`.
+FrameResult = namedtuple("FrameResult",
+    ["timestamp", "fwhm_lat", "fwhm_tra", "star", "seeing", "contours", "centroids", "frame"])
+
+
+class ResultSink(object):
+    """
+    Single long-lived worker delivering the per-frame results to the registered consumers.
+
+    Results are queued with `put` (bounded queue) and each consumer is called from the
+    worker thread with a list of results, in order. When the queue is full, `put`
+    either waits for the worker (`OverflowPolicy.BLOCK`, backpressure) or drops the
+    result (`OverflowPolicy.DROP`, load shedding, counted in `dropped`).
+
+    Consumers must not touch Qt widgets directly: they are expected to forward the
+    results to the GUI thread, e.g. by emitting a signal.
+
+    The idle callbacks (`registerIdle`) are called from the worker thread when no result
+    arrived for `idle_interval` seconds, e.g. to flush buffered rows when the results stop.
+    """
+
+    def __init__(self, maxsize=1024, batch_size=64, policy=OverflowPolicy.BLOCK, idle_interval=1.0):
+        self.batch_size = batch_size
+        self.policy = policy
+        self.idle_interval = idle_interval
+        self.consumers = []
+        self.idle = []
+        self.dropped = 0
+
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._thread = None
+
+    def register(self, consumer):
+        self.consumers.append(consumer)
+
+    def registerIdle(self, callback):
+        self.idle.append(callback)
+
+    def qsize(self):
+        return self._queue.qsize()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, args=(), daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """ Deliver the pending results and stop the worker. """
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def put(self, result):
+        if self.policy == OverflowPolicy.BLOCK:
+            self._queue.put(result)
+            return True
+
+        try:
+            self._queue.put_nowait(result)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        return True
+
+    def _run(self):
+        running = True
+        while running:
+            try:
+                batch = [self._queue.get(timeout=self.idle_interval)]
+            except queue.Empty:
+                self._call(self.idle)
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            # The stop sentinel may be drained anywhere in the batch: the results
+            # queued before it are delivered, then the worker stops
+            if None in batch:
+                running = False
+                batch = [result for result in batch if result is not None]
+            if not batch:
+                continue
+
+            self._call(self.consumers, batch)
+
+    def _call(self, callbacks, *args):
+        for callback in callbacks:
+            try:
+                callback(*args)
+            except Exception:
+                logging.error(traceback.format_exc())
@@ -0,0 +1,109 @@
+import csv
+from datetime import datetime, timedelta
+from os.path import splitext, join, exists, getsize
+import threading
+import time
+
+from utils.state_enum import FileRotation
+
+
+class ResultsWriter(object):
+    """
+    CSV writer of the seeing results that keeps its file open and buffers the rows.
+
+    The rows are flushed to disk when `flush_rows` rows are pending or when the last
+    flush is older than `flush_interval` seconds, and on `close`. The age of the last
+    flush is checked on every `write`, and by `flushIfDue`, to be called periodically
+    (e.g. from `ResultSink.registerIdle`) so that the pending rows are written when the
+    results stop coming. Files are always opened in append mode (the header is only
+    written to new files), and depending on `rotation` the date of the night or the
+    start of the session is appended to the file name, e.g. `seeing_2019-01-21.csv`.
+    """
+
+    def __init__(self, path, filename, fieldnames, rotation=FileRotation.NIGHT,
+                 flush_rows=256, flush_interval=5.0):
+        self.fieldnames = fieldnames
+        self.rotation = rotation
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.session = datetime.now().strftime("%Y%m%d-%H%M%S")
+
+        self._lock = threading.Lock()
+        self._file = None
+        self._writer = None
+        self._filename = None
+        self._rows = []
+        self._last_flush = time.time()
+
+        self.setDestination(path, filename)
+
+    def setDestination(self, path, filename):
+        """ Change the output file. Takes effect on the next write, nothing is created until then. """
+        with self._lock:
+            self._flush()
+            self._close()
+            self.path = path
+            self.filename = filename
+
+    def filenameFor(self, timestamp):
+        stem, extension = splitext(self.filename)
+        if self.rotation == FileRotation.SESSION:
+            stem = "{}_{}".format(stem, self.session)
+        elif self.rotation == FileRotation.NIGHT:
+            # A night belongs to the date of its evening
+            night = datetime.fromtimestamp(timestamp) - timedelta(hours=12)
+            stem = "{}_{}".format(stem, night.strftime("%Y-%m-%d"))
+        return join(self.path, stem + extension)
+
+    def write(self, rows):
+        """
+        Buffer rows, the first column being the timestamp (seconds since epoch).
+        """
+        with self._lock:
+            for row in rows:
+                filename = self.filenameFor(row[0])
+                if filename != self._filename:
+                    self._flush()
+                    self._close()
+                    self._open(filename)
+                self._rows.append(row)
+
+            if len(self._rows) >= self.flush_rows or time.time() - self._last_flush >= self.flush_interval:
+                self._flush()
+
+    def flushIfDue(self):
+        """ Flush the pending rows if the last flush is older than `flush_interval` seconds. """
+        with self._lock:
+            if self._rows and time.time() - self._last_flush >= self.flush_interval:
+                self._flush()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        with self._lock:
+            self._flush()
+            self._close()
+
+    def _open(self, filename):
+        new_file = not exists(filename) or getsize(filename) == 0
+        self._file = open(filename, "a", newline="")
+        self._writer = csv.writer(self._file)
+        self._filename = filename
+        if new_file:
+            self._writer.writerow(self.fieldnames)
+
+    def _flush(self):
+        if self._file is not None and self._rows:
+            self._writer.writerows(self._rows)
+            self._file.flush()
+        self._rows = []
+        self._last_flush = time.time()
+
+    def _close(self):
+        if self._file is not None:
+            self._file.close()
+        self._file = None
+        self._writer = None
+        self._filename = None
@@ -0,0 +1,101 @@
+import ctypes as C
+import time
+
+import numpy as np
+
+from utils.raw_video import HEADER_SIZE, HEADER_DTYPE, recordDtype, rawHeader
+
+
+def ringSlots(written, capacity):
+    """ Slots of a ring of `capacity` records holding `written` frames, from the oldest to the newest. """
+    count = min(written, capacity)
+    return np.arange(written - count, written) % capacity
+
+
+class RingRecorder(object):
+    """
+    Black box of the last `capacity` raw frames, with their frame number, timestamp
+    and exposure, in a fixed-size memory mapped file (raw container): the oldest
+    frames are overwritten, the disk usage never grows.
+
+    `push` (frame ready callback) costs one copy of the frame, from the driver buffer
+    straight into the mapped file, and three scalar stores. `freeze` copies the last
+    seconds to a permanent raw video file, while the recording goes on: the frames
+    overwritten during the copy are left out.
+    """
+
+    def __init__(self, filename, capacity, shape, dtype=np.uint8):
+        self.filename = filename
+        self.capacity = capacity
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.record = recordDtype(self.shape, self.dtype)
+        self.nbytes = int(np.prod(self.shape)) * self.dtype.itemsize
+        self.exposure = float("nan")     # Current exposure (seconds), stored with every frame
+        self.written = 0
+
+        size = HEADER_SIZE + capacity * self.record.itemsize
+        with open(filename, "wb") as ringFile:
+            ringFile.write(rawHeader(self.shape, self.dtype, capacity))
+            ringFile.truncate(size)
+
+        self._map = np.memmap(filename, dtype=np.uint8, mode="r+", shape=(size,))
+        self._header = self._map[:HEADER_DTYPE.itemsize].view(HEADER_DTYPE)
+        self.records = self._map[HEADER_SIZE:].view(self.record)
+        self._frames = self.records.ctypes.data + self.record.fields["frame"][1]
+
+    def push(self, pBuffer, framenumber):
+        """
+        Copy the image pointed by `pBuffer` into the oldest slot. Driver side.
+
+        :param: pBuffer : Pointer to the first pixel's first byte
+        :param: framenumber : Number of the frame since the stream started
+        """
+        index = self.written % self.capacity
+        C.memmove(self._frames + index * self.record.itemsize, pBuffer, self.nbytes)
+        self._store(index, framenumber, time.time())
+
+    def write(self, frame, timestamp, framenumber=-1):
+        """ Same as `push`, from an array (e.g. simulated or imported frames). """
+        index = self.written % self.capacity
+        self.records["frame"][index] = frame
+        self._store(index, framenumber, timestamp)
+
+    def _store(self, index, framenumber, timestamp):
+        record = self.records[index]
+        record["framenumber"] = framenumber
+        record["timestamp"] = timestamp
+        record["exposure"] = self.exposure
+        self.written += 1
+        self._header["written"] = self.written
+
+    def freeze(self, filename, seconds, chunk=64):
+        """
+        Write the frames of the last `seconds` to `filename` (raw video file), from
+        the oldest to the newest. Returns the number of frames written.
+        """
+        written = self.written
+        slots = ringSlots(written, self.capacity)
+        if len(slots) == 0:
+            return 0
+
+        timestamps = self.records["timestamp"][slots]
+        first = written - len(slots) + int(np.searchsorted(timestamps, timestamps[-1] - seconds))
+
+        frozen = 0
+        with open(filename, "wb") as frozenFile:
+            frozenFile.write(rawHeader(self.shape, self.dtype))
+            for start in range(first, written, chunk):
+                sequence = np.arange(start, min(start + chunk, written))
+                records = self.records[sequence % self.capacity]
+
+                # Slots reused by the recorder meanwhile (or being written) are left out
+                records = records[sequence > self.written - self.capacity]
+                if len(records):
+                    frozenFile.write(memoryview(records).cast("B"))
+                    frozen += len(records)
+        return frozen
+
+    def close(self):
+        """ Flush the file. The mapping is released with the recorder (the driver may still be pushing a frame). """
+        self._map.flush()
@@ -0,0 +1,127 @@
+from collections import deque
+import math
+
+
+class SlidingWindow(object):
+    """
+    Mean and variance of the last samples, updated in O(1) per sample (Welford add/remove).
+
+    The window is bounded by a number of samples (`length`), a duration in seconds
+    (`duration`), or both. Each sample is a tuple of `channels` values, e.g. the
+    lateral and transversal deltas of the DIMM.
+    """
+
+    def __init__(self, length=None, duration=None, channels=2):
+        if length is None and duration is None:
+            raise ValueError("A window needs a length or a duration")
+
+        self.length = length
+        self.duration = duration
+        self.channels = channels
+
+        self._samples = deque()
+        self.reset()
+
+    @property
+    def name(self):
+        if self.duration is None:
+            return "{} frames".format(self.length)
+        if self.duration % 60 == 0:
+            return "{} min".format(int(self.duration // 60))
+        return "{} s".format(self.duration)
+
+    def __len__(self):
+        return self.count
+
+    def reset(self):
+        self._samples.clear()
+        self.count = 0
+        self.mean = [0.0] * self.channels
+        self._m2 = [0.0] * self.channels
+
+    def add(self, values, timestamp=0.0):
+        self._samples.append((timestamp, values))
+        self.count += 1
+        for i, x in enumerate(values):
+            delta = x - self.mean[i]
+            self.mean[i] += delta / self.count
+            self._m2[i] += delta * (x - self.mean[i])
+
+        while (self.length is not None and self.count > self.length) or \
+            (self.duration is not None and timestamp - self._samples[0][0] > self.duration):
+            self._remove(self._samples.popleft()[1])
+
+    def _remove(self, values):
+        self.count -= 1
+        if self.count == 0:
+            self.mean = [0.0] * self.channels
+            self._m2 = [0.0] * self.channels
+            return
+
+        for i, x in enumerate(values):
+            delta = x - self.mean[i]
+            self.mean[i] -= delta / self.count
+            self._m2[i] = max(self._m2[i] - delta * (x - self.mean[i]), 0.0)
+
+    def variance(self):
+        """ Population variance of each channel (like `np.var`). """
+        if self.count == 0:
+            return [0.0] * self.channels
+        return [m2 / self.count for m2 in self._m2]
+
+    def std(self):
+        return [math.sqrt(v) for v in self.variance()]
+
+
+class BlockStatistics(object):
+    """
+    Mean and standard deviation of consecutive, non-overlapping blocks of `length` samples.
+
+    `add` returns the `(timestamp, mean, std)` of a block when it is completed, None otherwise.
+    The last completed block is kept in `last`.
+    """
+
+    def __init__(self, length, channels=2):
+        self.length = length
+        self.channels = channels
+        self.last = None
+        self._block = SlidingWindow(length=length, channels=channels)
+
+    def add(self, values, timestamp=0.0):
+        self._block.add(values, timestamp)
+        if self._block.count < self.length:
+            return None
+
+        self.last = (timestamp, list(self._block.mean), self._block.std())
+        self._block.reset()
+        return self.last
+
+    def reset(self):
+        """ Drop the block in progress and the last completed one. """
+        self.last = None
+        self._block.reset()
+
+
+class RunningStatistics(object):
+    """
+    Several sliding windows and block statistics, all fed by a single `add` per sample.
+    """
+
+    def __init__(self, windows, block_length=None, channels=2):
+        self.windows = list(windows)
+        self.blocks = BlockStatistics(block_length, channels) if block_length else None
+
+    def add(self, values, timestamp=0.0):
+        """ Returns the completed block, if any (see `BlockStatistics.add`). """
+        for window in self.windows:
+            window.add(values, timestamp)
+
+        if self.blocks is not None:
+            return self.blocks.add(values, timestamp)
+        return None
+
+    def reset(self):
+        for window in self.windows:
+            window.reset()
+        if self.blocks is not None:
+            self.blocks.reset()
@@ -0,0 +1,106 @@
+import numpy as np
+
+
+class SeeingHistory(object):
+    """
+    Compact ring of timestamped seeing values (e.g. a whole night at camera rate).
+
+    Timestamps are float64 seconds, values float32 `(lateral, transversal)`; when
+    full, the oldest points are overwritten. `decimate` reduces any time range to
+    a min/max envelope of a given number of buckets (typically the width of the
+    chart in pixels), so that the chart cost does not depend on the frame rate
+    nor on the zoom level.
+    """
+
+    def __init__(self, capacity=4000000, channels=2):
+        self.capacity = capacity
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.values = np.zeros((capacity, channels), dtype=np.float32)
+        self.count = 0
+        self._head = 0      # Index of the next point to write
+
+    def __len__(self):
+        return self.count
+
+    def reset(self):
+        self.count = 0
+        self._head = 0
+
+    def append(self, timestamps, values):
+        """
+        Add points, in chronological order.
+
+        :param: timestamps : `(n,)` times in seconds
+        :param: values : `(n, channels)` values
+        """
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float32)
+        if len(timestamps) > self.capacity:
+            timestamps, values = timestamps[-self.capacity:], values[-self.capacity:]
+
+        n = len(timestamps)
+        first = min(n, self.capacity - self._head)
+        self.timestamps[self._head:self._head + first] = timestamps[:first]
+        self.values[self._head:self._head + first] = values[:first]
+        self.timestamps[:n - first] = timestamps[first:]
+        self.values[:n - first] = values[first:]
+
+        self._head = (self._head + n) % self.capacity
+        self.count = min(self.count + n, self.capacity)
+
+    def first(self):
+        if self.count == 0:
+            return None
+        return self.timestamps[self._head if self.count == self.capacity else 0]
+
+    def last(self):
+        return self.timestamps[self._head - 1] if self.count else None
+
+    def _ordered(self):
+        """ The two chronological segments of the ring, as `[(timestamps, values), ...]`. """
+        if self.count < self.capacity:
+            return [(self.timestamps[:self.count], self.values[:self.count])]
+        return [(self.timestamps[self._head:], self.values[self._head:]),
+                (self.timestamps[:self._head], self.values[:self._head])]
+
+    def range(self, start, end):
+        """ Points with `start <= timestamp < end`, as `(timestamps, values)` (copied if the range wraps). """
+        parts = []
+        for timestamps, values in self._ordered():
+            i, j = np.searchsorted(timestamps, [start, end])
+            if j > i:
+                parts.append((timestamps[i:j], values[i:j]))
+
+        if not parts:
+            return self.timestamps[:0], self.values[:0]
+        if len(parts) == 1:
+            return parts[0]
+        return np.concatenate([p[0] for p in parts]), np.concatenate([p[1] for p in parts])
+
+    def decimate(self, start, end, buckets):
+        """
+        Min/max envelope of the points within `[start, end)` over `buckets` equal time buckets.
+
+        :returns: `(timestamps, values)`, two points per non-empty bucket (its minimum then
+                  its maximum, at the times of its first and middle points), or all the points
+                  when there are less than `2 * buckets` of them
+        """
+        timestamps, values = self.range(start, end)
+        if len(timestamps) <= 2 * buckets:
+            return timestamps, values
+
+        edges = np.searchsorted(timestamps, np.linspace(start, end, buckets + 1)[:-1])
+        edges = np.unique(edges)
+        edges = edges[edges < len(timestamps)]
+
+        minimum = np.minimum.reduceat(values, edges, axis=0)
+        maximum = np.maximum.reduceat(values, edges, axis=0)
+
+        # Times of real points of each bucket, so that the series stays sorted
+        times = np.empty(2 * len(edges))
+        times[0::2] = timestamps[edges]
+        times[1::2] = timestamps[(edges + np.append(edges[1:], len(timestamps))) // 2]
+        envelope = np.empty((2 * len(edges), values.shape[1]), dtype=values.dtype)
+        envelope[0::2] = minimum
+        envelope[1::2] = maximum
+        return times, envelope
@@ -4,4 +4,19 @@ class VideoSource(Enum):
     NONE        = 0
     CAMERA      = 1
     SIMULATION  = 2
-    VIDEO       = 3
\ No newline at end of file
+    VIDEO       = 3
+
+class CentroidEstimator(Enum):
+    COG         = 0     # Centre of gravity of the thresholded spot pixels
+    WCOG        = 1     # Windowed (gaussian weighted) centre of gravity
+    CONTOUR     = 2     # Moments of the spot contour polygon
+    COMPONENTS  = 3     # Connected components: all the spots detected and measured in one pass
+
+class OverflowPolicy(Enum):
+    BLOCK       = 0     # Backpressure: wait until there is room
+    DROP        = 1     # Load shedding: drop the new item
+
+class FileRotation(Enum):
+    NONE        = 0     # Always the same file
+    SESSION     = 1     # One file per run of the application
+    NIGHT       = 2     # One file per night (noon to noon, local time)
@@ -0,0 +1,155 @@
+import numpy as np
+
+from utils.dimm import RAD_TO_ARCSEC, zTilt
+
+
+class TurbulenceSimulator(object):
+    """
+    DIMM images with a known seeing: two gaussian spots moved by atmospheric tilt.
+
+    The image motion follows the statistics of Kolmogorov turbulence for a Fried
+    parameter `r0` (Tokovinin 2002): the differential motion of the spots has the
+    variance `K * lambda^2 * r0^(-5/3) * D^(-1/3)` (K_l along the baseline, i.e. the
+    x axis, K_t across it), and both spots share a common G-tilt motion. Successive
+    frames are correlated over about `coherence` frames (exponential kernel).
+
+    Motions are drawn for whole blocks of frames at once (`motions`), and images are
+    rendered per batch (`generateBatch`), so that millions of frames can be simulated.
+    Every frame comes with its ground-truth seeing `0.98 * lambda / r0` (arcsec).
+
+    Units follow the GUI: `b`, `d`, `r0` and `focal` in mm, `wavelength` and pixel
+    sizes in micrometers.
+    """
+
+    # Single-axis G-tilt variance coefficient of one aperture (Tokovinin 2002)
+    G_TILT = 0.170
+
+    def __init__(self, r0=100.0, b=200.0, d=60.0, wavelength=0.5, focal=2000.0,
+                 pixel_width=5.6, pixel_height=5.6, coherence=5.0,
+                 height=480, width=640, spot_sigma=2.0, value=200, noise=0.0, seed=None):
+        self.r0 = r0
+        self.b = b
+        self.d = d
+        self.wavelength = wavelength
+        self.focal = focal
+        self.pixel_width = pixel_width
+        self.pixel_height = pixel_height
+        self.coherence = coherence
+
+        self.height = height
+        self.width = width
+        self.spot_sigma = spot_sigma
+        self.value = value
+        self.noise = noise
+        self.rng = np.random.RandomState(seed)
+
+        # Rest positions of the spots, separated along the x axis (the baseline)
+        self.x1, self.y1 = width * 0.35, height * 0.5
+        self.x2, self.y2 = width * 0.65, height * 0.5
+
+        # Temporal correlation kernel, and the white noise carried between blocks
+        length = max(int(np.ceil(5 * coherence)), 1)
+        kernel = np.exp(-np.arange(length) / max(coherence, 1e-9))
+        self._kernel = kernel / np.sqrt(np.sum(kernel ** 2))
+        self._tail = self.rng.normal(size=(length - 1, 4))
+
+        # Gaussian spot template: half size and pixel offsets
+        self._half = int(np.ceil(4 * spot_sigma))
+        self._grid = np.arange(-self._half, self._half + 1, dtype=np.float64)
+
+        self.seeing = self.groundTruth(r0)
+
+    def groundTruth(self, r0):
+        """ FWHM seeing (arcsec) for a Fried parameter `r0` (mm). """
+        return 0.98 * (self.wavelength * 1e-6) / (np.asarray(r0) * 1e-3) * RAD_TO_ARCSEC
+
+    def differentialStd(self, r0=None):
+        """
+        Expected standard deviation (pixels) of the longitudinal (x) and transverse (y)
+        differential motion, for `r0` (mm, default: the configured one).
+        """
+        r0 = self.r0 if r0 is None else r0
+        # Same coefficients as the estimator
+        K_l, K_t = zTilt(self.b, self.d)
+        variance = (self.wavelength * 1e-6) ** 2 * np.power(np.asarray(r0) * 1e-3, -5 / 3) * \
+            np.power(self.d * 1e-3, -1 / 3)
+        return (np.sqrt(K_l * variance) / self._radPerPixel(self.pixel_width),
+                np.sqrt(K_t * variance) / self._radPerPixel(self.pixel_height))
+
+    def motions(self, n, r0=None):
+        """
+        Draw the motion of `n` frames.
+
+        :param: r0 : Fried parameter (mm), scalar or one value per frame (default: the configured one)
+        :returns: `(positions, seeing)`: the `(n, 2, 2)` sub-pixel `(x, y)` positions of the
+                  two spots, and the `(n,)` ground-truth seeing (arcsec) of each frame
+        """
+        r0 = np.broadcast_to(np.asarray(self.r0 if r0 is None else r0, dtype=np.float64), (n,))
+
+        # Unit variance, temporally correlated noise: common x, y and differential x, y
+        white = np.concatenate([self._tail, self.rng.normal(size=(n, 4))])
+        self._tail = white[n:]
+        unit = np.stack([np.convolve(white[:, i], self._kernel, mode="valid") for i in range(4)], axis=1)
+
+        std_dx, std_dy = self.differentialStd(r0)
+        variance_tilt = self.G_TILT * (self.wavelength * 1e-6) ** 2 * np.power(r0 * 1e-3, -5 / 3) * \
+            np.power(self.d * 1e-3, -1 / 3)
+        std_cx = np.sqrt(np.maximum(variance_tilt / self._radPerPixel(self.pixel_width) ** 2 - std_dx ** 2 / 4, 0))
+        std_cy = np.sqrt(np.maximum(variance_tilt / self._radPerPixel(self.pixel_height) ** 2 - std_dy ** 2 / 4, 0))
+
+        common_x, common_y = unit[:, 0] * std_cx, unit[:, 1] * std_cy
+        delta_x, delta_y = unit[:, 2] * std_dx, unit[:, 3] * std_dy
+
+        positions = np.empty((n, 2, 2))
+        positions[:, 0, 0] = self.x1 + common_x - delta_x / 2
+        positions[:, 0, 1] = self.y1 + common_y - delta_y / 2
+        positions[:, 1, 0] = self.x2 + common_x + delta_x / 2
+        positions[:, 1, 1] = self.y2 + common_y + delta_y / 2
+
+        return positions, self.groundTruth(r0)
+
+    def generateBatch(self, n, r0=None, out=None):
+        """
+        Render `n` mono frames as one `(n, height, width)` uint8 array (written into `out`
+        if given). Returns `(frames, positions, seeing)`, see `motions`.
+        """
+        positions, seeing = self.motions(n, r0)
+
+        if out is None:
+            out = np.zeros((n, self.height, self.width), dtype=np.uint8)
+        if self.noise > 0:
+            out[...] = np.clip(self.rng.normal(0, self.noise, size=out.shape), 0, 255)
+        else:
+            out[...] = 0
+
+        frames = np.arange(n)[:, np.newaxis, np.newaxis]
+        for spot in range(2):
+            x, y = positions[:, spot, 0], positions[:, spot, 1]
+            ix, iy = np.round(x).astype(np.int64), np.round(y).astype(np.int64)
+
+            # Gaussian profile sampled around the sub-pixel position, only within the bounding box
+            gx = np.exp(-(self._grid[np.newaxis, :] - (x - ix)[:, np.newaxis]) ** 2 / (2 * self.spot_sigma ** 2))
+            gy = np.exp(-(self._grid[np.newaxis, :] - (y - iy)[:, np.newaxis]) ** 2 / (2 * self.spot_sigma ** 2))
+            stamps = self.value * gy[:, :, np.newaxis] * gx[:, np.newaxis, :]
+
+            rows = iy[:, np.newaxis, np.newaxis] + self._grid.astype(np.int64)[np.newaxis, :, np.newaxis]
+            cols = ix[:, np.newaxis, np.newaxis] + self._grid.astype(np.int64)[np.newaxis, np.newaxis, :]
+            rows, cols = np.broadcast_arrays(rows, cols)
+            index = np.broadcast_to(frames, rows.shape)
+            inside = (rows >= 0) & (rows < self.height) & (cols >= 0) & (cols < self.width)
+
+            current = out[index[inside], rows[inside], cols[inside]].astype(np.float64)
+            out[index[inside], rows[inside], cols[inside]] = np.clip(current + stamps[inside], 0, 255)
+
+        return out, positions, seeing
+
+    def generate(self):
+        """
+        Return one mono frame, like `FakeStars.generate`. Its ground-truth seeing is in `seeing`.
+        """
+        frames, _, seeing = self.generateBatch(1)
+        self.seeing = seeing[0]
+        return frames[0]
+
+    def _radPerPixel(self, pixel_size):
+        return (pixel_size * 1e-6) / (self.focal * 1e-3)
@@ -0,0 +1,122 @@
+from os.path import splitext
+import logging
+import queue
+import threading
+import traceback
+
+import cv2
+import numpy as np
+
+from utils.dimm import toBGR, drawOverlay
+from utils.raw_video import RawVideoWriter, RAW_EXTENSION
+
+
+class MjpgWriter(object):
+    """ `cv2.VideoWriter` (MJPG, 8-bit BGR) with the interface of `RawVideoWriter`. """
+
+    def __init__(self, filename, shape, fps):
+        self.written = 0
+        self._writer = cv2.VideoWriter(filename, cv2.VideoWriter_fourcc(*'MJPG'), fps, (shape[1], shape[0]))
+        if not self._writer.isOpened():
+            raise IOError("Cannot open '{}' for writing".format(filename))
+
+    def write(self, frame, timestamp, framenumber=-1, exposure=None):
+        if frame.ndim == 2 or frame.shape[2] != 3 or frame.dtype != np.uint8:
+            frame = toBGR(frame)
+        self._writer.write(frame)
+        self.written += 1
+
+    def close(self):
+        self._writer.release()
+
+
+class VideoExporter(object):
+    """
+    Export of the analysed frames by a single encoder worker, fed by a bounded queue.
+
+    `put` never waits: when the encoder falls behind, the frame is dropped and
+    counted in `dropped`, so that the export never slows down the analysis. The
+    frames which are queued are written in order. The format follows the file
+    extension: MJPG for '.avi' (8-bit, lossy), or the lossless raw container
+    for `RAW_EXTENSION` (any bit depth, with the timestamps). With `annotate`,
+    the overlays (contours and centroids) are drawn by the worker.
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.filename = None
+        self.written = 0
+        self.dropped = 0
+
+        self._queue = None
+        self._thread = None
+
+    @property
+    def active(self):
+        return self._thread is not None
+
+    def qsize(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def open(self, filename, fps, annotate=True):
+        """ Start exporting to `filename`, the file is created with the size of the first frame. """
+        self.close()
+        self.filename = filename
+        self.written = 0
+        self.dropped = 0
+
+        self._queue = queue.Queue(maxsize=self.maxsize)
+        self._thread = threading.Thread(target=self._run, args=(self._queue, filename, fps, annotate), daemon=True)
+        self._thread.start()
+
+    def close(self, timeout=None):
+        """ Write the pending frames and close the file. """
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def put(self, result):
+        """ Queue a `FrameResult` (with its `frame`), returns False if it was dropped. """
+        try:
+            self._queue.put_nowait(result)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        return True
+
+    def _run(self, frames, filename, fps, annotate):
+        writer = None
+        failed = False
+        while True:
+            result = frames.get()
+            if result is None:
+                break
+            if failed:
+                self.dropped += 1
+                continue
+
+            try:
+                frame = result.frame
+                if annotate:
+                    frame = drawOverlay(toBGR(frame), result.contours, result.centroids)
+
+                if writer is None:
+                    if splitext(filename)[1] == RAW_EXTENSION:
+                        writer = RawVideoWriter(filename, frame.shape, frame.dtype)
+                    else:
+                        writer = MjpgWriter(filename, frame.shape, fps)
+
+                writer.write(frame, result.timestamp)
+                self.written += 1
+            except Exception:
+                logging.error(traceback.format_exc())
+                failed = True
+                self.dropped += 1
+
+        if writer is not None:
+            try:
+                writer.close()
+            except Exception:
+                logging.error(traceback.format_exc())
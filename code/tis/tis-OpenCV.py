@@ -96,8 +96,8 @@ if Camera.IsDevValid() == 1:
         while ( True ):
             # Snap an image
             Camera.SnapImage()
-            # Get the image
-            image = Camera.GetImage()
+            # Get the image, without copy and without querying the image description again
+            image = Camera.GetImageView()
             # Apply some OpenCV function on this image
             image = cv2.flip(image,0)
             image = cv2.erode(image,np.ones((11, 11)))